@@ -0,0 +1,5 @@
+"""
+Benchmarks de les simulacions. S'executen des de l'arrel del repositori, per exemple:
+
+    python -m benchmarks.memoria_estat
+"""
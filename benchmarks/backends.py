@@ -0,0 +1,57 @@
+"""
+Temps per fotograma d'EstatSimulacio amb cada backend instal·lat (numpy, numexpr,
+numba), en float64 i float32, i diferència màxima amb el backend de NumPy.
+
+    python -m benchmarks.backends --res 1000 2000 --fils 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from michelson.backends import backends, tria_backend
+from michelson.estat import EstatSimulacio
+
+
+def temps(funcio, repeticions):
+    funcio()  # escalfament (i compilació, amb Numba)
+    t0 = time.perf_counter()
+    for _ in range(repeticions):
+        funcio()
+    return (time.perf_counter() - t0)/repeticions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--res', type=int, nargs='+', default=[1000])
+    parser.add_argument('--repeticions', type=int, default=20)
+    parser.add_argument('--fils', type=int, help='fils de numexpr i numba (per defecte, tots els nuclis)')
+    args = parser.parse_args()
+
+    disponibles = {}
+    for nom in backends:
+        try:
+            disponibles[nom] = tria_backend(nom, args.fils)
+        except ImportError:
+            print(f"{nom}: no instal·lat")
+    print(f"auto: {tria_backend('auto', args.fils).nom} (float64), "
+          f"{tria_backend('auto', args.fils, np.float32).nom} (float32)")
+
+    casos = [('esfèric', 'intensitat_esferic', (0.3e-6, 5)), ('R^2.5', 'intensitat_radial', (0.3e-6, 0.5, 2.5))]
+    print(f"{'res':>6} {'dtype':<8}{'cas':<9}" + ''.join(f"{nom:>12}" for nom in disponibles) + "   error")
+    for res in args.res:
+        for dtype in (np.float64, np.float32):
+            estats = {nom: EstatSimulacio(res, dtype=dtype, backend=backend)
+                      for nom, backend in disponibles.items()}
+            for cas, metode, params in casos:
+                temps_ms = [temps(lambda: getattr(estat, metode)(*params), args.repeticions)*1e3
+                            for estat in estats.values()]
+                resultats = [getattr(estat, metode)(*params) for estat in estats.values()]
+                error = max(np.abs(r - resultats[0]).max() for r in resultats)
+                print(f"{res:>6} {np.dtype(dtype).name:<8}{cas:<9}" + ''.join(f"{t:>9.1f} ms" for t in temps_ms)
+                      + f"   {error:.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Prova de càrrega del servei HTTP local (michelson.servei).
+
+Obre `--clients` connexions persistents que envien peticions d'intensitat tan de
+pressa com poden, amb paràmetres triats a l'atzar d'un conjunt de `--distints`
+valors (els repetits surten de la memòria cau del servei). Mesura el rendiment
+(peticions per segon) i els percentils de la latència, separats per l'origen de
+la resposta (hit, miss o coalesced, de la capçalera X-Cache).
+
+Amb --inicia el servei s'engega dins del mateix procés en un port lliure; si no,
+es fa servir el que ja escolta a --port.
+
+    python -m benchmarks.carrega --inicia --peticions 2000 --clients 16 --res 500
+"""
+
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+import numpy as np
+
+from michelson.servei import Servei, host
+
+
+async def _peticio(lector, escriptor, cami):
+    escriptor.write(f'GET {cami} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await escriptor.drain()
+    estat = int((await lector.readline()).split()[1])
+    capcaleres = {}
+    while True:
+        linia = await lector.readline()
+        if linia in (b'\r\n', b''):
+            break
+        nom, _, valor = linia.decode('latin-1').partition(':')
+        capcaleres[nom.strip().lower()] = valor.strip()
+    cos = await lector.readexactly(int(capcaleres['content-length']))
+    return estat, capcaleres, cos
+
+
+async def _client(port, camins, latencies, errors):
+    lector, escriptor = await asyncio.open_connection(host, port)
+    try:
+        for cami in camins:
+            t0 = time.perf_counter()
+            estat, capcaleres, _ = await _peticio(lector, escriptor, cami)
+            if estat != 200:
+                errors.append(estat)
+                continue
+            latencies[capcaleres.get('x-cache', '?')].append(time.perf_counter() - t0)
+    finally:
+        escriptor.close()
+
+
+def camins(n, distints, res, format, llavor=0):
+    # Peticions del mirall esfèric amb `distints` conjunts de paràmetres diferents
+    rng = np.random.default_rng(llavor)
+    conjunts = [{'model': 'esferic', 'mirror_diff': f'{dd:.4e}', 'radi_curv': f'{r:.4f}',
+                 'res': res, 'format': format}
+                for dd, r in zip(rng.uniform(-2e-6, 2e-6, distints), rng.uniform(0.5, 20, distints))]
+    return ['/intensitat?' + urlencode(conjunts[i]) for i in rng.integers(0, distints, n)]
+
+
+async def prova(port, peticions, clients, distints, res, format):
+    tots = camins(peticions, distints, res, format)
+    latencies = defaultdict(list)
+    errors = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(port, tots[i::clients], latencies, errors) for i in range(clients)))
+    durada = time.perf_counter() - t0
+
+    fetes = sum(len(l) for l in latencies.values())
+    print(f"{fetes} peticions en {durada:.2f} s: {fetes/durada:.0f} peticions/s, {len(errors)} errors")
+    print(f"{'origen':<10}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for origen, valors in sorted(latencies.items()) + [('total', sum(latencies.values(), []))]:
+        if valors:
+            p50, p95, p99 = np.percentile(valors, [50, 95, 99])*1e3
+            print(f"{origen:<10}{len(valors):>7}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+
+
+async def _principal(args):
+    servei = None
+    port = args.port
+    if args.inicia:
+        servei = Servei(fils=args.fils, finestra=args.finestra/1000)
+        servidor = await servei.inicia(0)
+        port = servidor.sockets[0].getsockname()[1]
+    try:
+        await prova(port, args.peticions, args.clients, args.distints, args.res, args.format)
+        if servei is not None:
+            print(dict(servei.comptadors))
+    finally:
+        if servei is not None:
+            servidor.close()
+            servei.tanca()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--inicia', action='store_true', help='engega el servei dins del procés')
+    parser.add_argument('--peticions', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--distints', type=int, default=200, help='conjunts de paràmetres diferents')
+    parser.add_argument('--res', type=int, default=500)
+    parser.add_argument('--format', default='png', choices=['png', 'npy', 'raw'])
+    parser.add_argument('--fils', type=int, help='fils del servei (amb --inicia)')
+    parser.add_argument('--finestra', type=float, default=5, help="espera per agrupar (ms, amb --inicia)")
+    args = parser.parse_args()
+    asyncio.run(_principal(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Comptador de franges sobre una trajectòria llarga de Δd: mostres per segon, memòria
+màxima i exactitud del recompte i del desplaçament, comparat amb el temps de
+calcular una pantalla completa per mostra.
+
+    python -m benchmarks.comptador --mostres 10000000 --franges 2000 --detectors 4
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from michelson.comptador import ComptadorFranges, processa_trajectoria
+from michelson.estat import EstatSimulacio
+from michelson.model import long_ona
+
+
+def trajectoria(mostres, franges, mida_bloc):
+    # Anada i tornada de la platina amb una oscil·lació petita, generada per blocs
+    for inici in range(0, mostres, mida_bloc):
+        t = np.arange(inici, min(inici + mida_bloc, mostres))/mostres
+        yield franges*long_ona*(1 - np.abs(1 - 2*t)) + 0.1*long_ona*np.sin(2*np.pi*400*t)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mostres', type=int, default=10_000_000)
+    parser.add_argument('--franges', type=float, default=2000, help="franges de l'anada")
+    parser.add_argument('--detectors', type=int, default=4)
+    parser.add_argument('--obertura', type=float, default=0.2, help="radi de l'obertura (mm), 0 per a punts")
+    parser.add_argument('--soroll', type=float, default=0.01)
+    parser.add_argument('--mida-bloc', type=int, default=2**16)
+    parser.add_argument('--res', type=int, default=1000, help='resolució de la comparació amb pantalles')
+    args = parser.parse_args()
+
+    detectors = [(0.0015*i, 0.001*i, args.obertura*1e-3) for i in range(args.detectors)]
+    comptador = ComptadorFranges(detectors, 'esferic', (5,), quadratura=True, soroll=args.soroll, llavor=0)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    processa_trajectoria(comptador, trajectoria(args.mostres, args.franges, args.mida_bloc))
+    durada = time.perf_counter() - t0
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Cada oscil·lació de 0.1λ no creua els llindars: el recompte esperat és el de l'anada i la tornada
+    esperades = int(2*args.franges)
+    print(f"{args.mostres} mostres, {args.detectors} detectors amb quadratura: {durada:.2f} s, "
+          f"{args.mostres/durada/1e6:.1f} M mostres/s, pic de memòria {pic/2**20:.1f} MiB")
+    print(f"|A| dels detectors: {np.round(np.abs(comptador.amplitud), 3)}")
+    print(f"franges comptades: {comptador.franges} (esperades ~{esperades})")
+    print(f"desplaçament final: {comptador.desplacament()*1e9} nm (esperat ~0), "
+          f"salts ambigus: {comptador.salts_ambigus}")
+
+    estat = EstatSimulacio(args.res)
+    t0 = time.perf_counter()
+    for mirror_diff in np.linspace(0, long_ona, 10):
+        estat.intensitat_esferic(mirror_diff, 5)
+    per_pantalla = (time.perf_counter() - t0)/10
+    print(f"amb pantalles de {args.res}²: {per_pantalla*1e3:.1f} ms per mostra, "
+          f"{args.mostres*per_pantalla/3600:.1f} h per a tota la trajectòria "
+          f"(x{per_pantalla*args.mostres/durada:.0f})")
+
+
+if __name__ == '__main__':
+    main()
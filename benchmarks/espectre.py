@@ -0,0 +1,61 @@
+"""
+Cost de la font no monocromàtica en funció del nombre de mostres espectrals.
+
+Compara la forma tancada gaussiana amb la suma d'un espectre mostrejat, tant sobre
+el perfil radial (MapaRadial) com sobre la malla completa (EstatSimulacio).
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from michelson.espectre import Espectre
+from michelson.estat import EstatSimulacio
+from michelson.model import long_ona
+from michelson.perfil_radial import MapaRadial
+
+
+def temps(funcio, repeticions):
+    funcio()
+    t0 = time.perf_counter()
+    for _ in range(repeticions):
+        funcio()
+    return (time.perf_counter() - t0) / repeticions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--res', type=int, default=1000)
+    parser.add_argument('--mostres', type=int, nargs='+', default=[1, 4, 16, 64, 256, 1024])
+    parser.add_argument('--max-malla', type=int, default=64,
+                        help='nombre màxim de mostres que es proven sobre la malla completa')
+    parser.add_argument('--repeticions', type=int, default=3)
+    args = parser.parse_args()
+
+    mapa = MapaRadial(args.res)
+    estat = EstatSimulacio(args.res)
+    params = (0.3e-6, 5)
+
+    print(f"res = {args.res}, {len(mapa.r)} radis al perfil radial")
+    print(f"{'espectre':<22} {'perfil radial (ms)':>19} {'malla completa (ms)':>20}")
+
+    gauss = Espectre.gaussia(long_ona, 20e-9)
+    radial = temps(lambda: mapa.intensitat_esferic(*params, espectre=gauss), args.repeticions)
+    malla = temps(lambda: estat.intensitat_esferic(*params, espectre=gauss), args.repeticions)
+    print(f"{'gaussià, forma tancada':<22} {radial*1e3:19.2f} {malla*1e3:20.2f}")
+
+    for n in args.mostres:
+        longituds = np.linspace(long_ona - 20e-9, long_ona + 20e-9, n)
+        espectre = Espectre.mostrejat(longituds, np.ones(n))
+        radial = temps(lambda: mapa.intensitat_esferic(*params, espectre=espectre), args.repeticions)
+        if n <= args.max_malla:
+            malla = temps(lambda: estat.intensitat_esferic(*params, espectre=espectre), 1)
+            text_malla = f"{malla*1e3:20.2f}"
+        else:
+            text_malla = f"{'-':>20}"
+        print(f"{f'{n} mostres':<22} {radial*1e3:19.2f} {text_malla}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Càlcul de molts radis de curvatura propers: bucle de crides escalars contra el
+càlcul vectoritzat per lots, tant en perfils radials com sobre la malla completa.
+
+    python -m benchmarks.lots --n 2000 --res 1000 --n-malla 50 --res-malla 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from michelson.model import compute_intensitat, calcul_intensitat, dco_esferic, intensitat_de_dco
+from michelson.vectoritzat import intensitats_esferic, intensitats_radial, radis_perfil
+
+
+def temps(funcio):
+    t0 = time.perf_counter()
+    resultat = funcio()
+    return time.perf_counter() - t0, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n', type=int, default=2000, help='perfils radials')
+    parser.add_argument('--res', type=int, default=1000)
+    parser.add_argument('--n-malla', type=int, default=50, help='pantalles completes')
+    parser.add_argument('--res-malla', type=int, default=500)
+    parser.add_argument('--pressupost', type=float, default=256, help='memòria de treball (MiB)')
+    args = parser.parse_args()
+    pressupost = int(args.pressupost*2**20)
+
+    radis = np.linspace(4.9, 5.1, args.n)
+    r = radis_perfil(args.res)
+    t_bucle, bucle = temps(lambda: np.array([intensitat_de_dco(dco_esferic(r, 0.3e-6, radi))
+                                             for radi in radis]))
+    t_lot, lot = temps(lambda: intensitats_esferic(0.3e-6, radis, args.res, radial=True,
+                                                   pressupost=pressupost))
+    print(f"{args.n} perfils de {len(r)} radis: bucle {t_bucle*1e3:.0f} ms, lot {t_lot*1e3:.0f} ms "
+          f"(x{t_bucle/t_lot:.1f}), error {np.abs(bucle - lot).max():.1e}")
+
+    radis = np.linspace(4.9, 5.1, args.n_malla)
+    t_bucle, bucle = temps(lambda: np.array([compute_intensitat(0.3e-6, radi, args.res_malla)
+                                             for radi in radis]))
+    t_lot, lot = temps(lambda: intensitats_esferic(0.3e-6, radis, args.res_malla,
+                                                   pressupost=pressupost))
+    print(f"{args.n_malla} pantalles esfèriques de {args.res_malla}²: bucle {t_bucle*1e3:.0f} ms, "
+          f"lot {t_lot*1e3:.0f} ms (x{t_bucle/t_lot:.1f}), error {np.abs(bucle - lot).max():.1e}")
+
+    escales = np.linspace(0.49, 0.51, args.n_malla)
+    t_bucle, bucle = temps(lambda: np.array([calcul_intensitat(0.3e-6, escala, 2.5, args.res_malla)
+                                             for escala in escales]))
+    t_lot, lot = temps(lambda: intensitats_radial(0.3e-6, escales, 2.5, args.res_malla,
+                                                  pressupost=pressupost))
+    print(f"{args.n_malla} pantalles R^2.5 de {args.res_malla}²: bucle {t_bucle*1e3:.0f} ms, "
+          f"lot {t_lot*1e3:.0f} ms (x{t_bucle/t_lot:.1f}), error {np.abs(bucle - lot).max():.1e}")
+
+if __name__ == '__main__':
+    main()
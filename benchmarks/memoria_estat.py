@@ -0,0 +1,67 @@
+"""
+Memòria per fotograma: càlcul original dels scripts comparat amb EstatSimulacio.
+
+Mesura amb tracemalloc (NumPy hi registra els seus buffers) el pic de memòria i la
+memòria assignada durant un fotograma ja escalfat, i el temps mitjà per fotograma.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from michelson.estat import EstatSimulacio
+from michelson.model import screen_size, long_ona, dist_lent, factors_escala
+
+
+def calcul_intensitat_original(R, mirror_diff, escala, potencia):
+    # Còpia del càlcul original de interf_miralls_Rn_spyder.py
+    point_source_dco = -R**2/(2*dist_lent)
+    escala_ajustada = escala * factors_escala[potencia]
+    mirror_dco = -2 * R**potencia * escala_ajustada
+    dco = mirror_diff + point_source_dco + mirror_dco
+    fase = 2 * np.pi * dco / long_ona
+    return 0.5 * (1 + np.cos(fase))
+
+
+def mesura(funcio, repeticions):
+    funcio()  # escalfament (memòria cau de R**p, etc.)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for _ in range(repeticions):
+        funcio()
+    temps = (time.perf_counter() - t0) / repeticions
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return temps, pic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--res', type=int, default=1000)
+    parser.add_argument('--repeticions', type=int, default=10)
+    args = parser.parse_args()
+
+    x = np.linspace(-screen_size/2, screen_size/2, args.res)
+    X, Y = np.meshgrid(x, x)
+    R = np.sqrt(X**2 + Y**2)
+
+    estat64 = EstatSimulacio(args.res, screen_size)
+    estat32 = EstatSimulacio(args.res, screen_size, dtype=np.float32)
+    casos = [
+        ('original', lambda: calcul_intensitat_original(R, 0.3e-6, 0.5, 3.0)),
+        ('EstatSimulacio float64', lambda: estat64.intensitat_radial(0.3e-6, 0.5, 3.0)),
+        ('EstatSimulacio float32', lambda: estat32.intensitat_radial(0.3e-6, 0.5, 3.0)),
+    ]
+
+    mida = args.res**2 * 8 / 2**20
+    print(f"res = {args.res} (un array float64 de pantalla = {mida:.1f} MiB)")
+    print(f"{'càlcul':<24} {'ms/fotograma':>13} {'pic per fotograma (MiB)':>24}")
+    for nom, funcio in casos:
+        temps, pic = mesura(funcio, args.repeticions)
+        print(f"{nom:<24} {temps*1e3:13.2f} {pic/2**20:24.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Mostreig adaptatiu: resolució mínima de Nyquist i supermostreig de les corones
+exteriors, contra la malla fixa i el supermostreig uniforme de tota la pantalla.
+
+Per a cada cas s'imprimeix la resolució que tria el planificador, i a la resolució
+fixa --res el temps, les mostres calculades i l'error respecte d'un supermostreig
+uniforme de factor --referencia (la mitjana de cada píxel sencer).
+
+    python -m benchmarks.mostreig --res 1000 --max-factor 8
+"""
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from michelson.model import compute_intensitat, calcul_intensitat, dco_esferic, dco_radial, intensitat_de_dco
+from michelson.geometria import malla_radial
+from michelson.mostreig import (AvisAliasing, pendent_esferic, pendent_radial, planifica, supermostreja,
+                                intensitat_adaptativa_esferic, intensitat_adaptativa_radial)
+
+
+def temps(funcio):
+    t0 = time.perf_counter()
+    resultat = funcio()
+    return time.perf_counter() - t0, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--res', type=int, default=1000)
+    parser.add_argument('--max-factor', type=int, default=8)
+    parser.add_argument('--mostres-franja', type=float, default=2, help='mostres per franja (2 és Nyquist)')
+    parser.add_argument('--referencia', type=int, default=16, help='factor del supermostreig de referència')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', AvisAliasing)
+
+    casos = [
+        ('esfèric pla', (0.3e-6, 0), pendent_esferic, dco_esferic, compute_intensitat,
+         intensitat_adaptativa_esferic),
+        ('esfèric R=20 m', (0.3e-6, 20), pendent_esferic, dco_esferic, compute_intensitat,
+         intensitat_adaptativa_esferic),
+        ('esfèric R=5 m', (0.3e-6, 5), pendent_esferic, dco_esferic, compute_intensitat,
+         intensitat_adaptativa_esferic),
+        ('R^2.5 escala 0.1', (0.2e-6, 0.1, 2.5), pendent_radial, dco_radial, calcul_intensitat,
+         intensitat_adaptativa_radial),
+        ('R^4 escala 0.02', (0, 0.02, 4.0), pendent_radial, dco_radial, calcul_intensitat,
+         intensitat_adaptativa_radial),
+    ]
+    R = malla_radial(args.res, 0.1)
+    print(f"{'cas':<18}{'res Nyquist':>12}{'franges/píxel':>15}  {'mètode':<14}{'ms':>8}{'mostres':>12}{'error':>9}")
+    for nom, params, pendent, dco, fixa, adaptativa in casos:
+        pla = planifica(lambda r: pendent(r, *params[1:]), args.res, mostres_franja=args.mostres_franja,
+                        max_factor=args.max_factor)
+        factors = np.ones((args.res, args.res), np.int64) if pla.factors is None else pla.factors
+        n_adaptativa = int((factors.astype(np.int64)**2).sum())
+        opcions = dict(mostres_franja=args.mostres_franja)
+        referencia = supermostreja(intensitat_de_dco(dco(R, *params)), lambda r: dco(r, *params),
+                                   np.full((args.res, args.res), args.referencia))
+
+        t_fixa, fixa_ = temps(lambda: fixa(*params, res=args.res))
+        t_unif, unif = temps(lambda: supermostreja(fixa(*params, res=args.res), lambda r: dco(r, *params),
+                                                   np.full((args.res, args.res), factors.max())))
+        t_adap, (adap, _) = temps(lambda: adaptativa(*params, res=args.res, max_factor=args.max_factor,
+                                                          **opcions))
+        t_min, (_, pla_min) = temps(lambda: adaptativa(*params, res_max=args.res, max_factor=1, **opcions))
+
+        print(f"{nom:<18}{pla.res_nyquist:>12}{pla.franges_pixel:>15.2f}")
+        for metode, t, mostres, imatge in [
+                ('fixa', t_fixa, args.res**2, fixa_),
+                (f'uniforme x{factors.max()}', t_unif, args.res**2*factors.max()**2, unif),
+                ('adaptativa', t_adap, n_adaptativa, adap)]:
+            error = np.abs(imatge - referencia).max()
+            print(f"{'':<45}  {metode:<14}{t*1e3:>8.1f}{mostres:>12}{error:>9.3f}")
+        print(f"{'':<45}  {f'res {pla_min.res}':<14}{t_min*1e3:>8.1f}{pla_min.res**2:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Suite de benchmarks dels camins calents, amb referència desada i comprovació d'equivalència.
+
+Per a cada resolució mesura el temps per fotograma, la memòria assignada durant un
+fotograma (pic de tracemalloc) i el pic de RSS del procés de:
+
+- compute_intensitat (malla completa) per a diversos radis de curvatura
+- calcul_intensitat (malla completa) per a diverses potències
+- MapaRadial i EstatSimulacio, els modes que fan servir els scripts
+- PantallaInclinada amb el mirall inclinat (avaluació separable)
+- trobar_anells
+- el cicle complet d'update dels sliders: càlcul, anells, img.set_data i
+  draw_idle sobre una figura amb el backend Agg
+
+Cada cas s'executa en un procés nou, perquè el pic de RSS sigui el del cas. Abans
+dels benchmarks es comprova que tots els camins reprodueixen les fórmules originals
+dels scripts. Amb --desa-referencia els resultats es guarden com a referència; si no,
+es comparen amb la referència i el programa acaba amb error si hi ha regressions o
+si no hi ha referència.
+Els temps depenen de la màquina: la referència s'ha de desar a la mateixa màquina.
+
+    python -m benchmarks.suite --res 250 500 1000 --desa-referencia
+    python -m benchmarks.suite --res 250 500 1000
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from michelson.model import screen_size, long_ona, dist_lent, factors_escala
+
+fitxer_referencia = os.path.join(os.path.dirname(__file__), 'referencia.json')
+
+
+def compute_intensitat_original(R, mirror_diff, radi_curv):
+    # Còpia del càlcul original de interf_mirall_esferic_spyder.py
+    dco = mirror_diff - R**2/(2*dist_lent)
+    if radi_curv > 0:
+        dco += -R**2/(2*radi_curv)
+    fase = 2 * np.pi * dco / long_ona
+    return 0.5 * (1 + np.cos(fase))
+
+
+def calcul_intensitat_original(R, mirror_diff, escala, potencia):
+    # Còpia del càlcul original de interf_miralls_Rn_spyder.py
+    point_source_dco = -R**2/(2*dist_lent)
+    escala_ajustada = escala * factors_escala[potencia]
+    mirror_dco = -2 * R**potencia * escala_ajustada
+    dco = mirror_diff + point_source_dco + mirror_dco
+    fase = 2 * np.pi * dco / long_ona
+    return 0.5 * (1 + np.cos(fase))
+
+
+def comprova_equivalencia(res=500):
+    """
+    Compara tots els camins de càlcul amb les fórmules originals dels scripts.
+    Retorna una llista de (nom, error, tolerància).
+    """
+    from michelson import (compute_intensitat, calcul_intensitat, EstatSimulacio, BancFotogrames,
+                           intensitat_esferic_blocs, intensitat_radial_blocs, MapaRadial)
+    from michelson.analitic import comparar_amb_detector
+    from michelson.perfil_radial import comprovar_precisio
+    from michelson.geometria import malla_radial
+
+    R = malla_radial(res, screen_size)
+    estat = EstatSimulacio(res, screen_size)
+    banc_esferic = BancFotogrames(EstatSimulacio(res, screen_size), 'esferic', precarrega=False)
+    banc_radial = BancFotogrames(EstatSimulacio(res, screen_size), 'radial', precarrega=False)
+    casos_esferic = [(0, 0), (0.3e-6, 1), (-1.1e-6, 5), (1.7e-6, 20)]
+    casos_radial = [(0.2e-6, 0.5, p) for p in factors_escala]
+    # El nucli fusionat de cada backend opcional que estigui instal·lat
+    from michelson.backends import backends
+    estats_backend = {}
+    for nom in backends:
+        try:
+            estats_backend[nom] = EstatSimulacio(res, screen_size, backend=nom)
+        except ImportError:
+            pass
+    del estats_backend['numpy']
+
+    errors = {}
+
+    def afegeix(nom, calculat, referencia):
+        error = np.abs(np.asarray(calculat, dtype=float) - referencia).max()
+        errors[nom] = max(errors.get(nom, 0.0), error)
+
+    for params in casos_esferic:
+        ref = compute_intensitat_original(R, *params)
+        afegeix('compute_intensitat', compute_intensitat(*params, res=res), ref)
+        afegeix('EstatSimulacio.intensitat_esferic', estat.intensitat_esferic(*params), ref)
+        for nom, estat_backend in estats_backend.items():
+            afegeix(f'EstatSimulacio.intensitat_esferic [{nom}]', estat_backend.intensitat_esferic(*params), ref)
+            afegeix(f'intensitat_esferic_blocs [{nom}]', intensitat_esferic_blocs(
+                *params, res=res, dtype=np.float64, backend=estat_backend.backend), ref)
+        afegeix('intensitat_esferic_blocs', intensitat_esferic_blocs(*params, res=res,
+                                                                     dtype=np.float64), ref)
+        afegeix('BancFotogrames esferic', banc_esferic.intensitat(*params), ref)
+    for params in casos_radial:
+        ref = calcul_intensitat_original(R, *params)
+        afegeix('calcul_intensitat', calcul_intensitat(*params, res=res), ref)
+        afegeix('EstatSimulacio.intensitat_radial', estat.intensitat_radial(*params), ref)
+        for nom, estat_backend in estats_backend.items():
+            afegeix(f'EstatSimulacio.intensitat_radial [{nom}]', estat_backend.intensitat_radial(*params), ref)
+            afegeix(f'intensitat_radial_blocs [{nom}]', intensitat_radial_blocs(
+                *params, res=res, dtype=np.float64, backend=estat_backend.backend), ref)
+        afegeix('intensitat_radial_blocs', intensitat_radial_blocs(*params, res=res,
+                                                                   dtype=np.float64), ref)
+        afegeix('BancFotogrames radial', banc_radial.intensitat(*params), ref)
+
+    # Els mateixos casos en un sol lot vectoritzat
+    from michelson.vectoritzat import intensitats_esferic, intensitats_radial
+    lot = intensitats_esferic(*np.transpose(casos_esferic), res=res)
+    for params, calculat in zip(casos_esferic, lot):
+        afegeix('intensitats_esferic', calculat, compute_intensitat_original(R, *params))
+    lot = intensitats_radial(*np.transpose(casos_radial), res=res)
+    for params, calculat in zip(casos_radial, lot):
+        afegeix('intensitats_radial', calculat, calcul_intensitat_original(R, *params))
+
+    resultats = [(nom, error, 1e-12 if nom in ('compute_intensitat', 'calcul_intensitat') else 1e-6)
+                 for nom, error in errors.items()]
+    # El mode radial interpola: es compara només on les franges estan resoltes
+    precisio = comprovar_precisio(MapaRadial(res, screen_size))
+    resultats.append(('MapaRadial (píxels resolts)', max(e for _, _, e in precisio), 0.01))
+    # Els anells detectats han de coincidir amb els analítics (en píxels)
+    detector = comparar_amb_detector(res)
+    resultats.append(('trobar_anells (píxels)', np.nanmax([e for *_, e in detector]), 0.5))
+    # Mirall inclinat: avaluació separable contra la dco píxel a píxel
+    from michelson.inclinacio import comprova_inclinacio
+    resultats.append(('PantallaInclinada', max(e for _, e in comprova_inclinacio(res)), 1e-6))
+    return resultats
+
+
+def _prepara(nom, res, param):
+    # Retorna la funció que calcula un fotograma del cas
+    if nom == 'compute_intensitat':
+        from michelson import compute_intensitat
+        return lambda: compute_intensitat(0.3e-6, param, res=res)
+    if nom == 'calcul_intensitat':
+        from michelson import calcul_intensitat
+        return lambda: calcul_intensitat(0.3e-6, 0.5, param, res=res)
+    if nom == 'MapaRadial':
+        from michelson import MapaRadial
+        mapa = MapaRadial(res, screen_size)
+        out = np.empty((res, res))
+        return lambda: mapa.intensitat_esferic(0.3e-6, param, out=out)
+    if nom == 'EstatSimulacio':
+        from michelson import EstatSimulacio
+        estat = EstatSimulacio(res, screen_size)
+        return lambda: estat.intensitat_radial(0.3e-6, 0.5, param)
+    if nom == 'PantallaInclinada':
+        from michelson.inclinacio import PantallaInclinada
+        pantalla = PantallaInclinada(res, screen_size)
+        return lambda: pantalla.intensitat_esferic(0.3e-6, param, 20e-6, -10e-6)
+    if nom == 'trobar_anells':
+        from michelson import compute_intensitat, trobar_anells
+        intensitat = compute_intensitat(0.3e-6, param, res=res)
+        return lambda: trobar_anells(intensitat, screen_size)
+    if nom == 'update':
+        return _prepara_update(res, param)
+    raise ValueError(f"Cas desconegut: {nom}")
+
+
+def _prepara_update(res, radi_curv):
+    # Cicle d'update de interf_mirall_esferic_spyder.py amb el backend Agg
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from michelson import MapaRadial, trobar_anells, calcular_radi_curv
+    from michelson.anells import incertesa_radis
+
+    mapa = MapaRadial(res, screen_size)
+    fig = plt.figure(figsize=(12, 8))
+    ax = fig.add_axes([0.1, 0.25, 0.5, 0.65])
+    text_ax = fig.add_axes([0.65, 0.25, 0.3, 0.65])
+    text_ax.axis('off')
+    intensitat = mapa.intensitat_esferic(0, radi_curv)
+    img = ax.imshow(intensitat, extent=[-screen_size/2*1000, screen_size/2*1000]*2,
+                    cmap='gray', vmin=0, vmax=1)
+    text = text_ax.text(0, 0.9, '', va='top')
+    fig.canvas.draw()
+    estat = {'i': 0}
+
+    def update():
+        estat['i'] += 1
+        mirror_diff = 0.01e-6 * (estat['i'] % 200)
+        intensitat = mapa.intensitat_esferic(mirror_diff, radi_curv)
+        radis = trobar_anells(intensitat, screen_size)
+        R_calc, _ = calcular_radi_curv(radis, sigma=incertesa_radis(res))
+        img.set_data(intensitat)
+        text.set_text(f"Anells detectats: {len(radis)}\nRadi estimat: {R_calc}")
+        fig.canvas.draw_idle()
+
+    return update
+
+
+def pic_rss():
+    # Pic de RSS del procés (bytes). A Linux, ru_maxrss es conserva en fer exec
+    # des d'un procés més gran, així que es llegeix VmHWM, que és del procés nou.
+    try:
+        with open('/proc/self/status') as f:
+            for linia in f:
+                if linia.startswith('VmHWM:'):
+                    return int(linia.split()[1]) * 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def mesura_cas(nom, res, param, temps_min=0.2, repeticions_max=50):
+    """
+    S'executa en un procés nou. Retorna un diccionari amb el temps per fotograma
+    (mediana i mínim, s), la memòria assignada durant un fotograma (bytes) i el pic
+    de RSS del procés (bytes).
+    """
+    funcio = _prepara(nom, res, param)
+    funcio()  # escalfament
+    temps = []
+    inici = time.perf_counter()
+    while len(temps) < repeticions_max and (len(temps) < 3 or time.perf_counter() - inici < temps_min):
+        t0 = time.perf_counter()
+        funcio()
+        temps.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    funcio()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'temps': float(np.median(temps)), 'temps_min': min(temps), 'repeticions': len(temps),
+            'memoria': pic, 'rss': pic_rss()}
+
+
+def casos(resolucions, radis, potencies, res_malla_max):
+    llista = []
+    for res in resolucions:
+        if res <= res_malla_max:
+            llista += [('compute_intensitat', res, r) for r in radis]
+            llista += [('calcul_intensitat', res, p) for p in potencies]
+            llista.append(('EstatSimulacio', res, 3.0))
+            llista.append(('PantallaInclinada', res, 5))
+        llista.append(('MapaRadial', res, 5))
+        llista.append(('trobar_anells', res, 5))
+        llista.append(('update', res, 5))
+    return llista
+
+
+def regressions(resultats, referencia, tol_temps, tol_memoria):
+    # Llista de (clau, mètrica, valor, referència) que superen la tolerància
+    dolents = []
+    for clau, mesura in resultats.items():
+        ref = referencia.get(clau)
+        if ref is None:
+            continue
+        # El temps mínim és molt menys sorollós que la mediana
+        if mesura['temps_min'] > ref['temps_min'] * (1 + tol_temps):
+            dolents.append((clau, 'temps_min', mesura['temps_min'], ref['temps_min']))
+        if mesura['memoria'] > ref['memoria'] * (1 + tol_memoria) + 2**20:
+            dolents.append((clau, 'memoria', mesura['memoria'], ref['memoria']))
+    return dolents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--res', type=int, nargs='+', default=[250, 500, 1000, 2000, 4000, 8000])
+    parser.add_argument('--radis', type=float, nargs='+', default=[0, 1, 5, 20])
+    parser.add_argument('--potencies', type=float, nargs='+', default=[0.5, 1.0, 2.0, 3.0, 4.0])
+    parser.add_argument('--res-malla-max', type=int, default=8000,
+                        help='resolució màxima dels casos sobre la malla completa')
+    parser.add_argument('--referencia', default=fitxer_referencia)
+    parser.add_argument('--desa-referencia', action='store_true')
+    parser.add_argument('--tol-temps', type=float, default=0.3,
+                        help='augment relatiu de temps que compta com a regressió')
+    parser.add_argument('--tol-memoria', type=float, default=0.1,
+                        help='augment relatiu de memòria que compta com a regressió')
+    parser.add_argument('--nomes-equivalencia', action='store_true')
+    args = parser.parse_args()
+
+    errors_equivalencia = 0
+    print("Equivalència amb les fórmules originals")
+    for nom, error, tolerancia in comprova_equivalencia():
+        estat = 'ok' if error <= tolerancia else 'ERROR'
+        errors_equivalencia += estat != 'ok'
+        print(f"  {nom:<38} {error:10.2e} (tol. {tolerancia:.0e})  {estat}")
+    if args.nomes_equivalencia:
+        sys.exit(1 if errors_equivalencia else 0)
+
+    # Importat aquí: cada cas en un procés nou, per mesurar-ne el pic de RSS
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    resultats = {}
+    print(f"\n{'cas':<36} {'ms/fotograma':>13} {'memòria (MiB)':>14} {'pic RSS (MiB)':>14}")
+    for nom, res, param in casos(args.res, args.radis, args.potencies, args.res_malla_max):
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as grup:
+            mesura = grup.submit(mesura_cas, nom, res, param).result()
+        clau = f"{nom}[{param:g}] res={res}"
+        resultats[clau] = mesura
+        print(f"{clau:<36} {mesura['temps']*1e3:13.2f} {mesura['memoria']/2**20:14.1f} "
+              f"{mesura['rss']/2**20:14.1f}", flush=True)
+
+    if args.desa_referencia:
+        referencia = {}
+        if os.path.exists(args.referencia):
+            with open(args.referencia, encoding='utf-8') as f:
+                referencia = json.load(f)
+        referencia.update(resultats)
+        with open(args.referencia, 'w', encoding='utf-8') as f:
+            json.dump(referencia, f, indent=1, sort_keys=True)
+        print(f"\nReferència desada a {args.referencia}")
+        sys.exit(1 if errors_equivalencia else 0)
+
+    if not os.path.exists(args.referencia):
+        print(f"\nNo hi ha referència a {args.referencia}: deseu-la amb --desa-referencia")
+        sys.exit(1)
+    with open(args.referencia, encoding='utf-8') as f:
+        referencia = json.load(f)
+    dolents = regressions(resultats, referencia, args.tol_temps, args.tol_memoria)
+    sense_referencia = [clau for clau in resultats if clau not in referencia]
+    if sense_referencia:
+        print(f"\nCasos sense referència (no s'han comparat): {', '.join(sense_referencia)}")
+    for clau, metrica, valor, ref in dolents:
+        print(f"REGRESSIÓ {clau}: {metrica} {valor:.4g} (referència {ref:.4g})")
+    sys.exit(1 if dolents or errors_equivalencia else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,97 +8,48 @@ Created on Wed May 28 15:55:01 2025
 import matplotlib
 matplotlib.use('Qt5Agg')
 
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
 
-# Paràmetres bàsics
-screen_size = 0.1    # pantalla 10 cm x 10 cm  
-res = 1000           # 1000 x 1000 píxels
-long_ona = 500e-9    # longitud d'ona (color verd)
-dist_lent = 500    # distància de la lent expansora
+from michelson.analitic import mesura_esferic
+from michelson.anells import trobar_anells, calcular_radi_curv, incertesa_radis
+from michelson.bucle import BucleRender
+from michelson.cronometre import Cronometre
+from michelson.estat import EstatSimulacio
+from michelson.inclinacio import PantallaInclinada
+from michelson.model import screen_size, res  # Paràmetres bàsics
+from michelson.mostreig import pendent_esferic, pendent_desalineat, resolt, text_aliasing
+from michelson.perfil_radial import MapaRadial
+
 default_mirror_diff = 0  # diferència de distància entre els braços (m)
 default_curvature = 0    # radi de curvatura inicial
 
-# Pantalla
-x = np.linspace(-screen_size/2, screen_size/2, res)
-X, Y = np.meshgrid(x, x)
-R = np.sqrt(X**2 + Y**2)
-
-def compute_intensitat(mirror_diff, radi_curv):
-    # Diferència de camí òptic  
-    dco = mirror_diff - R**2/(2*dist_lent)  # Font puntual (front d'ona esfèric)
-                                            # El signe negatiu és el conveni escollit en aquest codi
-    # Mirall corbat
-    if radi_curv > 0: # per R=0 és un cas especial, en aquest codi significa un mirall pla
-        dco += -R**2/(2*radi_curv)  # Mirall convex. S'afegeix un altre terme negatiu perquè els rajos 
-                                           # de les puntes de la font encara recorren més distància
-    # Convertim dco a fase
-    fase = 2 * np.pi * dco / long_ona
-    
-    # Calcular intensitat, assumint font perfectament monocromàtica, és a dir, |g|=1
-    return 0.5 * (1 + np.cos(fase))
-
-def calcular_radi_curv(r1, r2):
-    """
-    r1: radi del primer anell brillant (m)
-    r2: radi del segon anell brillant (m)
-    
-    Per anells consecutius m i m+1:
-    r_{m+1}^2/(2R) - r_m^2/(2R) = λ
-    Llavors R = (r_{m+1}^2 - r_m^2)/(2λ)
-    """
-    if r1 is None or r2 is None or r1 >= r2: # per assegurar que no troba anells falsos 
-        return None
-        
-    dr2 = r2*r2 - r1*r1
-    R = dr2/(2*long_ona)
-    
-    if R > 0:
-        return R
-    return None
-
-def trobar_anells(intensitat): # ens busca els 2 primers anells consecutius més brillants aproximadament
-    # Fem servir el perfil d'un dels costats
-    perfil = intensitat[res//2, res//2:]
-    
-    # Trobem els màxims locals
-    maxims_posicions = []
-    maxims_valors = []
-    
-    for i in range(1, len(perfil)-1):
-        if perfil[i] > perfil[i-1] and perfil[i] > perfil[i+1]: 
-            # Mirem que sigui un pic notable, per evitar pics falsos
-            if perfil[i] > 0.7:  #per evitar pics falsos
-                maxims_posicions.append(i)
-                maxims_valors.append(perfil[i])
-    
-    if len(maxims_posicions) >= 2:
-        # Ordenem els pics per posició
-        ordenacio_indexs = np.argsort(maxims_posicions)
-        ordenacio_posicions = np.array(maxims_posicions)[ordenacio_indexs]
-        
-        # Primer anell
-        r1_idx = ordenacio_posicions[0]
-        r1 = abs(x[r1_idx + res//2])
-        
-        # Busquem el segon anell a una distància sqrt(2), ja que ho prediu la teoria, evitant pics falsos
-        expect_r2_idx = r1_idx * np.sqrt(2)  # Posició esperada del segon anell
-
-        # Trobem el pic més proper a aquesta distància
-        r2_idx = None
-        min_diff = float('inf')
-        for pos in ordenacio_posicions[1:]:
-            diff = abs(pos - expect_r2_idx)
-            if diff < min_diff:
-                min_diff = diff
-                r2_idx = pos
-        
-        if r2_idx is not None:
-            r2 = abs(x[r2_idx + res//2])
-            return r1, r2
-    
-    return None, None
+mode_radial = True   # calcula el patró sobre un perfil radial 1D i l'expandeix a la pantalla
+font_x, font_y = 0, 0  # desplaçament del centre de la font puntual (m)
+espectre = None      # font monocromàtica; p. ex. michelson.espectre.Espectre.gaussia(amplada=20e-9) per a una font de 20 nm d'amplada
+mostra_temps = False # mostra al panell de text els FPS i el temps de cada etapa de l'update
+fitxer_traca = None  # p. ex. 'traca.json' per desar la traça de temps en tancar la finestra
+backend = 'auto'     # càlcul de la malla completa: 'numpy', 'numexpr', 'numba' o 'auto' (el més ràpid dels instal·lats)
+
+# Pantalla: la geometria es construeix al nucli segons el mode de càlcul
+mapa_radial = MapaRadial(res, screen_size) if mode_radial else None
+estat = EstatSimulacio(res, screen_size, backend=backend) if not mode_radial else None  # termes geomètrics precalculats
+previsualitzacio = MapaRadial(res//4, screen_size)  # patró de baixa resolució mentre s'arrossega un slider
+# Amb el mirall inclinat o la font descentrada la dco ja no depèn només de R
+inclinada = PantallaInclinada(res, screen_size, backend=backend)
+previsualitzacio_inclinada = PantallaInclinada(res//4, screen_size, backend=backend)
+
+def desalineat(theta_x, theta_y):
+    return theta_x != 0 or theta_y != 0 or font_x != 0 or font_y != 0
+
+def compute_intensitat(mirror_diff, radi_curv, theta_x=0, theta_y=0):
+    if desalineat(theta_x, theta_y):
+        return inclinada.intensitat_esferic(mirror_diff, radi_curv, theta_x, theta_y, font_x, font_y,
+                                            espectre=espectre)
+    if mode_radial:
+        return mapa_radial.intensitat_esferic(mirror_diff, radi_curv, espectre=espectre)
+    # Fase i intensitat calculades dins dels buffers de l'estat
+    return estat.intensitat_esferic(mirror_diff, radi_curv, espectre=espectre)
 
 # Creació de la figura
 fig = plt.figure(figsize=(12, 8))
@@ -107,75 +58,132 @@ ax = fig.add_subplot(gs[0])
 text_ax = fig.add_subplot(gs[1])
 text_ax.axis('off')
 
-plt.subplots_adjust(left=0.1, bottom=0.2, right=0.9, top=0.9)
+plt.subplots_adjust(left=0.1, bottom=0.3, right=0.9, top=0.9)
 
 # Plot inicial
 intensitat = compute_intensitat(default_mirror_diff, default_curvature)
 img = ax.imshow(intensitat,
                extent=[-screen_size/2, screen_size/2, -screen_size/2, screen_size/2],
-               cmap='gray', vmin=0, vmax=1)
+               cmap='gray', vmin=0, vmax=1, origin='lower')
 ax.set_title('Interferòmetre de Michelson: mirall esfèric')
 ax.set_xlabel('x (m)')
 ax.set_ylabel('y (m)')
 plt.colorbar(img, ax=ax, label='intensitat')
 
 # Afegim sliders
-ax_slider_d = plt.axes([0.2, 0.1, 0.4, 0.03])
-ax_slider_r = plt.axes([0.2, 0.05, 0.4, 0.03])
+ax_slider_d = plt.axes([0.2, 0.2, 0.4, 0.03])
+ax_slider_r = plt.axes([0.2, 0.15, 0.4, 0.03])
+ax_slider_tx = plt.axes([0.2, 0.1, 0.4, 0.03])
+ax_slider_ty = plt.axes([0.2, 0.05, 0.4, 0.03])
 
 slider_d = Slider(ax_slider_d, 'Distància miralls Δd (µm)', -2, 2, valinit=0)
 slider_r = Slider(ax_slider_r, 'Radi curvatura R (m)', 0, 20, valinit=0)
+slider_tx = Slider(ax_slider_tx, 'Inclinació θx (µrad)', -50, 50, valinit=0)
+slider_ty = Slider(ax_slider_ty, 'Inclinació θy (µrad)', -50, 50, valinit=0)
 
 slider_d.valtext.set_text(f'{0:.2f} µm') # valors en µm
 slider_r.valtext.set_text(f'{0:.2f} m')
+slider_tx.valtext.set_text(f'{0:.1f} µrad')
+slider_ty.valtext.set_text(f'{0:.1f} µrad')
 
 # Add text for measurements in the right area
 text_measurements = text_ax.text(0.1, 0.7, '', transform=text_ax.transAxes,
                                verticalalignment='top')
 
-def update(val):
-    mirror_diff = slider_d.val * 1e-6  # Convertim µm a m
-    curvature = slider_r.val
-    
-    new_intensitat = compute_intensitat(mirror_diff, curvature)
-    img.set_data(new_intensitat)
-    
-    slider_d.valtext.set_text(f'{slider_d.val:.2f} µm')
-    slider_r.valtext.set_text(f'{slider_r.val:.2f} m')
-    
-    # càlcul del radi de curvatura a partir dels anells
+# Avís quan les franges són més denses que els píxels (calculat del model, sense la imatge)
+text_avis = text_ax.text(0.1, 0.95, '', transform=text_ax.transAxes, verticalalignment='top',
+                         color='tab:red', fontsize=9)
+
+# Temps de cada etapa (el dibuix complet es mesura al canvas)
+cronometre = Cronometre()
+cronometre.instrumenta_canvas(fig.canvas)
+text_temps = text_ax.text(0.1, 0.05, '', transform=text_ax.transAxes, verticalalignment='bottom',
+                          family='monospace', fontsize=8)
+
+# Detecció dels anells i radi de curvatura estimat; retorna el text del panell
+def mesura_anells(mirror_diff, curvature, new_intensitat):
     if curvature > 0.3:  # així s'eviten curvatures extremes
-        r1, r2 = trobar_anells(new_intensitat)
-        if r1 is not None and r2 is not None:
-            r1_theory = np.sqrt(2 * 1 * curvature * long_ona)  # Primer anell (m=1)
-            r2_theory = np.sqrt(2 * 2 * curvature * long_ona)  # Segon anell (m=2)
+        radis = trobar_anells(new_intensitat, screen_size)
+        if len(radis) >= 2:
+            r1, r2 = radis[0], radis[1]
+            # Predicció del model de dco, tenint en compte Δd i la font puntual
+            r1_theory, r2_theory = mesura_esferic(mirror_diff, curvature, screen_size/2).radis[:2]
             
             print(f"\nPer curvatura R = {curvature:.2f} m:")
-            print(f"Anells detectats: r1 = {r1*1000:.2f} mm, r2 = {r2*1000:.2f} mm")
+            print(f"Anells detectats: {len(radis)}, r1 = {r1*1000:.2f} mm, r2 = {r2*1000:.2f} mm")
             print(f"Predicció teòrica: r1 = {r1_theory*1000:.2f} mm, r2 = {r2_theory*1000:.2f} mm")
             
-            R_calc = calcular_radi_curv(r1, r2)
+            # Ajust per mínims quadrats sobre tots els anells detectats; si les franges no
+            # estan resoltes fins a l'últim anell, els anells poden ser un moiré i no es mostra
+            res_imatge = new_intensitat.shape[0]
+            R_calc, incertesa = calcular_radi_curv(radis, sigma=incertesa_radis(res_imatge, screen_size))
+            if not resolt(lambda R: pendent_esferic(R, curvature), radis[-1], res_imatge, screen_size):
+                R_calc = None
+            text = f"Anells detectats: {len(radis)}\n"
+            text += f"Radi primer anell brillant: {r1*1000:.2f} mm\n"
+            text += f"Radi segon anell brillant: {r2*1000:.2f} mm\n"
+            text += f"distància entre anells: {((r2-r1)*1000):.2f} mm\n"
             if R_calc is not None:
-                text = f"Radi primer anell brillant: {r1*1000:.2f} mm\n"
-                text += f"Radi segon anell brillant: {r2*1000:.2f} mm\n"
-                text += f"distància entre anells: {((r2-r1)*1000):.2f} mm\n"
-                text += f"Radi de curvatura estimat: {R_calc:.2f} m\n"
+                if incertesa is not None:
+                    text += f"Radi de curvatura estimat: {R_calc:.2f} ± {incertesa:.2f} m\n"
+                else:
+                    text += f"Radi de curvatura estimat: {R_calc:.2f} m\n"
                 text += f"(Predicció teòrica: r1 = {r1_theory*1000:.2f} mm, r2 = {r2_theory*1000:.2f} mm)"
-                text_measurements.set_text(text)
             else:
-                text = f"Radi primer anell brillant: {r1*1000:.2f} mm\n"
-                text += f"Radi segon anell brillant: {r2*1000:.2f} mm\n"
-                text += f"distància entre anells: {((r2-r1)*1000):.2f} mm\n"
                 text += "No es pot calcular el radi de curvatura"
-                text_measurements.set_text(text)
-        else:
-            text_measurements.set_text('No es poden detectar bé els anells')
-    else:
-        text_measurements.set_text('')
-    
-    fig.canvas.draw_idle()
-
-slider_d.on_changed(update)
-slider_r.on_changed(update)
+            return text
+        return 'No es poden detectar bé els anells'
+    return ''
+
+def calcula(params, previsualitza):
+    # Cridada al fil treballador del bucle de render
+    mirror_diff, curvature, theta_x, theta_y = params
+    if previsualitza:
+        if desalineat(theta_x, theta_y):
+            return previsualitzacio_inclinada.intensitat_esferic(*params, font_x, font_y,
+                                                                 espectre=espectre), None
+        return previsualitzacio.intensitat_esferic(mirror_diff, curvature, espectre=espectre), None
+    new_intensitat = compute_intensitat(*params)
+    if desalineat(theta_x, theta_y):
+        # trobar_anells suposa els anells centrats a la pantalla
+        return new_intensitat, 'Mirall desalineat: els anells no estan centrats'
+    # càlcul del radi de curvatura a partir dels anells, només a resolució completa
+    with cronometre.etapa('anells'):
+        text = mesura_anells(mirror_diff, curvature, new_intensitat)
+    return new_intensitat, text
+
+def mostra(resultat):
+    new_intensitat, text = resultat
+    img.set_data(new_intensitat)
+    if text is not None:
+        text_measurements.set_text(text)
+    if mostra_temps:
+        text_temps.set_text(cronometre.text())
+
+# El càlcul es fa en un fil treballador i només es redibuixen la imatge, els textos i els sliders
+sliders = (slider_d, slider_r, slider_tx, slider_ty)
+for slider in sliders:
+    slider.drawon = False
+bucle = BucleRender(fig, calcula, mostra,
+                    [img, text_measurements, text_avis, text_temps] + [slider.ax for slider in sliders],
+                    arrossegant=lambda: any(slider.drag_active for slider in sliders),
+                    cronometre=cronometre)
+
+def update(val):
+    slider_d.valtext.set_text(f'{slider_d.val:.2f} µm')
+    slider_r.valtext.set_text(f'{slider_r.val:.2f} m')
+    slider_tx.valtext.set_text(f'{slider_tx.val:.1f} µrad')
+    slider_ty.valtext.set_text(f'{slider_ty.val:.1f} µrad')
+    # Convertim µm a m i µrad a rad
+    theta_x, theta_y = slider_tx.val * 1e-6, slider_ty.val * 1e-6
+    text_avis.set_text(text_aliasing(lambda R: pendent_esferic(R, slider_r.val), res, screen_size,
+                                     pendent_desalineat(theta_x, theta_y, font_x, font_y)))
+    bucle.demana((slider_d.val * 1e-6, slider_r.val, theta_x, theta_y))
+
+for slider in sliders:
+    slider.on_changed(update)
+
+if fitxer_traca is not None:
+    fig.canvas.mpl_connect('close_event', lambda event: cronometre.exporta_json(fitxer_traca))
 
 plt.show()
\ No newline at end of file
@@ -11,45 +11,64 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
 
-screen_size = 0.1    # pantalla 10 cm x 10 cm  
-res = 1000           # 1000 x 1000 píxels
-long_ona = 500e-9    # longitud d'ona (color verd)
-dist_lent = 500      # distància de la lent expansora
+from michelson.banc import BancFotogrames
+from michelson.bucle import BucleRender
+from michelson.cronometre import Cronometre
+from michelson.estat import EstatSimulacio
+from michelson.inclinacio import PantallaInclinada
+from michelson.model import screen_size, res, noms_forma, unitat_deformacio  # Paràmetres bàsics
+from michelson.mostreig import pendent_radial, pendent_desalineat, text_aliasing
+from michelson.perfil_radial import MapaRadial
+
 default_mirror_diff = 0  # diferència de distància entre els braços (m)
 default_angle = 0    # Angle o deformació inicial
 default_potencia = 1    # Potència per defecte, variable més tard
 
-# Pantalla
-x = np.linspace(-screen_size/2, screen_size/2, res)
-X, Y = np.meshgrid(x, x)
-R = np.sqrt(X**2 + Y**2)
-
-def calcul_intensitat(mirror_diff, escala, potencia):
-    # Diferència de camí òptic  
-    point_source_dco = -R**2/(2*dist_lent)
-    
-    # Els factors d'escala estan posats perquè la deformació sigui aproximadament equivalent en totes les potències de R
-    factors_escala = {
-        0.5: 1e-4,     # intermig
-        1.0: 1e-3,     # angle en mrad pel con
-        1.5: 5e-2,     # intermig
-        2.0: 1e-1,     # 1/m pel paraboloide
-        2.5: 1e0,      # intermig
-        3.0: 1e1,      # 1/m² pel cúbic
-        3.5: 1e2,      # intermig
-        4.0: 1e3       # 1/m³ pel quàrtic
-    }
-    escala_ajustada = escala * factors_escala[potencia]
-    mirror_dco = -2 * R**potencia * escala_ajustada
-    
-    # Dco total
-    dco = mirror_diff + point_source_dco + mirror_dco
-    
-    # Convertim dco a fase
-    fase = 2 * np.pi * dco / long_ona
-    
-    # Calculem la intensitat, assumint llum perfectament monocromàtica, |g|=1
-    return 0.5 * (1 + np.cos(fase))
+mode_radial = True   # calcula el patró sobre un perfil radial 1D i l'expandeix a la pantalla
+mode_banc = True     # guarda els fotogrames calculats (LRU) i precarrega els veïns dels sliders; té prioritat sobre mode_radial
+font_x, font_y = 0, 0  # desplaçament del centre de la font puntual (m)
+espectre = None      # font monocromàtica; p. ex. michelson.espectre.Espectre.gaussia(amplada=20e-9) per a una font de 20 nm d'amplada
+mostra_temps = False # mostra al panell de text els FPS i el temps de cada etapa de l'update
+fitxer_traca = None  # p. ex. 'traca.json' per desar la traça de temps en tancar la finestra
+backend = 'auto'     # càlcul de la malla completa: 'numpy', 'numexpr', 'numba' o 'auto' (el més ràpid dels instal·lats)
+
+# Pantalla: la geometria es construeix al nucli segons el mode de càlcul
+# Amb una font no monocromàtica el càlcul es fa sempre sobre el perfil radial
+mode_radial = mode_radial or espectre is not None
+mode_banc = mode_banc and espectre is None
+mapa_radial = MapaRadial(res, screen_size) if mode_radial and not mode_banc else None
+estat = EstatSimulacio(res, screen_size, backend=backend) if not (mode_radial or mode_banc) else None  # termes geomètrics precalculats
+# El banc treballa sobre la malla completa en float32, amb els passos dels sliders
+banc = BancFotogrames(EstatSimulacio(res, screen_size, dtype=np.float32, backend=backend), 'radial',
+                      passos=(0.01e-6, 1e-3, 0.5)) if mode_banc else None
+previsualitzacio = MapaRadial(res//4, screen_size)  # patró de baixa resolució mentre s'arrossega un slider
+# Amb el mirall inclinat o la font descentrada la dco ja no depèn només de R
+inclinada = PantallaInclinada(res, screen_size, backend=backend)
+previsualitzacio_inclinada = PantallaInclinada(res//4, screen_size, backend=backend)
+
+def desalineat(theta_x, theta_y):
+    return theta_x != 0 or theta_y != 0 or font_x != 0 or font_y != 0
+
+def calcul_intensitat(mirror_diff, escala, potencia, theta_x=0, theta_y=0):
+    if desalineat(theta_x, theta_y):
+        return inclinada.intensitat_radial(mirror_diff, escala, potencia, theta_x, theta_y,
+                                           font_x, font_y, espectre=espectre)
+    if mode_banc:
+        return banc.intensitat(mirror_diff, escala, potencia)
+    if mode_radial:
+        return mapa_radial.intensitat_radial(mirror_diff, escala, potencia, espectre=espectre)
+    # Fase i intensitat calculades dins dels buffers de l'estat
+    return estat.intensitat_radial(mirror_diff, escala, potencia)
+
+def calcula(params, previsualitza):
+    # Cridada al fil treballador del bucle de render
+    mirror_diff, escala, potencia, theta_x, theta_y = params
+    if previsualitza:
+        if desalineat(theta_x, theta_y):
+            return previsualitzacio_inclinada.intensitat_radial(*params, font_x, font_y,
+                                                                espectre=espectre)
+        return previsualitzacio.intensitat_radial(mirror_diff, escala, potencia, espectre=espectre)
+    return calcul_intensitat(*params)
 
 # Creem la figura
 fig = plt.figure(figsize=(12, 8))  
@@ -58,66 +77,92 @@ ax = fig.add_subplot(gs[0])
 text_ax = fig.add_subplot(gs[1])  
 text_ax.axis('off') 
 
-plt.subplots_adjust(left=0.1, bottom=0.25, right=0.9, top=0.9)  
+plt.subplots_adjust(left=0.1, bottom=0.35, right=0.9, top=0.9)  
 
 
 intensitat = calcul_intensitat(default_mirror_diff, default_angle, default_potencia)
 img = ax.imshow(intensitat,
                extent=[-screen_size/2, screen_size/2, -screen_size/2, screen_size/2],
-               cmap='gray', vmin=0, vmax=1)
+               cmap='gray', vmin=0, vmax=1, origin='lower')
 ax.set_title('Interferòmetre de Michelson: miralls radials')
 ax.set_xlabel('x (m)')
 ax.set_ylabel('y (m)')
 plt.colorbar(img, ax=ax, label='intensitat')
 
-ax_slider_d = plt.axes([0.2, 0.15, 0.4, 0.03])  
-ax_slider_a = plt.axes([0.2, 0.10, 0.4, 0.03])  
-ax_slider_p = plt.axes([0.2, 0.05, 0.4, 0.03])  
+ax_slider_d = plt.axes([0.2, 0.25, 0.4, 0.03])  
+ax_slider_a = plt.axes([0.2, 0.20, 0.4, 0.03])  
+ax_slider_p = plt.axes([0.2, 0.15, 0.4, 0.03])  
+ax_slider_tx = plt.axes([0.2, 0.10, 0.4, 0.03])
+ax_slider_ty = plt.axes([0.2, 0.05, 0.4, 0.03])
 
 slider_d = Slider(ax_slider_d, 'Diferència miralls Δd (µm)', -2, 2, valinit=0)
 slider_a = Slider(ax_slider_a, 'Deformació (mrad)', 0, 1, valinit=0)
 slider_p = Slider(ax_slider_p, 'Potència de R', 0.5, 4, valinit=1, valstep=0.5)
+slider_tx = Slider(ax_slider_tx, 'Inclinació θx (µrad)', -50, 50, valinit=0)
+slider_ty = Slider(ax_slider_ty, 'Inclinació θy (µrad)', -50, 50, valinit=0)
 
 slider_d.valtext.set_text(f'{0:.2f} µm')
 slider_a.valtext.set_text(f'{0:.3f}')
 slider_p.valtext.set_text(f'{1:.1f}')
+slider_tx.valtext.set_text(f'{0:.1f} µrad')
+slider_ty.valtext.set_text(f'{0:.1f} µrad')
+
+# Temps de cada etapa (el dibuix complet es mesura al canvas)
+cronometre = Cronometre()
+cronometre.instrumenta_canvas(fig.canvas)
+# Avís quan les franges són més denses que els píxels (calculat del model, sense la imatge)
+text_avis = text_ax.text(0, 0.95, '', transform=text_ax.transAxes, verticalalignment='top',
+                         color='tab:red', fontsize=9)
+text_temps = text_ax.text(0, 0.05, '', transform=text_ax.transAxes, verticalalignment='bottom',
+                          family='monospace', fontsize=8)
+
+def mostra(new_intensitat):
+    img.set_data(new_intensitat)
+    if mostra_temps:
+        text_temps.set_text(cronometre.text())
+
+# El càlcul es fa en un fil treballador i només es redibuixen la imatge, els sliders i el text de temps
+sliders = (slider_d, slider_a, slider_p, slider_tx, slider_ty)
+for slider in sliders:
+    slider.drawon = False
+bucle = BucleRender(fig, calcula, mostra, [img, text_avis, text_temps] + [slider.ax for slider in sliders],
+                    arrossegant=lambda: any(slider.drag_active for slider in sliders),
+                    cronometre=cronometre)
 
 def update(val):
     mirror_diff = slider_d.val * 1e-6  # Convertim µm a m
     escala = slider_a.val
     potencia = slider_p.val
     
-    new_intensitat = calcul_intensitat(mirror_diff, escala, potencia)
-    img.set_data(new_intensitat)
-    
     slider_d.valtext.set_text(f'{slider_d.val:.2f} µm')
     slider_a.valtext.set_text(f'{escala:.3f}')
     slider_p.valtext.set_text(f'{potencia:.1f}')
+    slider_tx.valtext.set_text(f'{slider_tx.val:.1f} µrad')
+    slider_ty.valtext.set_text(f'{slider_ty.val:.1f} µrad')
     
-    nom_forma = {
-        0.5: "sqrt(R)",
-        1.0: "Con",
-        1.5: "R^1.5",
-        2.0: "Paraboloide",
-        2.5: "R^2.5",
-        3.0: "Cúbic",
-        3.5: "R^3.5",
-        4.0: "Quàrtic"
-    }
-    ax.set_title(f'Interferòmetre de Michelson: mirall {nom_forma.get(potencia, f"R^{potencia}")}')
+    # El títol no es dibuixa amb blit: només es redibuixa tota la figura quan canvia
+    titol = f'Interferòmetre de Michelson: mirall {noms_forma.get(potencia, f"R^{potencia}")}'
+    if titol != ax.get_title():
+        ax.set_title(titol)
+        bucle.redibuixa()
     
     # Cada dependència en R té una unitat diferent del factor de deformació
-    if potencia == int(potencia):
-        units = {1: "mrad", 2: "1/m", 3: "1/m²", 4: "1/m³"}
-        unit = units.get(int(potencia), f"1/m^{int(potencia)-1}")
-    else:
-        unit = f"1/m^{potencia-1}"
-    slider_a.label.set_text(f'Deformació ({unit})')
+    slider_a.label.set_text(f'Deformació ({unitat_deformacio(potencia)})')
     
-    fig.canvas.draw_idle()
+    theta_x, theta_y = slider_tx.val * 1e-6, slider_ty.val * 1e-6  # µrad a rad
+    text_avis.set_text(text_aliasing(lambda R: pendent_radial(R, escala, potencia), res, screen_size,
+                                     pendent_desalineat(theta_x, theta_y, font_x, font_y)))
+    bucle.demana((mirror_diff, escala, potencia, theta_x, theta_y))
+
+for slider in sliders:
+    slider.on_changed(update)
+
+def on_close(event):
+    if mode_banc:
+        banc.tanca()
+    if fitxer_traca is not None:
+        cronometre.exporta_json(fitxer_traca)
 
-slider_d.on_changed(update)
-slider_a.on_changed(update)
-slider_p.on_changed(update)
+fig.canvas.mpl_connect('close_event', on_close)
 
 plt.show()
\ No newline at end of file
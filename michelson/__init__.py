@@ -0,0 +1,30 @@
+"""
+Nucli de càlcul de les simulacions de l'interferòmetre de Michelson.
+
+Els scripts de Spyder i de Colab són només la interfície gràfica sobre aquest
+paquet. Importar-lo no importa matplotlib ni Qt i no crea cap figura ni cap array:
+la geometria es construeix (i es guarda) la primera vegada que es necessita.
+"""
+
+from .model import (screen_size, res, long_ona, dist_lent, factors_escala, factor_escala,
+                    noms_forma, unitat_deformacio, dco_esferic, dco_radial, intensitat_de_dco,
+                    compute_intensitat, calcul_intensitat)
+from .ajust import Ajust, AjustadorInterferograma, ajusta_interferograma, carrega_interferograma
+from .analitic import MesuraAnells, mesura_esferic, mesura_radial
+from .anells import perfil_azimutal, trobar_anells, calcular_radi_curv
+from .backends import tria_backend
+from .banc import BancFotogrames
+from .blocs import calcula_per_blocs, intensitat_esferic_blocs, intensitat_radial_blocs
+from .bucle import BucleRender
+from .comptador import Detector, ComptadorFranges, processa_trajectoria
+from .cronometre import Cronometre
+from .espectre import Espectre
+from .estat import EstatSimulacio
+from .imatges import codifica_png
+from .inclinacio import PantallaInclinada, dco_esferic_inclinat, dco_radial_inclinat
+from .mostreig import (PlaMostreig, AvisAliasing, planifica, resolucio_minima, franges_per_pixel,
+                       intensitat_adaptativa_esferic, intensitat_adaptativa_radial)
+from .perfil_radial import MapaRadial
+from .superficie import (SumaRadial, Zernike, MapaAlcades, noll_a_nm, polinomi_zernike,
+                         base_zernike, dco_superficie, intensitat_superficie)
+from .vectoritzat import intensitats, intensitats_esferic, intensitats_radial, radis_perfil
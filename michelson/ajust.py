@@ -0,0 +1,335 @@
+"""
+Problema invers: ajust dels paràmetres del mirall a partir d'un interferograma.
+
+La imatge es redueix al perfil azimutal (una sola passada de bincount) i el model
+I(r) = fons + contrast * cos(k dco(r)) s'ajusta sobre el perfil, amb les mateixes
+fórmules de dco que el càlcul directe. L'ajust va de gruixut a fi:
+
+1. Cerca en graella de la part no lineal (curvatura, o escala i potència). Cada
+   candidat s'avalua només sobre els radis on resol les franges; el fons, el
+   contrast i Δd surten d'uns mínims quadrats lineals, resolts per a tots els
+   candidats alhora amb sistemes 3x3 vectoritzats.
+2. Gauss-Newton (amb amortiment de Levenberg-Marquardt) i jacobians analítics sobre
+   la meitat interior del perfil i després sobre tot el perfil. A cada iteració es
+   descarten els radis on el model prediu franges no resoltes.
+
+Amb AjustadorInterferograma, cada fotograma d'una seqüència parteix de l'ajust de
+l'anterior i només torna a fer la cerca en graella si l'ajust no convergeix bé.
+
+Una sola imatge només determina Δd mòdul λ: el resultat es dona dins de [0, λ).
+El centre dels anells ha de ser el centre de la imatge.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from .anells import _intervals_radials
+from .model import (screen_size, long_ona, dist_lent, factors_escala, factor_escala,
+                    dco_esferic, dco_radial, compute_intensitat, calcul_intensitat)
+from .mostreig import pendent_esferic, pendent_radial
+
+Ajust = namedtuple('Ajust', ['mirror_diff', 'radi_curv', 'curvatura', 'escala', 'potencia',
+                             'fons', 'contrast', 'rms', 'iteracions'])
+
+_k = 2*np.pi / long_ona
+
+
+@lru_cache(maxsize=4)
+def _intervals_quadrant(res, screen_size):
+    # Intervals radials del quadrant inferior dret (res parell)
+    m = res // 2
+    idx = _intervals_radials(res, screen_size)[0].reshape(res, res)
+    return np.ascontiguousarray(idx[m:, m:]).ravel()
+
+
+def carrega_interferograma(fitxer):
+    """
+    fitxer: imatge .npy o PNG (en color es fa la mitjana dels canals)
+    Retorna la intensitat com a array 2D de float64.
+    """
+    if str(fitxer).endswith('.npy'):
+        imatge = np.load(fitxer)
+    else:
+        from matplotlib.image import imread
+        imatge = imread(fitxer)
+    imatge = np.asarray(imatge, dtype=float)
+    if imatge.ndim == 3:
+        imatge = imatge[..., :3].mean(axis=2)
+    return imatge
+
+
+class AjustadorInterferograma:
+    """
+    model: 'esferic' (Δd i curvatura) o 'radial' (Δd, escala i potència)
+    screen_size: mida de la pantalla que cobreix la imatge (m)
+    potencia: potència fixa del model radial (None per ajustar-la)
+    franges_pixel: franges per píxel màximes dels radis que entren a l'ajust
+    tol_reinici: rms relativa al contrast a partir de la qual es torna a fer la cerca en graella
+    """
+
+    def __init__(self, model='esferic', screen_size=screen_size, potencia=None,
+                 franges_pixel=0.4, tol_reinici=0.3):
+        if model not in ('esferic', 'radial'):
+            raise ValueError(f"Model desconegut: {model}")
+        self.model = model
+        self.screen_size = screen_size
+        self.potencia = potencia
+        self.franges_pixel = franges_pixel
+        self.tol_reinici = tol_reinici
+        self._anterior = None
+
+    def perfil(self, intensitat):
+        # Perfil azimutal i nombre de píxels de cada interval
+        intensitat = np.asarray(intensitat, dtype=float)
+        if intensitat.ndim != 2 or intensitat.shape[0] != intensitat.shape[1]:
+            raise ValueError("L'interferograma ha de ser una imatge quadrada")
+        res = intensitat.shape[0]
+        idx, comptes, r = _intervals_radials(res, self.screen_size)
+        if res % 2 == 0:
+            # Els quatre quadrants tenen els mateixos intervals: se sumen abans del bincount
+            m = res // 2
+            valors = intensitat[m:, m:] + intensitat[m:, m-1::-1]
+            valors += intensitat[m-1::-1, m:]
+            valors += intensitat[m-1::-1, m-1::-1]
+            idx = _intervals_quadrant(res, self.screen_size)
+        else:
+            valors = intensitat
+        suma = np.bincount(idx, weights=valors.ravel(), minlength=len(comptes)+1)
+        return r, suma[:len(comptes)] / comptes, comptes.astype(float)
+
+    def ajusta(self, intensitat):
+        """
+        intensitat: imatge quadrada (res, res), o el nom d'un fitxer .npy o PNG
+        Retorna un Ajust; els paràmetres que no són del model són None.
+        """
+        if isinstance(intensitat, str):
+            intensitat = carrega_interferograma(intensitat)
+        r, y, w = self.perfil(intensitat)
+        dx = r[2] - r[1]
+        n = len(r)
+
+        theta, iteracions = None, 0
+        if self._anterior is not None:
+            theta, rms, iteracions = self._gauss_newton(self._anterior, r, y, w, dx)
+            if not rms <= self.tol_reinici*abs(theta[1]):
+                theta = None
+        if theta is None:
+            theta = self._cerca_graella(r, y, w, dx)
+            for n_nivell in (n//2, n):
+                theta, rms, it = self._gauss_newton(theta, r[:n_nivell], y[:n_nivell],
+                                                    w[:n_nivell], dx)
+                iteracions += it
+        self._anterior = theta
+        return self._resultat(theta, rms, iteracions)
+
+    def reinicia(self):
+        # Oblida l'ajust anterior (per exemple, quan canvia l'escena)
+        self._anterior = None
+
+    # Part no lineal de la fase, sense Δd: (fase, |derivada radial de la fase|), amb
+    # les mateixes dco i pendents que el càlcul directe
+    def _fase_forma(self, nl, r):
+        if self.model == 'esferic':
+            radi_curv = 1/nl[0] if nl[0] > 0 else 0
+            return _k*dco_esferic(r, 0, radi_curv), _k*pendent_esferic(r, radi_curv)
+        s, p = nl[0], (nl[1] if self.potencia is None else self.potencia)
+        escala = s / (2*factor_escala(p))
+        return _k*dco_radial(r, 0, escala, p), _k*pendent_radial(r, escala, p)
+
+    def _no_lineal(self, s, p):
+        # Paràmetres no lineals de theta del terme s*r**p de la dco
+        if self.model == 'esferic':
+            return [2*s]
+        if self.potencia is not None:
+            return [s]
+        return [s, p]
+
+    def _candidats(self, r, dx):
+        """
+        Candidats (s, p) del terme s*r**p de la dco (amb el mirall esfèric, p = 2 i
+        s = curvatura/2). Fins a l'escala que encara resol les franges a la vora,
+        el pas és constant; després, cada candidat és l'escala que resol les franges
+        fins a un radi r[i], i el pas relatiu queda d'un píxel entre radis.
+        """
+        lim = self.franges_pixel*long_ona/dx
+        if self.model == 'esferic':
+            potencies = [2.0]
+        elif self.potencia is not None:
+            potencies = [self.potencia]
+        else:
+            potencies = sorted(factors_escala)
+        r_max = r[-1]
+        u = r[max(8, len(r)//64):][::-1]
+        candidats = []
+        for p in potencies:
+            s_vora = max(0, lim - r_max/dist_lent) / (p*r_max**(p - 1))
+            s = np.concatenate([np.arange(0, s_vora, long_ona/(8*r_max**p)),
+                                np.maximum(lim - u/dist_lent, 0) / (p*u**(p - 1))])
+            candidats.append(np.column_stack([s, np.full_like(s, p)]))
+        return np.concatenate(candidats)
+
+    def _cerca_graella(self, r, y, w, dx):
+        candidats = self._candidats(r, dx)
+        psi = np.empty((len(candidats), len(r)))
+        franges = np.empty_like(psi)
+        for p in np.unique(candidats[:, 1]):
+            fila = candidats[:, 1] == p
+            s = candidats[fila, :1]
+            # Amb p fix la dco és lineal en s: n'hi ha prou amb avaluar s = 0 i s = 1
+            psi0, dpsi0 = self._fase_forma(self._no_lineal(0.0, p), r)
+            psi1, dpsi1 = self._fase_forma(self._no_lineal(1.0, p), r)
+            with np.errstate(invalid='ignore'):
+                psi[fila] = psi0 + s*(psi1 - psi0)
+                franges[fila] = np.abs(dpsi0 + s*(dpsi1 - dpsi0))*dx/(2*np.pi)
+        # Cada candidat només compta els radis on resol les franges
+        W = w * (franges < self.franges_pixel)
+        c, sn = np.cos(psi), np.sin(psi)
+
+        # Mínims quadrats ponderats de y = A + C cos(psi) + S sin(psi) per a cada candidat
+        Wc, Ws = W*c, W*sn
+        G = np.empty((len(candidats), 3, 3))
+        G[:, 0, 0] = W.sum(axis=1)
+        G[:, 0, 1] = G[:, 1, 0] = Wc.sum(axis=1)
+        G[:, 0, 2] = G[:, 2, 0] = Ws.sum(axis=1)
+        G[:, 1, 1] = (Wc*c).sum(axis=1)
+        G[:, 1, 2] = G[:, 2, 1] = (Wc*sn).sum(axis=1)
+        G[:, 2, 2] = (Ws*sn).sum(axis=1)
+        b = np.column_stack([W @ y, Wc @ y, Ws @ y])
+        # Regularització mínima: amb fase constant les columnes són dependents
+        G[:, [0, 1, 2], [0, 1, 2]] += 1e-9*w.sum()
+        sol = np.linalg.solve(G, b[..., None])[..., 0]
+        residu = W @ (y*y) - (sol*b).sum(axis=1)
+
+        # Residu mitjà relatiu al contrast, perquè els candidats fan servir radis diferents
+        contrast2 = sol[:, 1]**2 + sol[:, 2]**2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            puntuacio = residu / G[:, 0, 0] / contrast2
+        puntuacio[(W > 0).sum(axis=1) < 8] = np.inf
+        i = np.nanargmin(puntuacio)
+        A, C, S = sol[i]
+        # cos(kΔd + psi) = cos(kΔd) cos(psi) - sin(kΔd) sin(psi)
+        theta = [A, np.hypot(C, S), np.arctan2(-S, C) / _k]
+        return np.array(theta + self._no_lineal(*candidats[i]))
+
+    def _model(self, theta, r):
+        # Model i jacobià analític respecte de theta
+        A, B, mirror_diff = theta[:3]
+        psi, dpsi = self._fase_forma(theta[3:], r)
+        fase = _k*mirror_diff + psi
+        cos, sin = np.cos(fase), np.sin(fase)
+        J = np.empty((len(r), len(theta)))
+        J[:, 0] = 1
+        J[:, 1] = cos
+        J[:, 2] = -B*sin*_k
+        if self.model == 'esferic':
+            J[:, 3] = B*sin*_k*r**2/2
+        else:
+            s, p = theta[3], (theta[4] if self.potencia is None else self.potencia)
+            rp = r**p
+            J[:, 3] = B*sin*_k*rp
+            if self.potencia is None:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    J[:, 4] = np.where(r > 0, B*sin*_k*s*rp*np.log(r), 0)
+        return A + B*cos, J, dpsi
+
+    def _avalua(self, theta, r, y, w, dx, pes=None):
+        # Model, jacobià, pesos dels radis resolts i residu quadràtic mitjà
+        model, J, dpsi = self._model(theta, r)
+        if pes is None:
+            pes = w * (np.abs(dpsi)*dx/(2*np.pi) < self.franges_pixel)
+        residu = y - model
+        total = pes.sum()
+        if np.count_nonzero(pes) < 8:
+            return residu, J, pes, np.inf
+        return residu, J, pes, np.dot(pes, residu*residu) / total
+
+    def _gauss_newton(self, theta, r, y, w, dx, iteracions=30, tol=1e-9):
+        theta = np.array(theta, dtype=float)
+        residu, J, pes, cost = self._avalua(theta, r, y, w, dx)
+        mu = 1e-3
+        for it in range(1, iteracions + 1):
+            Jp = J * pes[:, None]
+            H = Jp.T @ J
+            g = Jp.T @ residu
+            D = np.diag(H).copy()
+            D[D == 0] = 1
+            # Levenberg-Marquardt: s'augmenta l'amortiment fins que el pas millora
+            while mu < 1e10:
+                nou = theta + np.linalg.solve(H + mu*np.diag(D), g)
+                if self.model == 'esferic':
+                    # dco_esferic no té miralls còncaus: la curvatura es queda a >= 0
+                    nou[3] = max(nou[3], 0)
+                elif self.model == 'radial' and self.potencia is None and nou[4] <= 0:
+                    mu *= 10
+                    continue
+                # El pas es compara sobre els mateixos radis: si els radis resolts
+                # canviessin amb theta, un pas bo podria semblar pitjor
+                if self._avalua(nou, r, y, w, dx, pes)[3] <= cost:
+                    avaluat = self._avalua(nou, r, y, w, dx)
+                    if np.isfinite(avaluat[3]):
+                        break
+                mu *= 10
+            else:
+                break
+            mu = max(mu/10, 1e-9)
+            canvi = np.abs(nou - theta) / np.maximum(np.abs(nou), 1e-300)
+            canvi[2] = abs(nou[2] - theta[2]) / long_ona
+            theta = nou
+            residu, J, pes, cost = avaluat
+            if canvi[1:].max() < tol:
+                break
+        return theta, np.sqrt(cost), it
+
+    def _resultat(self, theta, rms, iteracions):
+        A, B, mirror_diff = theta[:3]
+        if B < 0:
+            B, mirror_diff = -B, mirror_diff + long_ona/2
+        mirror_diff = mirror_diff % long_ona
+        if self.model == 'esferic':
+            curvatura = theta[3]
+            radi_curv = 1/curvatura if curvatura > 0 else 0
+            return Ajust(mirror_diff, radi_curv, curvatura, None, None, A, B, rms, iteracions)
+        p = theta[4] if self.potencia is None else self.potencia
+        escala = theta[3] / (2*factor_escala(p))
+        return Ajust(mirror_diff, None, None, escala, p, A, B, rms, iteracions)
+
+
+def ajusta_interferograma(intensitat, model='esferic', screen_size=screen_size, potencia=None):
+    """
+    Ajust d'una sola imatge (array o fitxer .npy/PNG). Per a una seqüència de
+    fotogrames és millor fer servir un AjustadorInterferograma.
+    """
+    return AjustadorInterferograma(model, screen_size, potencia).ajusta(intensitat)
+
+
+def verifica_sintetic(res=500, soroll=0.05, casos_esferic=None, casos_radial=None, llavor=0):
+    """
+    Comprova l'ajust amb fotogrames sintètics del model directe, amb fons, contrast
+    i soroll gaussià. Retorna una llista de (model, paràmetres, ajust, errors), amb
+    l'error de Δd (mòdul λ, m) i l'error relatiu de la curvatura o, al model radial,
+    de la deformació a la vora de la pantalla.
+    """
+    if casos_esferic is None:
+        casos_esferic = [(0, 2), (0.3e-6, 5), (-1.1e-6, 10), (1.7e-6, 20)]
+    if casos_radial is None:
+        casos_radial = [(0.2e-6, 0.5, 2.0), (0, 0.2, 3.0), (-0.4e-6, 0.1, 4.0), (0.1e-6, 0.5, 1.0)]
+
+    rng = np.random.default_rng(llavor)
+    casos = [('esferic', p, compute_intensitat) for p in casos_esferic]
+    casos += [('radial', p, calcul_intensitat) for p in casos_radial]
+
+    resultats = []
+    for model, params, directe in casos:
+        imatge = 0.1 + 0.8*directe(*params, res=res) + soroll*rng.standard_normal((res, res))
+        ajust = ajusta_interferograma(imatge, model)
+        error_dd = (ajust.mirror_diff - params[0] + long_ona/2) % long_ona - long_ona/2
+        if model == 'esferic':
+            error = abs(ajust.curvatura*params[1] - 1)
+        else:
+            vora = screen_size/2
+            real = params[1]*factor_escala(params[2])*vora**params[2]
+            error = abs(ajust.escala*factor_escala(ajust.potencia)*vora**ajust.potencia/real - 1)
+        resultats.append((model, params, ajust, (abs(error_dd), error)))
+    return resultats
@@ -0,0 +1,119 @@
+"""
+Mesures dels anells directament del model de dco, sense calcular cap imatge.
+
+Els anells brillants són els radis on dco(r) és un múltiple enter de la longitud
+d'ona. Amb el mirall esfèric dco(r) = Δd - a r², així que els radis surten en forma
+tancada. Amb la família R^n dco(r) és monòtona i s'inverteix amb Newton, protegit
+per bisecció, per a tots els anells alhora.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .anells import trobar_anells, calcular_radi_curv
+from .estat import EstatSimulacio
+from .model import screen_size, long_ona, dist_lent, factor_escala
+
+MesuraAnells = namedtuple('MesuraAnells', ['radis', 'n_anells', 'radi_curv', 'incertesa'])
+
+
+def _ordres(mirror_diff, dco_vora):
+    """
+    Ordres n (dco = nλ) dels anells brillants amb 0 < r <= r_max,
+    on dco_vora = dco(r_max). Ordenats de dins cap a fora.
+    """
+    n_dins = np.ceil(mirror_diff / long_ona) - 1      # primer ordre amb r > 0
+    n_fora = np.ceil(dco_vora / long_ona)             # últim ordre dins de r_max
+    return np.arange(n_dins, n_fora - 1, -1)
+
+
+def mesura_esferic(mirror_diff, radi_curv, r_max=screen_size/2):
+    """
+    mirror_diff: diferència de distància entre els braços (m)
+    radi_curv: radi de curvatura del mirall (m), 0 vol dir mirall pla
+    r_max: radi màxim dels anells comptats (per defecte, la vora de la pantalla)
+    """
+    a = 1/(2*dist_lent)
+    if radi_curv > 0:
+        a += 1/(2*radi_curv)
+    ordres = _ordres(mirror_diff, mirror_diff - a*r_max**2)
+    radis = np.sqrt((mirror_diff - ordres*long_ona) / a)
+    if radi_curv <= 0:  # mirall pla: no hi ha curvatura a estimar
+        return MesuraAnells(radis, len(radis), None, None)
+    # Radi de curvatura estimat dels anells, amb els ordres coneguts, com a mesura_radial
+    R_calc, incertesa = calcular_radi_curv(radis, -ordres, min_anells=2)
+    return MesuraAnells(radis, len(radis), R_calc, incertesa)
+
+
+def mesura_radial(mirror_diff, escala, potencia, r_max=screen_size/2, tol=1e-12):
+    """
+    mirror_diff: diferència de distància entre els braços (m)
+    escala: factor de deformació
+    potencia: potència de R de la deformació
+    r_max: radi màxim dels anells comptats (per defecte, la vora de la pantalla)
+    tol: tolerància dels radis (m)
+    """
+    s = 2 * escala * factor_escala(potencia)
+
+    def g(r):  # Δd - dco(r), creixent en r
+        return r**2/(2*dist_lent) + s*r**potencia
+
+    def dg(r):
+        return r/dist_lent + s*potencia*r**(potencia - 1)
+
+    ordres = _ordres(mirror_diff, mirror_diff - g(r_max))
+    c = mirror_diff - ordres*long_ona
+
+    # Cada terme per separat dona una cota superior de l'arrel
+    r = np.sqrt(2*dist_lent*c)
+    if s > 0:
+        r = np.minimum(r, (c/s)**(1/potencia))
+    baix = np.zeros_like(c)
+    dalt = np.full_like(c, r_max)
+    r = np.minimum(r, dalt)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(100):
+            f = g(r) - c
+            baix = np.where(f < 0, r, baix)
+            dalt = np.where(f > 0, r, dalt)
+            r_nou = r - f/dg(r)
+            fora = ~((r_nou >= baix) & (r_nou <= dalt))
+            r_nou = np.where(fora, 0.5*(baix + dalt), r_nou)
+            pas = np.max(np.abs(r_nou - r), initial=0)
+            r = r_nou
+            if pas < tol:
+                break
+
+    # Radi de curvatura equivalent, amb els ordres coneguts
+    R_calc, incertesa = calcular_radi_curv(r, -ordres, min_anells=2)
+    return MesuraAnells(r, len(r), R_calc, incertesa)
+
+
+def comparar_amb_detector(res=1000, casos_esferic=None, casos_radial=None):
+    """
+    Compara els radis analítics amb els que troba trobar_anells sobre la imatge.
+    Retorna una llista de (model, paràmetres, anells detectats, error màxim en píxels).
+    """
+    if casos_esferic is None:
+        casos_esferic = [(0, 2), (0.3e-6, 5), (-1.1e-6, 10), (1.7e-6, 20)]
+    if casos_radial is None:
+        casos_radial = [(0, 0.5, 1.0), (0.2e-6, 0.5, 2.0), (0, 0.2, 3.0), (-0.4e-6, 0.1, 4.0)]
+
+    estat = EstatSimulacio(res, screen_size)
+    dx = screen_size / (res - 1)
+    casos = [('esferic', p, estat.intensitat_esferic, mesura_esferic) for p in casos_esferic]
+    casos += [('radial', p, estat.intensitat_radial, mesura_radial) for p in casos_radial]
+
+    errors = []
+    for model, params, intensitat, mesura in casos:
+        detectats = trobar_anells(intensitat(*params), screen_size)
+        analitics = mesura(*params).radis
+        if len(detectats) and len(analitics):
+            # Per a cada anell detectat, l'anell analític més proper
+            distancies = np.abs(detectats[:, None] - analitics[None, :]).min(axis=1)
+            errors.append((model, params, len(detectats), distancies.max() / dx))
+        else:
+            errors.append((model, params, len(detectats), np.nan))
+    return errors
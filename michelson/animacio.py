@@ -0,0 +1,221 @@
+"""
+Exportació d'animacions: una trajectòria de paràmetres (per exemple, Δd de -2 a
+2 µm) es renderitza directament a MP4, GIF o una seqüència de PNG.
+
+Els fotogrames es calculen en processos treballadors amb el mode radial: el perfil
+es quantitza a uint8 (i es passa pel mapa de colors) abans d'expandir-lo a la
+pantalla, de manera que l'expansió mou un byte per píxel (o tres en color) i no
+cal cap figura de matplotlib. El procés principal rep els fotogrames en ordre i
+els passa al codificador a mesura que arriben; com a molt hi ha `cua` fotogrames
+en vol, així que la memòria no depèn de la llargada de l'animació.
+
+Exemple:
+
+    python -m michelson.animacio esferic --dd -2 2 --radi 5 --fotogrames 200 --sortida anells.mp4
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+from collections import deque
+
+import numpy as np
+
+from .imatges import codifica_png, quantitza
+from .model import screen_size, res, dco_esferic, dco_radial, intensitat_de_dco
+from .perfil_radial import MapaRadial
+
+# Estat de cada procés treballador
+_mapa = None
+_colors = None
+_espectre = None
+_png = False
+
+
+def trajectoria_lineal(inici, fi, fotogrames):
+    """
+    inici, fi: tuples de paràmetres (Δd, radi_curv) o (Δd, escala, potencia)
+    fotogrames: nombre de fotogrames
+    Retorna la llista de paràmetres interpolats linealment.
+    """
+    valors = np.linspace(np.asarray(inici, dtype=float), np.asarray(fi, dtype=float), fotogrames)
+    return [tuple(float(v) for v in fila) for fila in valors]
+
+
+def taula_colors(cmap):
+    # Taula (256, 3) uint8 del mapa de colors de matplotlib, o None per al gris
+    if cmap is None or cmap == 'gray':
+        return None
+    from matplotlib import colormaps
+    return quantitza(colormaps[cmap](np.linspace(0, 1, 256))[:, :3])
+
+
+def _inicia_treballador(res, screen_size, colors, espectre, png):
+    global _mapa, _colors, _espectre, _png
+    _mapa = MapaRadial(res, screen_size)
+    _colors = colors
+    _espectre = espectre
+    _png = png
+
+
+def _fotograma(params):
+    dco = dco_esferic if len(params) == 2 else dco_radial
+    perfil = quantitza(intensitat_de_dco(dco(_mapa.r, *params), _espectre))
+    if _colors is not None:
+        perfil = _colors[perfil]
+    imatge = _mapa.expandeix_proper(perfil)
+    return codifica_png(imatge) if _png else imatge.tobytes()
+
+
+def _calcula_bloc(bloc):
+    return [_fotograma(params) for params in bloc]
+
+
+def fotogrames(trajectoria, res=res, screen_size=screen_size, processos=None, cua=16,
+               mida_bloc=4, cmap='gray', espectre=None, png=False):
+    """
+    Generador dels fotogrames codificats, en ordre.
+    trajectoria: tuples (Δd, radi_curv) o (Δd, escala, potencia)
+    processos: processos treballadors (per defecte, un per CPU); 0 calcula al procés actual
+    cua: fotogrames en vol com a màxim
+    mida_bloc: fotogrames per tasca
+    cmap: mapa de colors de matplotlib ('gray' dona imatges en gris d'un byte per píxel)
+    espectre: espectre de la font (None per a llum monocromàtica)
+    png: True dona cada fotograma com a fitxer PNG; False, com a bytes crus (res, res[, 3])
+    """
+    colors = taula_colors(cmap)
+    trajectoria = list(trajectoria)
+    blocs = [trajectoria[i:i+mida_bloc] for i in range(0, len(trajectoria), mida_bloc)]
+
+    if processos == 0:
+        _inicia_treballador(res, screen_size, colors, espectre, png)
+        for bloc in blocs:
+            yield from _calcula_bloc(bloc)
+        return
+
+    # Importat aquí perquè importar el paquet no carregui multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    processos = processos or os.cpu_count()
+    en_vol = max(1, cua // mida_bloc)
+    with ProcessPoolExecutor(processos, initializer=_inicia_treballador,
+                             initargs=(res, screen_size, colors, espectre, png)) as grup:
+        pendents = deque()
+        for bloc in blocs:
+            pendents.append(grup.submit(_calcula_bloc, bloc))
+            if len(pendents) >= en_vol:
+                yield from pendents.popleft().result()
+        while pendents:
+            yield from pendents.popleft().result()
+
+
+def _escriu_video(sortida, quadres, res, fps, color):
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError("Cal ffmpeg per exportar vídeo; feu servir .gif o un directori de PNG")
+    ordre = [ffmpeg, '-loglevel', 'error', '-y',
+             '-f', 'rawvideo', '-pix_fmt', 'rgb24' if color else 'gray',
+             '-s', f'{res}x{res}', '-r', str(fps), '-i', '-',
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+             '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', sortida]
+    proces = subprocess.Popen(ordre, stdin=subprocess.PIPE)
+    try:
+        for quadre in quadres:
+            proces.stdin.write(quadre)
+    finally:
+        proces.stdin.close()
+        if proces.wait() != 0:
+            raise RuntimeError(f"ffmpeg ha acabat amb codi {proces.returncode}")
+
+
+def _escriu_gif(sortida, quadres, res, fps, color):
+    # Pillow guarda tots els fotogrames del GIF abans d'escriure'l: només per a animacions curtes
+    from PIL import Image
+
+    forma = (res, res, 3) if color else (res, res)
+    imatges = (Image.fromarray(np.frombuffer(q, dtype=np.uint8).reshape(forma)) for q in quadres)
+    primera = next(imatges)
+    primera.save(sortida, save_all=True, append_images=imatges,
+                 duration=round(1000/fps), loop=0)
+
+
+def _escriu_sequencia(sortida, quadres):
+    os.makedirs(sortida, exist_ok=True)
+    for i, quadre in enumerate(quadres):
+        with open(os.path.join(sortida, f'{i:05d}.png'), 'wb') as f:
+            f.write(quadre)
+
+
+def exporta_animacio(trajectoria, sortida, res=res, screen_size=screen_size, fps=30,
+                     processos=None, cua=16, cmap='gray', espectre=None):
+    """
+    trajectoria: tuples (Δd, radi_curv) o (Δd, escala, potencia), una per fotograma
+    sortida: fitxer .mp4 (o .mkv, .mov, .avi) amb ffmpeg, fitxer .gif amb Pillow,
+             o un directori on s'escriu una seqüència de PNG
+    Les altres opcions són les de fotogrames. Retorna el nombre de fotogrames escrits.
+    """
+    color = taula_colors(cmap) is not None
+    extensio = os.path.splitext(sortida)[1].lower()
+    quadres = fotogrames(trajectoria, res, screen_size, processos, cua, cmap=cmap,
+                         espectre=espectre, png=extensio == '')
+
+    comptador = [0]
+
+    def comptats():
+        for quadre in quadres:
+            comptador[0] += 1
+            yield quadre
+
+    if extensio in ('.mp4', '.mkv', '.mov', '.avi'):
+        _escriu_video(sortida, comptats(), res, fps, color)
+    elif extensio == '.gif':
+        _escriu_gif(sortida, comptats(), res, fps, color)
+    elif extensio == '':
+        _escriu_sequencia(sortida, comptats())
+    else:
+        raise ValueError(f"Format de sortida desconegut: {sortida}")
+    return comptador[0]
+
+
+def _extrems(valors):
+    # INICI [FI] -> (inici, fi); amb un sol valor el paràmetre és fix
+    return float(valors[0]), float(valors[-1])
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Exporta una animació de l'interferòmetre de Michelson")
+    parser.add_argument('model', choices=['esferic', 'radial'])
+    parser.add_argument('--dd', nargs='+', required=True, metavar='µm',
+                        help='Δd inicial i final en µm')
+    parser.add_argument('--radi', nargs='+', help='radi de curvatura inicial i final en m (model esferic)')
+    parser.add_argument('--escala', nargs='+', help='factor de deformació inicial i final (model radial)')
+    parser.add_argument('--potencia', nargs='+', default=['1'],
+                        help='potència de R inicial i final (model radial)')
+    parser.add_argument('--fotogrames', type=int, default=200)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--sortida', required=True, help='fitxer .mp4/.gif o directori de PNG')
+    parser.add_argument('--cmap', default='gray', help='mapa de colors de matplotlib')
+    parser.add_argument('--res', type=int, default=res)
+    parser.add_argument('--processos', type=int)
+    args = parser.parse_args(args)
+
+    dd0, dd1 = _extrems(args.dd)
+    if args.model == 'esferic':
+        if args.radi is None:
+            parser.error('el model esferic necessita --radi')
+        r0, r1 = _extrems(args.radi)
+        inici, fi = (dd0*1e-6, r0), (dd1*1e-6, r1)
+    else:
+        if args.escala is None:
+            parser.error('el model radial necessita --escala')
+        (e0, e1), (p0, p1) = _extrems(args.escala), _extrems(args.potencia)
+        inici, fi = (dd0*1e-6, e0, p0), (dd1*1e-6, e1, p1)
+
+    fets = exporta_animacio(trajectoria_lineal(inici, fi, args.fotogrames), args.sortida,
+                            res=args.res, fps=args.fps, processos=args.processos, cmap=args.cmap)
+    print(f"{fets} fotogrames escrits a {args.sortida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Backends de càlcul del nucli fusionat fase -> intensitat.
+
+Tots els càlculs de la malla completa acaben en la mateixa expressió,
+
+    intensitat = 0.5·(1 + cos(c + Σ coef_i·terme_i)),
+
+on els termes són arrays precalculats (R², R^p, la fase de la font o una fase
+base) i c i els coeficients són escalars. Amb NumPy cada operació és una passada
+sencera per la memòria; numexpr i Numba fan tota l'expressió en una sola passada,
+repartida entre els fils (una per bloc de la memòria cau amb numexpr, un prange amb
+Numba).
+
+    numpy    sempre disponible, un sol fil
+    numexpr  si està instal·lat
+    numba    si està instal·lat; la primera crida compila el nucli (i el desa a la
+             memòria cau de Numba, de manera que les execucions següents el carreguen)
+
+tria_backend('auto') mesura els backends instal·lats que coincideixen amb NumPy en un
+cas de prova i tria el més ràpid per al tipus de dada. NumPy és el de referència:
+un backend opcional només es tria si és prou més ràpid. El guany depèn de la
+màquina: en float64 el cost és sobretot el cosinus i el guany ve dels fils, i en
+float32 NumPy fa servir un cosinus vectoritzat (SIMD) que els nuclis escalars de
+numexpr i Numba només superen amb molts nuclis.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+# Backends candidats de tria_backend('auto'), per ordre de preferència en cas d'empat
+preferencia = ('numpy', 'numba', 'numexpr')
+
+# Un backend opcional només es tria si és almenys aquest factor més ràpid que NumPy
+guany_minim = 1.1
+
+# Diferència màxima amb NumPy acceptada a comprova_backend, per tipus
+toleracies = {np.dtype(np.float64): 1e-9, np.dtype(np.float32): 1e-3}
+
+_auto = {}
+
+
+def _pla(array):
+    # Vista 1D sense còpia (els arrays dels nuclis han de ser contigus)
+    if not array.flags.c_contiguous:
+        raise ValueError("Els arrays del nucli han de ser contigus")
+    return array.reshape(-1)
+
+
+class BackendNumpy:
+    """
+    fils: s'ignora, les operacions de NumPy fan servir un sol fil
+
+    intensitat(out, c, termes) escriu 0.5·(1 + cos(c + Σ coef·terme)) a out.
+    out: array on s'escriu el resultat
+    c: constant de la fase
+    termes: tuple de (coef, array) amb la forma de out; un coeficient 1 no multiplica
+    """
+
+    nom = 'numpy'
+
+    def __init__(self, fils=None):
+        pass
+
+    def intensitat(self, out, c, termes):
+        coef, terme = termes[0]
+        # Amb un primer coeficient 1 la constant se suma directament al primer terme
+        if coef == 1:
+            np.add(terme, c, out=out)
+        else:
+            np.multiply(terme, coef, out=out)
+        for coef_i, terme_i in termes[1:]:
+            if coef_i == 1:
+                out += terme_i
+            else:
+                out += coef_i*terme_i
+        if coef != 1:
+            out += c
+        np.cos(out, out=out)
+        out += 1
+        out *= 0.5
+        return out
+
+
+# El nombre de fils de numexpr és global al procés: les crides amb fils propis el
+# canvien i el restauren dins d'aquest lock
+_lock_numexpr = threading.Lock()
+
+
+class BackendNumexpr:
+    """
+    fils: fils de numexpr de les crides d'aquest backend (per defecte, els que tria
+          numexpr segons els nuclis); es fixen només durant cada crida
+    intensitat com a BackendNumpy.
+    """
+
+    nom = 'numexpr'
+
+    def __init__(self, fils=None):
+        import numexpr
+        self._ne = numexpr
+        self.fils = fils
+
+    def intensitat(self, out, c, termes):
+        # Els escalars amb el tipus de out, perquè numexpr no pugi el càlcul a float64
+        tipus = out.dtype.type
+        variables = {'c': tipus(c)}
+        fase = 'c'
+        for i, (coef, terme) in enumerate(termes):
+            variables[f'a{i}'] = tipus(coef)
+            variables[f't{i}'] = terme
+            fase += f' + a{i}*t{i}'
+        if self.fils is None:
+            self._ne.evaluate(f'0.5 + 0.5*cos({fase})', local_dict=variables, out=out)
+            return out
+        with _lock_numexpr:
+            anteriors = self._ne.set_num_threads(self.fils)
+            try:
+                self._ne.evaluate(f'0.5 + 0.5*cos({fase})', local_dict=variables, out=out)
+            finally:
+                self._ne.set_num_threads(anteriors)
+        return out
+
+
+_nuclis_numba = None
+
+
+def _compila_numba():
+    # Els nuclis es defineixen aquí perquè importar el mòdul no carregui Numba
+    global _nuclis_numba
+    if _nuclis_numba is not None:
+        return _nuclis_numba
+    import numba
+
+    # Amb TBB (el que Numba tria si el troba) el procés es penja en sortir si ha
+    # fet fork, i escombrat, dades i animacio creen els seus processos amb fork.
+    # Les crides ja es fan d'una en una (vegeu BackendNumba), així que n'hi ha prou
+    # amb workqueue; NUMBA_THREADING_LAYER continua manant si s'ha definit.
+    if numba.config.THREADING_LAYER == 'default':
+        numba.config.THREADING_LAYER = 'workqueue'
+
+    @numba.njit(parallel=True, nogil=True, cache=True)
+    def un_terme(out, c, a0, t0):
+        for i in numba.prange(out.size):
+            out[i] = 0.5 + 0.5*np.cos(c + a0*t0[i])
+
+    @numba.njit(parallel=True, nogil=True, cache=True)
+    def dos_termes(out, c, a0, t0, a1, t1):
+        for i in numba.prange(out.size):
+            out[i] = 0.5 + 0.5*np.cos(c + a0*t0[i] + a1*t1[i])
+
+    _nuclis_numba = numba, {1: un_terme, 2: dos_termes}
+    return _nuclis_numba
+
+
+class BackendNumba:
+    """
+    fils: fils de Numba (per defecte, tots els nuclis)
+    intensitat com a BackendNumpy, amb un o dos termes.
+    """
+
+    nom = 'numba'
+
+    def __init__(self, fils=None):
+        self._numba, self._nuclis = _compila_numba()
+        self.fils = fils
+        # Els nuclis deixen anar el GIL; el threading layer per defecte de Numba
+        # (workqueue) no admet dues crides paral·leles alhora des de fils diferents
+        self._lock = threading.Lock()
+
+    def intensitat(self, out, c, termes):
+        if len(termes) not in self._nuclis:
+            raise ValueError(f"El backend numba accepta 1 o 2 termes, no {len(termes)}")
+        if self.fils is not None:
+            # El nombre de fils de Numba és propi de cada fil de Python, i no pot
+            # passar dels que Numba ha creat en començar
+            self._numba.set_num_threads(min(self.fils, self._numba.config.NUMBA_NUM_THREADS))
+        tipus = out.dtype.type
+        args = [_pla(out), tipus(c)]
+        for coef, terme in termes:
+            args += [tipus(coef), _pla(terme)]
+        with self._lock:
+            self._nuclis[len(termes)](*args)
+        return out
+
+
+backends = {'numpy': BackendNumpy, 'numexpr': BackendNumexpr, 'numba': BackendNumba}
+
+
+def comprova_backend(backend, n=4096):
+    """
+    Compara el backend amb NumPy amb un i dos termes, en float64 i float32.
+    Retorna la llista de (dtype, termes, error màxim absolut).
+    """
+    referencia = BackendNumpy()
+    rng = np.random.default_rng(0)
+    errors = []
+    for dtype in (np.float64, np.float32):
+        R2 = rng.uniform(0, 5e-3, n).astype(dtype)
+        Rp = (R2**1.25).astype(dtype)
+        casos = [(3.7, ((-2.5e4, R2),)), (-1.2, ((-6.3e3, Rp), (1, -R2*12.6)))]
+        for c, termes in casos:
+            esperat = referencia.intensitat(np.empty(n, dtype), c, termes)
+            obtingut = backend.intensitat(np.empty(n, dtype), c, termes)
+            errors.append((np.dtype(dtype).name, len(termes), float(np.abs(obtingut - esperat).max())))
+    return errors
+
+
+def _coincideix(backend):
+    return all(error <= toleracies[np.dtype(dtype)] for dtype, _, error in comprova_backend(backend))
+
+
+def _mesura(backend, dtype, n=2**20, repeticions=3):
+    # Millor temps del nucli de dos termes sobre n punts (una pantalla de 1000², fora de la memòria cau)
+    x = np.linspace(0, 5e-3, n, dtype=dtype)
+    termes = ((-6.3e3, x), (1, x))
+    out = np.empty(n, dtype)
+    backend.intensitat(out, 1.0, termes)
+    millor = np.inf
+    for _ in range(repeticions):
+        t0 = time.perf_counter()
+        backend.intensitat(out, 1.0, termes)
+        millor = min(millor, time.perf_counter() - t0)
+    return millor
+
+
+def tria_backend(nom='auto', fils=None, dtype=np.float64):
+    """
+    nom: 'numpy', 'numexpr', 'numba', 'auto' o un backend ja creat. Amb 'auto' es
+         pot forçar amb la variable d'entorn MICHELSON_BACKEND.
+    fils: fils del backend (None, tots els nuclis)
+    dtype: tipus de dada amb què es mesuren els candidats de 'auto'
+    Un backend demanat pel nom que no està instal·lat dona ImportError. Amb 'auto'
+    es mesuren els instal·lats i el triat es guarda per a cada fils i dtype.
+    """
+    if not isinstance(nom, str):
+        return nom
+    if nom == 'auto':
+        nom = os.environ.get('MICHELSON_BACKEND', 'auto')
+    if nom != 'auto':
+        if nom not in backends:
+            raise ValueError(f"Backend desconegut: {nom} ({', '.join(backends)} o auto)")
+        return backends[nom](fils)
+
+    clau = (fils, np.dtype(dtype))
+    if clau not in _auto:
+        temps = {}
+        for candidat in preferencia:
+            try:
+                backend = backends[candidat](fils)
+            except ImportError:
+                continue
+            if candidat == 'numpy' or _coincideix(backend):
+                temps[backend] = _mesura(backend, dtype)*(1 if candidat == 'numpy' else guany_minim)
+        _auto[clau] = min(temps, key=temps.get)
+    return _auto[clau]
+
+
+def comprova_backends():
+    """
+    Compara amb NumPy tots els backends instal·lats.
+    Retorna la llista de (backend, dtype, termes, error màxim absolut).
+    """
+    errors = []
+    for nom, classe in backends.items():
+        try:
+            backend = classe()
+        except ImportError:
+            continue
+        errors += [(nom,) + error for error in comprova_backend(backend)]
+    return errors
@@ -0,0 +1,152 @@
+"""
+Banc de fotogrames amb memòria cau LRU, per moure els sliders endavant i enrere
+sense tornar a calcular res.
+
+Els paràmetres es quantitzen (per defecte, amb el pas dels sliders) i cada
+fotograma es guarda amb la clau quantitzada. A més es guarda la fase base de cada
+forma del mirall, sense Δd: com que Δd només suma una constant a la fase, un
+fotograma nou amb la mateixa forma costa una sola avaluació del cosinus. Després de
+servir un fotograma, els veïns de cada slider es calculen en segon pla.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class BancFotogrames:
+    """
+    estat: EstatSimulacio que calcula les fases (amb float32 hi caben el doble de fotogrames)
+    model: 'esferic' (paràmetre radi_curv) o 'radial' (paràmetres escala, potencia)
+    pressupost: memòria màxima (bytes) dels fotogrames i les fases guardades
+    passos: pas de quantització de Δd i de cada paràmetre del model, que també és
+            la distància als veïns que es precarreguen
+    precarrega: calcula en segon pla els fotogrames veïns
+    """
+
+    def __init__(self, estat, model='radial', pressupost=512*2**20, passos=None, precarrega=True):
+        self.estat = estat
+        self.model = model
+        self.pressupost = pressupost
+        if passos is None:
+            passos = (0.01e-6, 0.05) if model == 'esferic' else (0.01e-6, 1e-3, 0.5)
+        self.passos = passos
+
+        if model == 'esferic':
+            self._fase = estat.fase_esferic
+        else:
+            self._fase = estat.fase_radial
+
+        self._fotogrames = OrderedDict()
+        self._fases = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.encerts = 0
+        self.errades = 0
+
+        self._pendents = set()
+        self._fil = None
+        if precarrega:
+            from concurrent.futures import ThreadPoolExecutor
+            self._fil = ThreadPoolExecutor(1)
+
+    def _clau(self, valors):
+        return tuple(int(round(v/p)) for v, p in zip(valors, self.passos))
+
+    def _valors(self, clau):
+        return tuple(c*p for c, p in zip(clau, self.passos))
+
+    def _desa(self, cache, clau, array):
+        # Cal tenir el lock
+        if clau in cache:
+            return
+        array.flags.writeable = False
+        cache[clau] = array
+        self._bytes += array.nbytes
+        # Primer es descarten els fotogrames més antics i després les fases
+        while self._bytes > self.pressupost and (len(self._fotogrames) > 1 or self._fases):
+            vella = self._fotogrames if len(self._fotogrames) > 1 else self._fases
+            _, descartat = vella.popitem(last=False)
+            self._bytes -= descartat.nbytes
+
+    def _fase_base(self, clau_forma):
+        with self._lock:
+            fase = self._fases.get(clau_forma)
+            if fase is not None:
+                self._fases.move_to_end(clau_forma)
+                return fase
+        params = self._valors((0,) + clau_forma)[1:]
+        fase = self._fase(0, *params, out=np.empty_like(self.estat.fase))
+        with self._lock:
+            self._desa(self._fases, clau_forma, fase)
+        return fase
+
+    def _calcula(self, clau):
+        # Desplaçament de fase de Δd sobre la fase base: un sol cosinus
+        fase = self._fase_base(clau[1:])
+        mirror_diff = self._valors(clau)[0]
+        intensitat = self.estat.backend.intensitat(np.empty_like(fase), self.estat._k*mirror_diff,
+                                                   ((1, fase),))
+        with self._lock:
+            self._desa(self._fotogrames, clau, intensitat)
+        return intensitat
+
+    def intensitat(self, mirror_diff, *params):
+        """
+        mirror_diff: diferència de distància entre els braços (m)
+        params: radi_curv o (escala, potencia), segons el model
+        El resultat és només de lectura i es comparteix amb el banc.
+        """
+        clau = self._clau((mirror_diff,) + params)
+        with self._lock:
+            intensitat = self._fotogrames.get(clau)
+            if intensitat is not None:
+                self._fotogrames.move_to_end(clau)
+                self.encerts += 1
+        if intensitat is None:
+            self.errades += 1
+            intensitat = self._calcula(clau)
+        if self._fil is not None:
+            self._precarrega_veins(clau)
+        return intensitat
+
+    def _precarrega_veins(self, clau):
+        for i in range(len(clau)):
+            for pas in (-1, 1):
+                vei = clau[:i] + (clau[i] + pas,) + clau[i+1:]
+                if not self._valida(vei):
+                    continue
+                with self._lock:
+                    if vei in self._fotogrames or vei in self._pendents:
+                        continue
+                    # No s'acumulen precàrregues si l'usuari es mou més de pressa que el càlcul
+                    if len(self._pendents) >= 4*len(clau):
+                        return
+                    self._pendents.add(vei)
+                self._fil.submit(self._precarrega, vei)
+
+    def _valida(self, clau):
+        # Els paràmetres del mirall no poden ser negatius i la potència ha de ser positiva
+        if min(clau[1:]) < 0:
+            return False
+        return self.model == 'esferic' or clau[2] > 0
+
+    def _precarrega(self, clau):
+        try:
+            self._calcula(clau)
+        finally:
+            with self._lock:
+                self._pendents.discard(clau)
+
+    def buida(self):
+        # Descarta tots els fotogrames i fases guardats
+        with self._lock:
+            self._fotogrames.clear()
+            self._fases.clear()
+            self._bytes = 0
+
+    def tanca(self):
+        if self._fil is not None:
+            self._fil.shutdown(wait=False, cancel_futures=True)
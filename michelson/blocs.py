@@ -0,0 +1,105 @@
+"""
+Càlcul de la pantalla per blocs de files, per a resolucions molt altes.
+
+En lloc de construir X, Y i R per a tota la pantalla, cada bloc de files calcula el
+seu tros de R a partir de l'eix 1D i escriu la intensitat directament a la
+sortida, que pot ser un array, un np.memmap o el nom d'un fitxer .npy. La memòria
+de treball queda limitada per la mida del bloc, no per res². Els blocs es poden
+repartir entre fils: NumPy allibera el GIL durant les operacions sobre arrays.
+
+Amb llum monocromàtica, la dco dels dos models és Δd més una suma de termes
+coef·R^p, i la intensitat de cada bloc es calcula amb el nucli fusionat de
+michelson.backends.
+"""
+
+import numpy as np
+
+from .backends import tria_backend
+from .geometria import eix
+from .model import (screen_size, res, long_ona, dist_lent, factor_escala, dco_esferic, dco_radial,
+                    intensitat_de_dco)
+
+# Píxels per bloc per defecte (uns 32 MiB per array temporal en float64)
+pixels_bloc = 2**22
+
+
+def _termes_esferic(mirror_diff, radi_curv):
+    # dco = Δd + Σ coef·R^p, com a (Δd, ((coef, p), ...))
+    a = 1/(2*dist_lent)
+    if radi_curv > 0:
+        a += 1/(2*radi_curv)
+    return mirror_diff, ((-a, 2),)
+
+
+def _termes_radial(mirror_diff, escala, potencia):
+    return mirror_diff, ((-1/(2*dist_lent), 2), (-2*escala*factor_escala(potencia), potencia))
+
+
+# Descomposició en termes de R^p de cada funció de dco
+_termes = {dco_esferic: _termes_esferic, dco_radial: _termes_radial}
+
+
+def calcula_per_blocs(funcio_dco, params, res=res, screen_size=screen_size, files_bloc=None,
+                      fils=1, sortida=None, dtype=np.float32, espectre=None, backend='numpy'):
+    """
+    funcio_dco: dco_esferic o dco_radial
+    params: paràmetres de funcio_dco després de R
+    files_bloc: files per bloc (per defecte, unes pixels_bloc / res)
+    fils: nombre de fils que calculen blocs en paral·lel
+    sortida: array (res, res) on escriure, nom d'un fitxer .npy (es crea com a
+             memmap) o None per crear un array en memòria
+    dtype: tipus de la sortida quan es crea aquí
+    espectre: espectre de la font (None per a llum monocromàtica)
+    backend: backend del càlcul de la intensitat amb llum monocromàtica (com a
+             EstatSimulacio); una funcio_dco sense descomposició en termes es
+             calcula amb NumPy
+    """
+    if files_bloc is None:
+        files_bloc = max(1, pixels_bloc // res)
+    if sortida is None:
+        sortida = np.empty((res, res), dtype=dtype)
+    elif isinstance(sortida, str):
+        sortida = np.lib.format.open_memmap(sortida, mode='w+', dtype=dtype, shape=(res, res))
+
+    x = eix(res, screen_size)
+    x2 = x**2
+    termes = None
+    if espectre is None and funcio_dco in _termes:
+        backend = tria_backend(backend)
+        k = 2*np.pi/long_ona
+        mirror_diff, termes = _termes[funcio_dco](*params)
+        # Termes nuls fora: amb escala 0 no cal calcular R^p
+        termes = [(k*coef, p) for coef, p in termes if coef != 0]
+
+    def calcula_bloc(i0):
+        i1 = min(i0 + files_bloc, res)
+        R2 = np.add.outer(x2[i0:i1], x2)
+        if termes is None:
+            sortida[i0:i1] = intensitat_de_dco(funcio_dco(np.sqrt(R2), *params), espectre)
+            return
+        # La intensitat es calcula en float64 i es converteix al tipus de la sortida en copiar-la
+        arrays = tuple((coef, R2 if p == 2 else R2**(p/2)) for coef, p in termes)
+        sortida[i0:i1] = backend.intensitat(np.empty_like(R2), k*mirror_diff, arrays)
+
+    inicis = range(0, res, files_bloc)
+    if fils > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(fils) as grup:
+            list(grup.map(calcula_bloc, inicis))
+    else:
+        for i0 in inicis:
+            calcula_bloc(i0)
+
+    if isinstance(sortida, np.memmap):
+        sortida.flush()
+    return sortida
+
+
+def intensitat_esferic_blocs(mirror_diff, radi_curv, **opcions):
+    # Opcions: les de calcula_per_blocs
+    return calcula_per_blocs(dco_esferic, (mirror_diff, radi_curv), **opcions)
+
+
+def intensitat_radial_blocs(mirror_diff, escala, potencia, **opcions):
+    # Opcions: les de calcula_per_blocs
+    return calcula_per_blocs(dco_radial, (mirror_diff, escala, potencia), **opcions)
@@ -0,0 +1,173 @@
+"""
+Bucle de render per a les interfícies amb sliders de matplotlib.
+
+Cada moviment d'un slider només guarda els paràmetres nous: si n'arriben diversos
+abans que acabi el càlcul en curs, només es calcula l'últim. El càlcul es fa en un
+fil treballador (numpy allibera el GIL a les operacions grans), i un temporitzador
+del canvas recull els resultats al fil de la interfície, a uns 60 Hz.
+
+El dibuix es fa amb blit: en cada dibuix complet es guarda el fons de la figura
+sense els artistes animats (la imatge, els textos que canvien i els eixos dels
+sliders), i cada fotograma nou restaura aquest fons i només redibuixa aquests
+artistes. La barra de colors, els eixos i els títols no es tornen a dibuixar.
+
+Mentre s'arrossega un slider es calcula una previsualització de baixa resolució;
+quan l'slider es deixa anar (o s'atura durant `repos` segons), el mateix estat es
+calcula a la resolució completa.
+"""
+
+import threading
+import time
+
+
+class BucleRender:
+    """
+    fig: figura de matplotlib
+    calcula: funció (params, previsualitzacio) -> resultat, cridada al fil treballador.
+             Amb previsualitzacio=True ha de retornar un resultat ràpid de baixa resolució.
+             El resultat no es pot sobreescriure fins que mostra l'hagi fet servir.
+    mostra: funció (resultat) cridada al fil de la interfície; hi va el set_data dels artistes
+    artistes: artistes que canvien a cada fotograma i es dibuixen amb blit
+    interval: període del temporitzador que recull els resultats (ms)
+    repos: temps sense moviment (s) a partir del qual l'slider es considera aturat
+    arrossegant: funció que diu si l'usuari està arrossegant un slider (p. ex. amb
+                 Slider.drag_active); per defecte, es considera arrossegament quan
+                 els canvis arriben a menys de `repos` segons l'un de l'altre
+    cronometre: michelson.cronometre.Cronometre on es registren les etapes (opcional)
+    """
+
+    def __init__(self, fig, calcula, mostra, artistes, interval=16, repos=0.1, arrossegant=None,
+                 cronometre=None):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.calcula = calcula
+        self.mostra = mostra
+        self.artistes = list(artistes)
+        self.repos = repos
+        self.arrossegant = arrossegant
+        self.cronometre = cronometre
+
+        for artista in self.artistes:
+            artista.set_animated(True)
+        self._fons = None
+        self._brut = False
+        self.canvas.mpl_connect('draw_event', self._en_dibuix)
+
+        self._condicio = threading.Condition()
+        self._params = None
+        self._versio = 0
+        self._t_peticio = 0.0
+        self._arrossega = False
+        self._resultat = None
+        self._lliure = True
+        self._tancat = False
+        self._fil = threading.Thread(target=self._treballa, daemon=True)
+        self._fil.start()
+
+        self._temporitzador = self.canvas.new_timer(interval=interval)
+        self._temporitzador.add_callback(self.recull)
+        self._temporitzador.start()
+        self.canvas.mpl_connect('close_event', lambda event: self.tanca())
+
+    def demana(self, params):
+        # Paràmetres nous (des del fil de la interfície); substitueixen els pendents
+        ara = time.perf_counter()
+        with self._condicio:
+            if self.arrossegant is not None:
+                self._arrossega = self.arrossegant()
+            else:
+                self._arrossega = ara - self._t_peticio < self.repos
+            self._t_peticio = ara
+            self._params = params
+            self._versio += 1
+            self._condicio.notify()
+        # Els sliders es redibuixen al tic següent encara que el càlcul no hagi acabat
+        self._brut = True
+
+    def redibuixa(self):
+        # Demana un dibuix complet (quan canvia un artista que no és animat, com el títol)
+        self.canvas.draw_idle()
+
+    def _seguent(self, fet):
+        # Previsualització (True), resolució completa (False) o res per calcular (None)
+        if fet[0] != self._versio:
+            return self._arrossega
+        if fet[1]:
+            return False
+        return None
+
+    def _treballa(self):
+        fet = (0, False)
+        while True:
+            with self._condicio:
+                while True:
+                    if self._tancat:
+                        return
+                    previsualitzacio = self._seguent(fet)
+                    espera = None
+                    if previsualitzacio is not None and self._lliure:
+                        espera = 0
+                        if fet[0] == self._versio:
+                            # El refinament espera que l'slider es deixi anar o s'aturi
+                            espera = self.repos - (time.perf_counter() - self._t_peticio)
+                            if espera <= 0 and self.arrossegant is not None and self.arrossegant():
+                                espera = self.repos
+                        if espera <= 0:
+                            break
+                    self._condicio.wait(espera)
+                versio, params = self._versio, self._params
+
+            t0 = time.perf_counter()
+            resultat = self.calcula(params, previsualitzacio)
+            if self.cronometre is not None:
+                self.cronometre.registra('previsualitzacio' if previsualitzacio else 'calcul',
+                                         t0, time.perf_counter())
+
+            with self._condicio:
+                self._resultat = resultat
+                self._lliure = False
+                fet = (versio, previsualitzacio)
+
+    def recull(self):
+        # Tic del temporitzador, al fil de la interfície
+        with self._condicio:
+            resultat, self._resultat = self._resultat, None
+        if resultat is not None:
+            t0 = time.perf_counter()
+            self.mostra(resultat)
+            if self.cronometre is not None:
+                self.cronometre.registra('mostra', t0, time.perf_counter())
+            with self._condicio:
+                self._lliure = True
+                self._condicio.notify()
+        elif not self._brut:
+            return
+        self._brut = False
+        self._dibuixa()
+
+    def _dibuixa(self):
+        if self._fons is None or not self.canvas.supports_blit:
+            self.canvas.draw_idle()
+            return
+        t0 = time.perf_counter()
+        self.canvas.restore_region(self._fons)
+        self._dibuixa_artistes()
+        self.canvas.blit(self.fig.bbox)
+        if self.cronometre is not None:
+            self.cronometre.registra('blit', t0, time.perf_counter())
+            self.cronometre.marca_fotograma()
+
+    def _dibuixa_artistes(self):
+        for artista in self.artistes:
+            self.fig.draw_artist(artista)
+
+    def _en_dibuix(self, event):
+        # Dibuix complet: es guarda el fons sense els artistes animats i s'hi afegeixen
+        self._fons = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._dibuixa_artistes()
+
+    def tanca(self):
+        self._temporitzador.stop()
+        with self._condicio:
+            self._tancat = True
+            self._condicio.notify()
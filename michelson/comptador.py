@@ -0,0 +1,240 @@
+"""
+Comptador de franges: sèrie temporal de la intensitat en uns quants detectors
+mentre Δd recorre una trajectòria, com la lectura d'un fotodetector.
+
+La dco d'un punt de la pantalla és Δd + g(x, y), amb g fix durant l'escombrat, així
+que la intensitat mitjana sobre un detector (un punt o una petita obertura) és
+
+    I(Δd) = 0.5·(1 + Re(A·exp(ikΔd))),    A = mitjana de exp(ik·g(x, y)) sobre el detector.
+
+L'amplitud complexa A de cada detector es calcula una sola vegada; després cada
+mostra de la trajectòria costa un cosinus i un sinus, compartits per tots els
+detectors, i un producte complex per detector, sense calcular cap pantalla. Amb
+|A| < 1 (una obertura que abasta part d'una franja) la visibilitat baixa, i amb
+|A| comparable al soroll el recompte i la fase deixen de ser fiables.
+
+Amb quadratura=True cada detector té un segon canal desfasat 90°, Q = 0.5·(1 + Im(A·exp(ikΔd))),
+com un detector amb una làmina λ/4 a la referència: la fase atan2(2Q-1, 2I-1) es
+desembolica i dona el desplaçament amb signe. El recompte de franges es fa amb un
+disparador de Schmitt sobre 2I-1 (llindars ±histeresi·|A|), que no es dispara pel
+soroll prop dels llindars. Tot l'estat (l'estat del disparador, l'última fase i els
+comptadors) passa d'un bloc al següent, de manera que una trajectòria de milions de
+mostres es processa per blocs amb memòria constant.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .inclinacio import dco_esferic_inclinat, dco_radial_inclinat
+from .model import screen_size, long_ona
+
+# x, y: centre del detector (m); radi: radi de l'obertura (m), 0 per a un punt
+Detector = namedtuple('Detector', ['x', 'y', 'radi'], defaults=[0.0])
+
+
+def punts_obertura(detector, mostres=16):
+    """
+    Punts d'una graella de mostres×mostres dins de l'obertura circular del detector.
+    Retorna (X, Y) en m; per a un detector puntual, el centre.
+    """
+    x, y, radi = detector
+    if radi <= 0:
+        return np.array([x]), np.array([y])
+    u = ((np.arange(mostres) + 0.5)/mostres*2 - 1)*radi
+    U, V = np.meshgrid(u, u)
+    dins = U**2 + V**2 <= radi**2
+    return x + U[dins], y + V[dins]
+
+
+class ComptadorFranges:
+    """
+    detectors: llista de Detector, o de tuples (x, y) o (x, y, radi) en m
+    model: 'esferic' (params = (radi_curv,)) o 'radial' (params = (escala, potencia))
+    params: paràmetres del mirall
+    theta_x, theta_y, font_x, font_y: inclinació del mirall i desplaçament de la font
+                                      (com a michelson.inclinacio)
+    quadratura: afegeix el canal desfasat 90° i desembolica la fase
+    histeresi: llindars del disparador de Schmitt, en fracció de l'amplitud de les franges
+    soroll: desviació estàndard del soroll gaussià sumat a cada canal
+    llavor: llavor del soroll
+    mostres_obertura: mostres per costat de la graella sobre cada obertura
+
+    Després de cada bloc: franges (recompte de Schmitt de cada detector, sense signe),
+    fase (fase desembolicada, amb quadratura), salts_ambigus (mostres en què Δd ha
+    canviat mitja longitud d'ona o més i la fase és ambigua) i mostres.
+    """
+
+    def __init__(self, detectors, model='esferic', params=(0,), theta_x=0, theta_y=0, font_x=0,
+                 font_y=0, quadratura=False, histeresi=0.5, soroll=0, llavor=None, mostres_obertura=16):
+        if model == 'esferic':
+            dco = dco_esferic_inclinat
+        elif model == 'radial':
+            dco = dco_radial_inclinat
+        else:
+            raise ValueError(f"Model desconegut: {model} (esferic o radial)")
+        self.detectors = [Detector(*d) for d in detectors]
+        self.quadratura = quadratura
+        self.histeresi = histeresi
+        self.soroll = soroll
+        self._rng = np.random.default_rng(llavor)
+        self._k = 2*np.pi/long_ona
+
+        # Amplitud complexa de cada detector amb Δd = 0
+        self.amplitud = np.array([
+            np.exp(1j*self._k*dco(*punts_obertura(d, mostres_obertura), 0, *params,
+                                  theta_x, theta_y, font_x, font_y)).mean()
+            for d in self.detectors])
+        self._llindar = histeresi*np.abs(self.amplitud)
+
+        n = len(self.detectors)
+        self.franges = np.zeros(n, dtype=np.int64)
+        self._estat = np.zeros(n, dtype=np.int8)   # últim llindar creuat: +1, -1 o 0 (cap encara)
+        self.fase = np.zeros(n) if quadratura else None
+        self._fase_embolicada = None
+        self._fase_inicial = None
+        self._ultim_dd = None
+        self.salts_ambigus = 0
+        self.mostres = 0
+
+    def _canals(self, mirror_diff):
+        # Intensitat (i quadratura) de cada detector per a cada mostra
+        fase = self._k*mirror_diff
+        cos, sin = np.cos(fase), np.sin(fase)
+        a, b = self.amplitud.real, self.amplitud.imag
+        canals = np.empty((len(mirror_diff), len(self.detectors), 2 if self.quadratura else 1))
+        # Re(A·e^{iφ}) i Im(A·e^{iφ})
+        np.subtract(np.multiply.outer(cos, a), np.multiply.outer(sin, b), out=canals[..., 0])
+        if self.quadratura:
+            np.add(np.multiply.outer(sin, a), np.multiply.outer(cos, b), out=canals[..., 1])
+        canals += 1
+        canals *= 0.5
+        if self.soroll:
+            canals += self._rng.normal(0, self.soroll, canals.shape)
+        return canals
+
+    def _schmitt(self, senyal):
+        # senyal: 2I-1 (mostres, detectors). Cada detector compta els pasos de -llindar a +llindar
+        events = np.zeros((len(senyal) + 1, senyal.shape[1]), dtype=np.int8)
+        events[0] = self._estat
+        events[1:][senyal > self._llindar] = 1
+        events[1:][senyal < -self._llindar] = -1
+        # L'estat de cada mostra és l'últim llindar creuat (omplert cap endavant)
+        files = np.arange(len(events))[:, None]
+        ultim = np.maximum.accumulate(np.where(events != 0, files, 0), axis=0)
+        estat = np.take_along_axis(events, ultim, axis=0)
+        self.franges += ((estat[1:] == 1) & (estat[:-1] == -1)).sum(axis=0)
+        self._estat = estat[-1]
+
+    def _desembolica(self, canals):
+        embolicada = np.arctan2(2*canals[..., 1] - 1, 2*canals[..., 0] - 1)
+        if self._fase_embolicada is None:
+            self._fase_inicial = embolicada[0].copy()
+            self.fase = embolicada[0].copy()
+            self._fase_embolicada = embolicada[0]
+        # Increments entre mostres, amb l'última fase del bloc anterior al davant,
+        # portats a [-π, π): només cal la suma, no tota la fase desembolicada
+        increments = np.diff(embolicada, axis=0, prepend=self._fase_embolicada[None])
+        increments -= 2*np.pi*np.rint(increments/(2*np.pi))
+        self.fase = self.fase + increments.sum(axis=0)
+        self._fase_embolicada = embolicada[-1]
+
+    def processa(self, mirror_diff, sortida=None):
+        """
+        Processa un bloc de la trajectòria.
+        mirror_diff: valors successius de Δd (m)
+        sortida: array (n, detectors) (o (n, detectors, 2) amb quadratura) on escriure
+                 la intensitat (opcional)
+        Retorna la intensitat del bloc.
+        """
+        mirror_diff = np.asarray(mirror_diff, dtype=float).ravel()
+        if not len(mirror_diff):
+            return np.empty((0, len(self.detectors)))
+        anterior = mirror_diff[:1] if self._ultim_dd is None else [self._ultim_dd]
+        passos = np.abs(np.diff(mirror_diff, prepend=anterior))
+        self.salts_ambigus += int((passos >= long_ona/2).sum())
+        self._ultim_dd = mirror_diff[-1]
+
+        canals = self._canals(mirror_diff)
+        self._schmitt(2*canals[..., 0] - 1)
+        if self.quadratura:
+            self._desembolica(canals)
+        self.mostres += len(mirror_diff)
+
+        intensitat = canals if self.quadratura else canals[..., 0]
+        if sortida is not None:
+            sortida[...] = intensitat
+        return intensitat
+
+    def desplacament(self):
+        # Canvi de Δd (m) des de la primera mostra, a partir de la fase desembolicada
+        if self._fase_inicial is None:
+            return None
+        return (self.fase - self._fase_inicial)/self._k
+
+
+def processa_trajectoria(comptador, trajectoria, mida_bloc=2**16, sortida=None):
+    """
+    Passa tota una trajectòria pel comptador, per blocs de mida_bloc mostres.
+    trajectoria: array de Δd (m), que pot ser un np.memmap, o un iterable de blocs
+    sortida: array (o np.memmap) amb una fila per mostra on escriure la intensitat (opcional)
+    Retorna el comptador.
+    """
+    if isinstance(trajectoria, np.ndarray):
+        blocs = (trajectoria[i:i+mida_bloc] for i in range(0, len(trajectoria), mida_bloc))
+    else:
+        blocs = trajectoria
+    inici = 0
+    for bloc in blocs:
+        n = len(bloc)
+        comptador.processa(bloc, None if sortida is None else sortida[inici:inici+n])
+        inici += n
+    if isinstance(sortida, np.memmap):
+        sortida.flush()
+    return comptador
+
+
+def comprova_comptador(res=500, n=200000):
+    """
+    Compara la intensitat dels detectors amb la de la pantalla completa (punts) i amb la
+    mitjana explícita sobre l'obertura, i el recompte de franges i el desplaçament amb
+    els d'un escombrat conegut. Retorna una llista de (cas, error).
+    """
+    from .geometria import eix
+    from .inclinacio import PantallaInclinada
+
+    x = eix(res, screen_size)
+    casos = [('esferic', (5,), (0, 0, 0, 0)), ('radial', (0.5, 2.5), (20e-6, -10e-6, 1e-3, 0))]
+    errors = []
+    for model, params, desalineat in casos:
+        pantalla = PantallaInclinada(res)
+        pixels = [(res//2, res//2), (res//3, 2*res//3), (10, res - 20)]
+        detectors = [(x[j], x[i]) for i, j in pixels] + [(0.002, 0.001, 0.0003)]
+        comptador = ComptadorFranges(detectors, model, params, *desalineat, quadratura=True)
+        dco = dco_esferic_inclinat if model == 'esferic' else dco_radial_inclinat
+
+        error_pixels = error_obertura = 0
+        for mirror_diff in (0, 0.13e-6, -0.41e-6):
+            if model == 'esferic':
+                imatge = pantalla.intensitat_esferic(mirror_diff, *params, *desalineat)
+            else:
+                imatge = pantalla.intensitat_radial(mirror_diff, *params, *desalineat)
+            intensitat = comptador._canals(np.array([mirror_diff]))[0, :, 0]
+            error_pixels = max(error_pixels, max(abs(intensitat[d] - imatge[i, j])
+                                                 for d, (i, j) in enumerate(pixels)))
+            X, Y = punts_obertura(comptador.detectors[-1])
+            explicit = (0.5*(1 + np.cos(comptador._k*dco(X, Y, mirror_diff, *params, *desalineat)))).mean()
+            error_obertura = max(error_obertura, abs(intensitat[-1] - explicit))
+        errors.append((f'{model}: detectors puntuals contra la pantalla', error_pixels))
+        errors.append((f'{model}: obertura contra la mitjana explícita', error_obertura))
+
+        # Anada de 20 franges i tornada de 7, amb soroll, en blocs petits
+        trajectoria = np.concatenate([np.linspace(0, 20*long_ona, n), np.linspace(20*long_ona, 13*long_ona, n)])
+        comptador = ComptadorFranges(detectors, model, params, *desalineat, quadratura=True,
+                                     soroll=0.02, llavor=0)
+        processa_trajectoria(comptador, trajectoria, mida_bloc=4096)
+        # Cada detector compta 27 franges; el desplaçament net és de 13
+        errors.append((f'{model}: franges comptades (27)', np.abs(comptador.franges - 27).max()))
+        errors.append((f'{model}: desplaçament desembolicat (m)',
+                       np.abs(comptador.desplacament() - 13*long_ona).max()))
+    return errors
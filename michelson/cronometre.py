@@ -0,0 +1,113 @@
+"""
+Mesura del temps de cada etapa de l'update de les interfícies gràfiques.
+
+Cada etapa (càlcul, detecció d'anells, set_data, dibuix...) es cronometra amb un
+context `with cronometre.etapa('calcul'):`. Es guarden les últimes durades de cada
+etapa per calcular la mitjana i els percentils, i tots els intervals com a traça
+que es pot exportar en JSON (format de traça d'esdeveniments de Chrome, que obren
+chrome://tracing i Perfetto).
+
+El dibuix del canvas no passa dins de l'update: draw_idle només el demana. Per
+mesurar-lo, instrumenta_canvas embolcalla canvas.draw, i els FPS es compten amb
+els dibuixos acabats.
+
+Les etapes es poden registrar des de qualsevol fil (el fil de càlcul de BucleRender
+registra el càlcul i la detecció d'anells): els registres i les lectures de les
+estadístiques i de la traça passen per un lock.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Cronometre:
+    """
+    finestra: nombre de mostres recents de cada etapa per a les estadístiques
+    max_esdeveniments: intervals que es guarden per a la traça (els més antics es descarten)
+    """
+
+    def __init__(self, finestra=120, max_esdeveniments=100000):
+        self.finestra = finestra
+        self._durades = {}
+        self._fotogrames = deque(maxlen=finestra)
+        self._esdeveniments = deque(maxlen=max_esdeveniments)
+        self._inici = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nom):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registra(nom, t0, time.perf_counter())
+
+    def registra(self, nom, t0, t1):
+        # Interval [t0, t1] (s, de time.perf_counter) de l'etapa nom
+        with self._lock:
+            if nom not in self._durades:
+                self._durades[nom] = deque(maxlen=self.finestra)
+            self._durades[nom].append(t1 - t0)
+            self._esdeveniments.append((nom, t0, t1))
+
+    def marca_fotograma(self):
+        with self._lock:
+            self._fotogrames.append(time.perf_counter())
+
+    def instrumenta_canvas(self, canvas, nom='dibuix'):
+        # Cronometra cada canvas.draw i el compta com a fotograma mostrat
+        original = canvas.draw
+
+        def draw(*args, **kwargs):
+            with self.etapa(nom):
+                resultat = original(*args, **kwargs)
+            self.marca_fotograma()
+            return resultat
+
+        canvas.draw = draw
+
+    def fps(self):
+        # Fotogrames per segon dins de la finestra
+        with self._lock:
+            fotogrames = list(self._fotogrames)
+        if len(fotogrames) < 2:
+            return 0.0
+        return (len(fotogrames) - 1) / (fotogrames[-1] - fotogrames[0])
+
+    def estadistiques(self):
+        # {etapa: {'n', 'mitjana', 'p50', 'p95', 'p99'}} amb els temps en segons
+        # Còpia sota el lock: un altre fil pot estar registrant mentre es calcula
+        with self._lock:
+            copia = [(nom, list(durades)) for nom, durades in self._durades.items()]
+        resultat = {}
+        for nom, durades in copia:
+            d = np.array(durades, dtype=float)
+            p50, p95, p99 = np.percentile(d, [50, 95, 99])
+            resultat[nom] = {'n': len(d), 'mitjana': d.mean(), 'p50': p50, 'p95': p95, 'p99': p99}
+        return resultat
+
+    def text(self):
+        # Resum per mostrar a la interfície
+        linies = [f"{self.fps():5.1f} FPS", f"{'etapa':<9}{'mitj':>7}{'p50':>7}{'p95':>7}  (ms)"]
+        for nom, e in self.estadistiques().items():
+            linies.append(f"{nom:<9}{e['mitjana']*1e3:7.1f}{e['p50']*1e3:7.1f}{e['p95']*1e3:7.1f}")
+        return '\n'.join(linies)
+
+    def exporta_json(self, fitxer):
+        """
+        Escriu la traça en el format d'esdeveniments de Chrome, amb les estadístiques
+        de la finestra actual a 'estadistiques'.
+        """
+        with self._lock:
+            intervals = list(self._esdeveniments)
+        esdeveniments = [{'name': nom, 'ph': 'X', 'pid': 0, 'tid': 0,
+                          'ts': (t0 - self._inici)*1e6, 'dur': (t1 - t0)*1e6}
+                         for nom, t0, t1 in intervals]
+        with open(fitxer, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': esdeveniments, 'displayTimeUnit': 'ms',
+                       'fps': self.fps(), 'estadistiques': self.estadistiques()}, f)
@@ -0,0 +1,280 @@
+"""
+Conjunts de dades de patrons d'interferència guardats a disc, per entrenar models.
+
+Un conjunt és un directori amb:
+
+- index.json: metadades (resolució, quantització, mida dels fragments...) i la
+  llista de fragments acabats.
+- params.npy: paràmetres de totes les mostres, una fila (Δd, radi_curv, escala,
+  potencia, long_ona) per mostra. Els paràmetres que no són del model són NaN:
+  les mostres amb radi_curv són del mirall esfèric i la resta, de la família R^n.
+- fragment_NNNNN.npz (comprimit) o fragment_NNNNN.npy (sense comprimir): les
+  imatges quantitzades (uint8 o uint16) d'un tros consecutiu de mostres.
+
+Cada fragment s'escriu en un fitxer temporal i es reanomena quan és complet, i
+l'índex s'actualitza després. Si la generació s'interromp, tornar-la a cridar amb
+els mateixos paràmetres només calcula els fragments que falten. Per llegir, els
+fragments .npy s'obren en memòria mapada i els .npz es descomprimeixen sencers
+quan es demanen (es guarden els últims en memòria), de manera que cap dels dos
+casos carrega el conjunt complet a la RAM.
+"""
+
+import argparse
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .espectre import Espectre
+from .model import screen_size, res, long_ona, dco_esferic, dco_radial, intensitat_de_dco
+from .perfil_radial import MapaRadial
+
+columnes = ('mirror_diff', 'radi_curv', 'escala', 'potencia', 'long_ona')
+
+# Estat de cada procés treballador
+_mapa = None
+
+
+def parametres(mirror_diffs, radis_curv=None, escales=None, potencies=None, longs_ona=None):
+    """
+    Taula (N, 5) de paràmetres a partir de columnes de la mateixa llargada (o escalars).
+    Amb radis_curv les mostres són del mirall esfèric; amb escales i potencies, R^n.
+    """
+    mirror_diffs = np.atleast_1d(np.asarray(mirror_diffs, dtype=float))
+    taula = np.full((len(mirror_diffs), len(columnes)), np.nan)
+    taula[:, 0] = mirror_diffs
+    if radis_curv is not None:
+        taula[:, 1] = radis_curv
+    else:
+        taula[:, 2] = escales
+        taula[:, 3] = potencies
+    taula[:, 4] = long_ona if longs_ona is None else longs_ona
+    return taula
+
+
+def parametres_aleatoris(n, model='esferic', llavor=0, dd=(-2e-6, 2e-6), radi=(0.5, 20),
+                         escala=(0, 1), potencies=(1.0, 2.0, 3.0, 4.0), long_ona=(long_ona, long_ona)):
+    """
+    n mostres amb paràmetres uniformes dins dels intervals donats (reproduïbles amb llavor).
+    """
+    rng = np.random.default_rng(llavor)
+    mirror_diffs = rng.uniform(*dd, n)
+    longs_ona = rng.uniform(*long_ona, n)
+    if model == 'esferic':
+        return parametres(mirror_diffs, rng.uniform(*radi, n), longs_ona=longs_ona)
+    return parametres(mirror_diffs, escales=rng.uniform(*escala, n),
+                      potencies=rng.choice(potencies, n), longs_ona=longs_ona)
+
+
+def _intensitat(mapa, fila):
+    mirror_diff, radi_curv, escala, potencia, lambda_ = fila
+    if np.isnan(radi_curv):
+        dco = dco_radial(mapa.r, mirror_diff, escala, potencia)
+    else:
+        dco = dco_esferic(mapa.r, mirror_diff, radi_curv)
+    # Una altra longitud d'ona és un espectre d'una sola mostra
+    espectre = None if lambda_ == long_ona else Espectre.mostrejat([lambda_], [1])
+    return mapa.expandeix(intensitat_de_dco(dco, espectre))
+
+
+def _inicia_treballador(res, screen_size):
+    global _mapa
+    _mapa = MapaRadial(res, screen_size)
+
+
+def _escriu_fragment(directori, i, params, dtype, comprimit):
+    """
+    Calcula i escriu el fragment i. Retorna el nom del fitxer.
+    """
+    dtype = np.dtype(dtype)
+    maxim = np.iinfo(dtype).max
+    imatges = np.empty((len(params), _mapa.res, _mapa.res), dtype=dtype)
+    for j, fila in enumerate(params):
+        np.clip(np.rint(_intensitat(_mapa, fila) * maxim), 0, maxim, out=imatges[j],
+                casting='unsafe')
+
+    nom = f'fragment_{i:05d}.' + ('npz' if comprimit else 'npy')
+    temporal = os.path.join(directori, nom + '.tmp')
+    with open(temporal, 'wb') as f:
+        if comprimit:
+            np.savez_compressed(f, imatges=imatges, params=params)
+        else:
+            np.save(f, imatges)
+    os.replace(temporal, os.path.join(directori, nom))
+    return nom
+
+
+def _desa_index(directori, index):
+    temporal = os.path.join(directori, 'index.json.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+    os.replace(temporal, os.path.join(directori, 'index.json'))
+
+
+def genera(directori, params, res=res, screen_size=screen_size, mida_fragment=1024,
+           dtype=np.uint8, comprimit=True, processos=None):
+    """
+    directori: directori del conjunt (es crea si no existeix)
+    params: taula (N, 5) de paràmetres (vegeu parametres i parametres_aleatoris)
+    mida_fragment: mostres per fragment
+    dtype: np.uint8 o np.uint16 per a les imatges quantitzades
+    comprimit: fragments .npz comprimits; False els escriu .npy per llegir-los en memòria mapada
+    processos: processos que calculen fragments (per defecte, un per CPU; 0, el procés actual)
+    Si el directori ja conté una generació amb els mateixos paràmetres, només es
+    calculen els fragments que falten. Retorna el ConjuntPatrons.
+    """
+    params = np.asarray(params, dtype=float)
+    os.makedirs(directori, exist_ok=True)
+    cami_index = os.path.join(directori, 'index.json')
+    n_fragments = -(-len(params) // mida_fragment)
+    metadades = {'res': int(res), 'screen_size': float(screen_size), 'mostres': len(params),
+                 'mida_fragment': mida_fragment, 'dtype': np.dtype(dtype).name,
+                 'comprimit': comprimit, 'columnes': list(columnes)}
+
+    if os.path.exists(cami_index):
+        with open(cami_index, encoding='utf-8') as f:
+            index = json.load(f)
+        anteriors = np.load(os.path.join(directori, 'params.npy'), mmap_mode='r')
+        if {k: index[k] for k in metadades} != metadades or not np.array_equal(anteriors, params, equal_nan=True):
+            raise ValueError(f"{directori} ja conté un conjunt generat amb uns altres paràmetres")
+    else:
+        np.save(os.path.join(directori, 'params.npy'), params)
+        index = dict(metadades, fragments={})
+        _desa_index(directori, index)
+
+    pendents = [i for i in range(n_fragments) if str(i) not in index['fragments']]
+    treballs = [(i, params[i*mida_fragment:(i+1)*mida_fragment]) for i in pendents]
+
+    def acabat(i, nom):
+        index['fragments'][str(i)] = nom
+        _desa_index(directori, index)
+
+    if processos == 0:
+        _inicia_treballador(res, screen_size)
+        for i, p in treballs:
+            acabat(i, _escriu_fragment(directori, i, p, dtype, comprimit))
+    elif treballs:
+        # Importat aquí perquè importar el paquet no carregui multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(processos or os.cpu_count(), initializer=_inicia_treballador,
+                                 initargs=(res, screen_size)) as grup:
+            tasques = {grup.submit(_escriu_fragment, directori, i, p, dtype, comprimit): i
+                       for i, p in treballs}
+            for tasca in as_completed(tasques):
+                acabat(tasques[tasca], tasca.result())
+    return ConjuntPatrons(directori)
+
+
+class ConjuntPatrons:
+    """
+    directori: directori creat per genera
+    fragments_en_memoria: fragments .npz descomprimits que es guarden en memòria
+
+    conjunt[i] dona la imatge quantitzada i; conjunt[inici:fi] o conjunt[llista]
+    donen un array (N, res, res). conjunt.params són els paràmetres de totes les mostres.
+    """
+
+    def __init__(self, directori, fragments_en_memoria=2):
+        self.directori = directori
+        with open(os.path.join(directori, 'index.json'), encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.params = np.load(os.path.join(directori, 'params.npy'), mmap_mode='r')
+        self.res = self.index['res']
+        self.mida_fragment = self.index['mida_fragment']
+        self.dtype = np.dtype(self.index['dtype'])
+        self.fragments_en_memoria = fragments_en_memoria
+        self._oberts = OrderedDict()
+
+    def __len__(self):
+        return len(self.params)
+
+    @property
+    def complet(self):
+        return len(self.index['fragments']) * self.mida_fragment >= len(self)
+
+    def fragment(self, i):
+        # Imatges del fragment i: memmap (.npy) o array descomprimit (.npz)
+        imatges = self._oberts.get(i)
+        if imatges is not None:
+            self._oberts.move_to_end(i)
+            return imatges
+        nom = self.index['fragments'].get(str(i))
+        if nom is None:
+            raise IndexError(f"El fragment {i} encara no s'ha generat")
+        cami = os.path.join(self.directori, nom)
+        if nom.endswith('.npy'):
+            imatges = np.load(cami, mmap_mode='r')
+        else:
+            with np.load(cami) as arxiu:
+                imatges = arxiu['imatges']
+        self._oberts[i] = imatges
+        # Els memmaps no ocupen memòria, però també es limita el nombre de fitxers oberts
+        while len(self._oberts) > max(1, self.fragments_en_memoria):
+            self._oberts.popitem(last=False)
+        return imatges
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            if i < 0:
+                i += len(self)
+            if not 0 <= i < len(self):
+                raise IndexError(i)
+            return self.fragment(i // self.mida_fragment)[i % self.mida_fragment]
+        indexs = np.arange(len(self))[i]
+        resultat = np.empty((len(indexs), self.res, self.res), dtype=self.dtype)
+        # Agrupats per fragment, perquè cada fragment s'obri una sola vegada
+        ordre = np.argsort(indexs, kind='stable')
+        fragments = indexs[ordre] // self.mida_fragment
+        for f in np.unique(fragments):
+            seleccio = ordre[fragments == f]
+            resultat[seleccio] = self.fragment(f)[indexs[seleccio] % self.mida_fragment]
+        return resultat
+
+    def intensitat(self, i):
+        # Imatge i com a intensitat real entre 0 i 1
+        return self[i].astype(np.float32) / np.iinfo(self.dtype).max
+
+
+def _interval(valors):
+    # INICI FI -> (inici, fi)
+    return float(valors[0]), float(valors[1])
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Genera un conjunt de patrons d'interferència")
+    parser.add_argument('directori')
+    parser.add_argument('model', choices=['esferic', 'radial'])
+    parser.add_argument('--mostres', type=int, required=True)
+    parser.add_argument('--dd', nargs=2, default=[-2, 2], metavar=('INICI', 'FI'), help='Δd en µm')
+    parser.add_argument('--radi', nargs=2, default=[0.5, 20], metavar=('INICI', 'FI'),
+                        help='radi de curvatura en m (model esferic)')
+    parser.add_argument('--escala', nargs=2, default=[0, 1], metavar=('INICI', 'FI'),
+                        help='factor de deformació (model radial)')
+    parser.add_argument('--potencia', nargs='+', type=float, default=[1.0, 2.0, 3.0, 4.0],
+                        help='potències de R (model radial)')
+    parser.add_argument('--long-ona', nargs=2, default=[long_ona*1e9]*2, metavar=('INICI', 'FI'),
+                        help="longitud d'ona en nm")
+    parser.add_argument('--llavor', type=int, default=0)
+    parser.add_argument('--res', type=int, default=256)
+    parser.add_argument('--mida-fragment', type=int, default=1024)
+    parser.add_argument('--uint16', action='store_true', help='imatges quantitzades a 16 bits')
+    parser.add_argument('--sense-compressio', action='store_true',
+                        help='fragments .npy per llegir-los en memòria mapada')
+    parser.add_argument('--processos', type=int)
+    args = parser.parse_args(args)
+
+    dd = _interval(args.dd)
+    params = parametres_aleatoris(args.mostres, args.model, args.llavor,
+                                  dd=(dd[0]*1e-6, dd[1]*1e-6), radi=_interval(args.radi),
+                                  escala=_interval(args.escala), potencies=args.potencia,
+                                  long_ona=tuple(v*1e-9 for v in _interval(args.long_ona)))
+    conjunt = genera(args.directori, params, res=args.res, mida_fragment=args.mida_fragment,
+                     dtype=np.uint16 if args.uint16 else np.uint8,
+                     comprimit=not args.sense_compressio, processos=args.processos)
+    print(f"{len(conjunt)} mostres a {args.directori}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Escombrat de paràmetres sense interfície gràfica.
+
+Calcula els patrons i les mesures dels anells per a una graella de valors de
+(Δd, radi de curvatura) o (Δd, escala, potència), repartint la feina en un grup de
+processos. R² es crea una sola vegada en memòria compartida i tots els processos
+el fan servir sense copiar-lo. Els resultats s'escriuen a disc a mesura que
+arriben, una línia JSON per configuració, i els patrons (opcionals) dins d'un
+fitxer .npy obert com a memmap.
+
+Exemple:
+
+    python -m michelson.escombrat esferic --dd -2 2 41 --radi 0.5 20 40 --sortida taula.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import os
+
+import numpy as np
+
+from .anells import trobar_anells, calcular_radi_curv, incertesa_radis
+from .estat import EstatSimulacio
+from .geometria import eix
+from .model import screen_size, res
+
+# Estat de cada procés treballador
+_estat = None
+_memoria = None
+_patrons = None
+
+
+def graella(mirror_diffs, valors, potencies=None):
+    """
+    mirror_diffs: valors de Δd (m)
+    valors: radis de curvatura (m) o escales de deformació
+    potencies: potències de R; si és None, el model és el mirall esfèric
+    Retorna la llista de tuples de paràmetres.
+    """
+    if potencies is None:
+        return list(itertools.product(mirror_diffs, valors))
+    return list(itertools.product(mirror_diffs, valors, potencies))
+
+
+def _inicia_treballador(nom_memoria, res, screen_size, dtype, fitxer_patrons):
+    from multiprocessing import shared_memory
+
+    global _estat, _memoria, _patrons
+    _memoria = shared_memory.SharedMemory(name=nom_memoria)
+    R2 = np.ndarray((res, res), dtype=dtype, buffer=_memoria.buf)
+    _estat = EstatSimulacio(res, screen_size, dtype=dtype, R2=R2)
+    if fitxer_patrons is not None:
+        _patrons = np.load(fitxer_patrons, mmap_mode='r+')
+
+
+def _calcula_bloc(bloc):
+    resultats = []
+    for i, params in bloc:
+        if len(params) == 2:
+            intensitat = _estat.intensitat_esferic(*params)
+        else:
+            intensitat = _estat.intensitat_radial(*params)
+
+        radis = trobar_anells(intensitat, _estat.screen_size)
+        R_calc, incertesa = calcular_radi_curv(radis, sigma=incertesa_radis(_estat.res, _estat.screen_size))
+        resultats.append({
+            'i': i,
+            'params': [float(p) for p in params],
+            'n_anells': len(radis),
+            'radis': radis.tolist(),
+            'radi_curv': R_calc,
+            'incertesa': incertesa,
+        })
+
+        if _patrons is not None:
+            if _patrons.dtype == np.uint8:
+                _patrons[i] = np.rint(intensitat * 255)
+            else:
+                _patrons[i] = intensitat
+    if _patrons is not None:
+        _patrons.flush()
+    return resultats
+
+
+def escombra(configuracions, sortida, res=res, screen_size=screen_size, processos=None,
+             mida_bloc=16, fitxer_patrons=None, dtype_patrons=np.uint8, dtype=np.float64):
+    """
+    configuracions: tuples (Δd, radi_curv) o (Δd, escala, potencia)
+    sortida: fitxer on s'escriu una línia JSON per configuració
+    processos: nombre de processos (per defecte, un per CPU)
+    mida_bloc: configuracions per tasca
+    fitxer_patrons: fitxer .npy on desar els patrons (opcional)
+    dtype_patrons: np.uint8 (intensitat quantitzada a 0-255) o un tipus real
+    dtype: tipus del càlcul (np.float64 o np.float32)
+    Retorna el nombre de configuracions calculades.
+    """
+    # Importats aquí perquè importar el paquet no carregui multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+    from multiprocessing import shared_memory
+
+    configuracions = list(configuracions)
+    processos = processos or os.cpu_count()
+    dtype = np.dtype(dtype)
+
+    if fitxer_patrons is not None:
+        patrons = np.lib.format.open_memmap(fitxer_patrons, mode='w+', dtype=dtype_patrons,
+                                            shape=(len(configuracions), res, res))
+        del patrons
+
+    # R² en memòria compartida, calculat una sola vegada
+    memoria = shared_memory.SharedMemory(create=True, size=res*res*dtype.itemsize)
+    try:
+        x = eix(res, screen_size)
+        R2 = np.ndarray((res, res), dtype=dtype, buffer=memoria.buf)
+        np.add.outer(x**2, x**2, out=R2)
+        del R2
+
+        numerades = list(enumerate(configuracions))
+        blocs = (numerades[i:i+mida_bloc] for i in range(0, len(numerades), mida_bloc))
+        fets = 0
+        with open(sortida, 'w', encoding='utf-8') as f, \
+                ProcessPoolExecutor(processos, initializer=_inicia_treballador,
+                                    initargs=(memoria.name, res, screen_size, dtype,
+                                              fitxer_patrons)) as grup:
+            # Com a molt dues tasques pendents per procés, per no acumular resultats en memòria
+            pendents = {grup.submit(_calcula_bloc, b) for b in itertools.islice(blocs, 2*processos)}
+            while pendents:
+                acabats, pendents = wait(pendents, return_when=FIRST_COMPLETED)
+                for tasca in acabats:
+                    for resultat in tasca.result():
+                        f.write(json.dumps(resultat) + '\n')
+                        fets += 1
+                    f.flush()
+                    for b in itertools.islice(blocs, 1):
+                        pendents.add(grup.submit(_calcula_bloc, b))
+        return fets
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+
+def _interval(valors):
+    # INICI FI N -> np.linspace(INICI, FI, N)
+    inici, fi, n = valors
+    return np.linspace(float(inici), float(fi), int(n))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Escombrat de paràmetres de l'interferòmetre de Michelson")
+    parser.add_argument('model', choices=['esferic', 'radial'])
+    parser.add_argument('--dd', nargs=3, required=True, metavar=('INICI', 'FI', 'N'),
+                        help='Δd en µm')
+    parser.add_argument('--radi', nargs=3, metavar=('INICI', 'FI', 'N'),
+                        help='radi de curvatura en m (model esferic)')
+    parser.add_argument('--escala', nargs=3, metavar=('INICI', 'FI', 'N'),
+                        help='factor de deformació (model radial)')
+    parser.add_argument('--potencia', nargs='+', type=float, default=[1.0],
+                        help='potències de R (model radial)')
+    parser.add_argument('--sortida', required=True, help='fitxer JSONL de resultats')
+    parser.add_argument('--patrons', help='fitxer .npy on desar els patrons')
+    parser.add_argument('--float32', action='store_true', help='calcula en float32')
+    parser.add_argument('--res', type=int, default=res)
+    parser.add_argument('--processos', type=int)
+    parser.add_argument('--mida-bloc', type=int, default=16)
+    args = parser.parse_args(args)
+
+    mirror_diffs = _interval(args.dd) * 1e-6
+    if args.model == 'esferic':
+        if args.radi is None:
+            parser.error('el model esferic necessita --radi')
+        configuracions = graella(mirror_diffs, _interval(args.radi))
+    else:
+        if args.escala is None:
+            parser.error('el model radial necessita --escala')
+        configuracions = graella(mirror_diffs, _interval(args.escala), args.potencia)
+
+    fets = escombra(configuracions, args.sortida, res=args.res, processos=args.processos,
+                    mida_bloc=args.mida_bloc, fitxer_patrons=args.patrons,
+                    dtype=np.float32 if args.float32 else np.float64)
+    print(f"{fets} configuracions escrites a {args.sortida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Font parcialment coherent: intensitat integrada sobre l'espectre de la font.
+
+Amb un espectre normalitzat S(σ) en nombre d'ona σ = 1/λ,
+    I = 0.5 * (1 + ∫ S(σ) cos(2π σ dco) dσ),
+així que la visibilitat de les franges cau a mesura que la dco creix.
+
+Per als espectres gaussià i lorentzià la integral té forma tancada (envolupant
+per portadora). Un espectre mostrejat es suma en lots vectoritzats: cada lot és un
+producte matriu-vector dels pesos per una matriu de cosinus (mostres x punts).
+Com que la dco només depèn de R, amb el perfil radial el cost és proporcional al
+nombre de radis per al nombre de mostres, no al nombre de píxels.
+"""
+
+import numpy as np
+
+from .model import long_ona
+
+# Elements de la matriu de cosinus per lot (uns 32 MiB en float64)
+elements_lot = 2**22
+
+_fwhm_sigma = 2*np.sqrt(2*np.log(2))
+
+
+class Espectre:
+    """
+    nombres_ona: nombres d'ona σ = 1/λ de les mostres (1/m)
+    pesos: pes de cada mostra (es normalitzen a suma 1)
+    forma: 'gaussia' o 'lorentzia' per fer servir la forma tancada, o None
+    sigma0, amplada: centre i amplada en nombre d'ona de la forma tancada
+                     (desviació estàndard per la gaussiana, semiamplada per la lorentziana)
+
+    Normalment es creen amb Espectre.gaussia, Espectre.lorentzia o Espectre.mostrejat.
+    """
+
+    def __init__(self, nombres_ona, pesos, forma=None, sigma0=None, amplada=None):
+        self.nombres_ona = np.asarray(nombres_ona, dtype=float)
+        pesos = np.asarray(pesos, dtype=float)
+        self.pesos = pesos / pesos.sum()
+        self.forma = forma
+        self.sigma0 = sigma0
+        self.amplada = amplada
+
+    @classmethod
+    def gaussia(cls, long_ona=long_ona, amplada=10e-9, mostres=64):
+        """
+        long_ona: longitud d'ona central (m)
+        amplada: amplada a mitja altura en longitud d'ona (m)
+        mostres: mostres de la representació discreta (només per comparar)
+        """
+        sigma0 = 1/long_ona
+        desviacio = amplada / long_ona**2 / _fwhm_sigma
+        sigmes = sigma0 + desviacio*np.linspace(-4, 4, mostres)
+        pesos = np.exp(-0.5*((sigmes - sigma0)/desviacio)**2)
+        return cls(sigmes, pesos, 'gaussia', sigma0, desviacio)
+
+    @classmethod
+    def lorentzia(cls, long_ona=long_ona, amplada=10e-9, mostres=256):
+        """
+        long_ona: longitud d'ona central (m)
+        amplada: amplada a mitja altura en longitud d'ona (m)
+        mostres: mostres de la representació discreta (només per comparar)
+        """
+        sigma0 = 1/long_ona
+        semiamplada = amplada / long_ona**2 / 2
+        sigmes = sigma0 + semiamplada*np.linspace(-50, 50, mostres)
+        pesos = 1/(1 + ((sigmes - sigma0)/semiamplada)**2)
+        return cls(sigmes, pesos, 'lorentzia', sigma0, semiamplada)
+
+    @classmethod
+    def mostrejat(cls, longituds_ona, pesos):
+        """
+        longituds_ona: longituds d'ona de les mostres (m)
+        pesos: intensitat espectral de cada mostra
+        """
+        return cls(1/np.asarray(longituds_ona, dtype=float), pesos)
+
+    def interferencia(self, dco, forma_tancada=True):
+        """
+        Terme ∫ S(σ) cos(2π σ dco) dσ per a cada valor de dco.
+        forma_tancada: False obliga a sumar les mostres encara que hi hagi forma tancada
+        """
+        dco = np.asarray(dco, dtype=float)
+        if forma_tancada and self.forma == 'gaussia':
+            envolupant = np.exp(-2*(np.pi*self.amplada*dco)**2)
+        elif forma_tancada and self.forma == 'lorentzia':
+            envolupant = np.exp(-2*np.pi*self.amplada*np.abs(dco))
+        else:
+            return self._suma_mostres(dco)
+        return envolupant * np.cos(2*np.pi*self.sigma0*dco)
+
+    def _suma_mostres(self, dco):
+        pla = dco.ravel()
+        resultat = np.empty_like(pla)
+        punts_lot = max(1, elements_lot // len(self.nombres_ona))
+        fases = 2*np.pi*self.nombres_ona[:, None]
+        for i in range(0, len(pla), punts_lot):
+            cosinus = np.cos(fases * pla[None, i:i+punts_lot])
+            np.dot(self.pesos, cosinus, out=resultat[i:i+punts_lot])
+        return resultat.reshape(dco.shape)
+
+    def intensitat(self, dco, forma_tancada=True):
+        # Intensitat amb coherència parcial; amb una sola mostra és la monocromàtica
+        return 0.5 * (1 + self.interferencia(dco, forma_tancada))
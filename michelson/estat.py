@@ -0,0 +1,112 @@
+"""
+Estat reutilitzable per calcular fotogrames sobre la malla completa sense crear
+arrays nous a cada fotograma.
+
+Els termes que no depenen dels sliders (R², el terme de la font puntual i R**p per
+a cada potència) es calculen una sola vegada per resolució. La fase i la intensitat
+s'escriuen dins de buffers preassignats. Amb llum monocromàtica la intensitat es
+calcula directament dels termes amb el nucli fusionat de michelson.backends.
+"""
+
+import numpy as np
+
+from .backends import tria_backend
+from .geometria import eix
+from .model import screen_size, res, long_ona, dist_lent, factor_escala
+
+
+class EstatSimulacio:
+    """
+    res, screen_size: geometria de la pantalla
+    dtype: tipus dels buffers i de la intensitat (np.float64 o np.float32).
+           Amb float32 la memòria es redueix a la meitat; la fase conserva prou
+           precisió mentre les franges estiguin resoltes a la pantalla.
+    R2: R² de la pantalla ja calculat (opcional, per compartir-lo entre processos)
+    backend: backend del càlcul de la intensitat ('numpy', 'numexpr', 'numba', 'auto'
+             o un backend creat amb michelson.backends.tria_backend); 'auto' mesura
+             els instal·lats la primera vegada i tria el més ràpid
+
+    La intensitat retornada és sempre el mateix buffer, que es sobreescriu al
+    càlcul següent.
+    """
+
+    def __init__(self, res=res, screen_size=screen_size, dtype=np.float64, R2=None, backend='numpy'):
+        self.res = res
+        self.screen_size = screen_size
+        self.dtype = np.dtype(dtype)
+
+        if R2 is None:
+            x = eix(res, screen_size)
+            R2 = np.add.outer(x**2, x**2)
+        self._R2 = np.asarray(R2, dtype=self.dtype)
+        self._Rp = {2.0: self._R2}
+
+        self._k = 2 * np.pi / long_ona
+        # Fase de la font puntual, -k R²/(2 dist_lent)
+        self._fase_font = self._R2 * self.dtype.type(-self._k / (2*dist_lent))
+
+        self.fase = np.empty((res, res), dtype=self.dtype)
+        self.intensitat = np.empty((res, res), dtype=self.dtype)
+        self.backend = tria_backend(backend, dtype=self.dtype)
+
+    def potencia_R(self, potencia):
+        # R**potencia memoritzat per potència
+        potencia = float(potencia)
+        if potencia not in self._Rp:
+            self._Rp[potencia] = np.power(self._R2, potencia/2, dtype=self.dtype)
+        return self._Rp[potencia]
+
+    def _coef_esferic(self, radi_curv):
+        # Els dos termes són proporcionals a R², així que n'hi ha prou amb una multiplicació
+        coef = 1/(2*dist_lent)
+        if radi_curv > 0:
+            coef += 1/(2*radi_curv)
+        return -self._k*coef
+
+    def _coef_radial(self, escala, potencia):
+        return -2*self._k*escala*factor_escala(potencia)
+
+    def fase_esferic(self, mirror_diff, radi_curv, out=None):
+        """
+        mirror_diff: diferència de distància entre els braços (m)
+        radi_curv: radi de curvatura del mirall (m), 0 vol dir mirall pla
+        out: array on escriure la fase (per defecte, el buffer de l'estat)
+        """
+        out = self.fase if out is None else out
+        np.multiply(self._R2, self._coef_esferic(radi_curv), out=out)
+        out += self._k*mirror_diff
+        return out
+
+    def fase_radial(self, mirror_diff, escala, potencia, out=None):
+        """
+        mirror_diff: diferència de distància entre els braços (m)
+        escala: factor de deformació
+        potencia: potència de R de la deformació
+        out: array on escriure la fase (per defecte, el buffer de l'estat)
+        """
+        out = self.fase if out is None else out
+        np.multiply(self.potencia_R(potencia), self._coef_radial(escala, potencia), out=out)
+        out += self._fase_font
+        out += self._k*mirror_diff
+        return out
+
+    def _intensitat_espectre(self, espectre):
+        # La fase de l'estat és k·dco amb la longitud d'ona nominal
+        self.fase /= self._k
+        self.intensitat[...] = espectre.intensitat(self.fase)
+        return self.intensitat
+
+    def intensitat_esferic(self, mirror_diff, radi_curv, espectre=None):
+        if espectre is not None:
+            self.fase_esferic(mirror_diff, radi_curv)
+            return self._intensitat_espectre(espectre)
+        return self.backend.intensitat(self.intensitat, self._k*mirror_diff,
+                                       ((self._coef_esferic(radi_curv), self._R2),))
+
+    def intensitat_radial(self, mirror_diff, escala, potencia, espectre=None):
+        if espectre is not None:
+            self.fase_radial(mirror_diff, escala, potencia)
+            return self._intensitat_espectre(espectre)
+        # Mateix ordre d'operacions que fase_radial: R^p, la font i Δd
+        termes = ((self._coef_radial(escala, potencia), self.potencia_R(potencia)), (1, self._fase_font))
+        return self.backend.intensitat(self.intensitat, self._k*mirror_diff, termes)
@@ -0,0 +1,26 @@
+"""
+Geometria de la pantalla. Els arrays es construeixen només quan es demanen i es
+guarden en memòria cau per resolució, marcats com a només lectura.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=8)
+def eix(res, screen_size):
+    # Coordenades dels píxels en un eix de la pantalla (m)
+    x = np.linspace(-screen_size/2, screen_size/2, res)
+    x.flags.writeable = False
+    return x
+
+
+@lru_cache(maxsize=2)
+def malla_radial(res, screen_size):
+    # Distància de cada píxel al centre de la pantalla (m)
+    x = eix(res, screen_size)
+    X, Y = np.meshgrid(x, x)
+    R = np.sqrt(X**2 + Y**2)
+    R.flags.writeable = False
+    return R
@@ -0,0 +1,50 @@
+"""
+Codificació mínima de PNG amb zlib, sense dependències externes.
+
+Només cal per desar fotogrames de la simulació: imatges de 8 bits en gris o RGB.
+Totes les files fan servir el filtre "Up" (diferència amb la fila anterior), que
+comprimeix bé els anells, i es calcula de forma vectoritzada.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+_signatura = b'\x89PNG\r\n\x1a\n'
+
+
+def _bloc(tipus, dades):
+    return (struct.pack('>I', len(dades)) + tipus + dades
+            + struct.pack('>I', zlib.crc32(tipus + dades) & 0xffffffff))
+
+
+def quantitza(intensitat, out=None):
+    # Intensitat 0-1 a uint8 0-255
+    if out is None:
+        out = np.empty(intensitat.shape, dtype=np.uint8)
+    np.clip(np.rint(intensitat * 255), 0, 255, out=out, casting='unsafe')
+    return out
+
+
+def codifica_png(imatge, nivell=1):
+    """
+    imatge: array uint8 (alt, ample) en gris o (alt, ample, 3) en RGB
+    nivell: nivell de compressió de zlib (1 és el més ràpid)
+    Retorna els bytes del fitxer PNG.
+    """
+    imatge = np.asarray(imatge)
+    if imatge.dtype != np.uint8 or imatge.ndim not in (2, 3):
+        raise ValueError("La imatge ha de ser uint8 en gris (alt, ample) o RGB (alt, ample, 3)")
+    alt, ample = imatge.shape[:2]
+    tipus_color = 0 if imatge.ndim == 2 else 2
+
+    files = imatge.reshape(alt, -1)
+    crues = np.empty((alt, files.shape[1] + 1), dtype=np.uint8)
+    crues[:, 0] = 2  # filtre Up
+    crues[0, 1:] = files[0]
+    np.subtract(files[1:], files[:-1], out=crues[1:, 1:])
+
+    capcalera = struct.pack('>IIBBBBB', ample, alt, 8, tipus_color, 0, 0, 0)
+    return (_signatura + _bloc(b'IHDR', capcalera)
+            + _bloc(b'IDAT', zlib.compress(crues.tobytes(), nivell)) + _bloc(b'IEND', b''))
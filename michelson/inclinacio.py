@@ -0,0 +1,163 @@
+"""
+Mirall inclinat i font descentrada, amb avaluació separable.
+
+Amb el mirall inclinat uns angles (θx, θy) el camí de tornada canvia 2(θx·x + θy·y),
+i amb el centre de la font puntual desplaçat a (x0, y0) el terme de la font és
+((x-x0)² + (y-y0)²)/(2·dist_lent). La dco ja no depèn només de R:
+
+    dco = Δd - ((x-x0)² + (y-y0)²)/(2·dist_lent) - deformació(R) - 2(θx·x + θy·y)
+
+Amb el mirall esfèric (i amb la deformació R²) tots els termes se separen,
+dco = Δd + fx(x) + fy(y), i amb ax = k(Δd + fx(x)) i ay = k·fy(y)
+
+    cos(ax + ay) = cos(ax)·cos(ay) - sin(ax)·sin(ay),
+
+de manera que la pantalla és la diferència de dos productes exteriors de vectors
+1D: es calculen 4·res funcions trigonomètriques en lloc de res². Per a les altres
+potències el terme R^p no se separa: la fase es construeix amb la suma exterior de
+ax i ay i R^p memoritzat, i queda un cosinus per píxel, que es calcula amb el
+backend de michelson.backends, com a EstatSimulacio.
+
+Les files de la pantalla van de y = -screen_size/2 a y = screen_size/2, com a
+meshgrid: cal dibuixar-les amb imshow(..., origin='lower').
+"""
+
+import numpy as np
+
+from .backends import tria_backend
+from .geometria import eix
+from .model import screen_size, res, long_ona, dist_lent, factor_escala
+
+
+def _terme_eix(c, coef_quadratic, theta, c_font):
+    # Part de la dco que només depèn d'una coordenada
+    return -(c - c_font)**2/(2*dist_lent) - coef_quadratic*c**2 - 2*theta*c
+
+
+def dco_esferic_inclinat(X, Y, mirror_diff, radi_curv, theta_x=0, theta_y=0, font_x=0, font_y=0):
+    """
+    X, Y: coordenades on s'avalua (m), amb broadcasting
+    mirror_diff: diferència de distància entre els braços (m)
+    radi_curv: radi de curvatura del mirall (m), 0 vol dir mirall pla
+    theta_x, theta_y: inclinació del mirall (rad)
+    font_x, font_y: desplaçament del centre de la font puntual (m)
+    """
+    q = 1/(2*radi_curv) if radi_curv > 0 else 0
+    return mirror_diff + _terme_eix(X, q, theta_x, font_x) + _terme_eix(Y, q, theta_y, font_y)
+
+
+def dco_radial_inclinat(X, Y, mirror_diff, escala, potencia, theta_x=0, theta_y=0, font_x=0, font_y=0):
+    """
+    X, Y: coordenades on s'avalua (m), amb broadcasting
+    escala: factor de deformació
+    potencia: potència de R de la deformació
+    Els altres paràmetres, com a dco_esferic_inclinat.
+    """
+    b = 2*escala*factor_escala(potencia)
+    dco = mirror_diff + _terme_eix(X, 0, theta_x, font_x) + _terme_eix(Y, 0, theta_y, font_y)
+    return dco - b*(X**2 + Y**2)**(potencia/2)
+
+
+class PantallaInclinada:
+    """
+    res, screen_size: geometria de la pantalla
+    backend: backend del cosinus per píxel dels termes no separables (com a EstatSimulacio)
+
+    La intensitat retornada és sempre el mateix buffer, que es sobreescriu al
+    càlcul següent.
+    """
+
+    def __init__(self, res=res, screen_size=screen_size, backend='numpy'):
+        self.res = res
+        self.screen_size = screen_size
+        self.x = eix(res, screen_size)
+        self._k = 2*np.pi/long_ona
+        self._R2 = None
+        self._Rp = {}
+        self.intensitat = np.empty((res, res))
+        self._tmp = np.empty((res, res))
+        self.backend = tria_backend(backend)
+
+    def potencia_R(self, potencia):
+        # R**potencia memoritzat per potència (només per als termes no separables)
+        if self._R2 is None:
+            self._R2 = np.add.outer(self.x**2, self.x**2)
+        potencia = float(potencia)
+        if potencia not in self._Rp:
+            self._Rp[potencia] = np.power(self._R2, potencia/2)
+        return self._Rp[potencia]
+
+    def _fases_eixos(self, mirror_diff, q, theta_x, theta_y, font_x, font_y):
+        # ax (columnes) i ay (files); Δd va a ax
+        ax = self._k*(mirror_diff + _terme_eix(self.x, q, theta_x, font_x))
+        ay = self._k*_terme_eix(self.x, q, theta_y, font_y)
+        return ax, ay
+
+    def _separable(self, ax, ay):
+        # 0.5·(1 + cos(ax + ay)), amb el 0.5 aplicat als vectors
+        out = self.intensitat
+        np.multiply.outer(0.5*np.cos(ay), np.cos(ax), out=out)
+        np.multiply.outer(0.5*np.sin(ay), np.sin(ax), out=self._tmp)
+        out -= self._tmp
+        out += 0.5
+        return out
+
+    def _espectre(self, dco, espectre):
+        self.intensitat[...] = espectre.intensitat(dco)
+        return self.intensitat
+
+    def intensitat_esferic(self, mirror_diff, radi_curv, theta_x=0, theta_y=0, font_x=0, font_y=0,
+                           espectre=None):
+        """
+        Paràmetres com a dco_esferic_inclinat.
+        espectre: espectre de la font (None per a llum monocromàtica); amb espectre
+                  la dco es calcula píxel a píxel
+        """
+        if espectre is not None:
+            dco = dco_esferic_inclinat(self.x[None, :], self.x[:, None], mirror_diff, radi_curv,
+                                       theta_x, theta_y, font_x, font_y)
+            return self._espectre(dco, espectre)
+        q = 1/(2*radi_curv) if radi_curv > 0 else 0
+        return self._separable(*self._fases_eixos(mirror_diff, q, theta_x, theta_y, font_x, font_y))
+
+    def intensitat_radial(self, mirror_diff, escala, potencia, theta_x=0, theta_y=0, font_x=0,
+                          font_y=0, espectre=None):
+        # Paràmetres com a dco_radial_inclinat; espectre com a intensitat_esferic
+        if espectre is not None:
+            dco = dco_radial_inclinat(self.x[None, :], self.x[:, None], mirror_diff, escala, potencia,
+                                      theta_x, theta_y, font_x, font_y)
+            return self._espectre(dco, espectre)
+        b = 2*escala*factor_escala(potencia)
+        if b == 0 or potencia == 2:
+            # b·R² = b·x² + b·y²: tot és separable
+            return self._separable(*self._fases_eixos(mirror_diff, b, theta_x, theta_y, font_x, font_y))
+
+        ax, ay = self._fases_eixos(mirror_diff, 0, theta_x, theta_y, font_x, font_y)
+        np.add.outer(ay, ax, out=self._tmp)
+        return self.backend.intensitat(self.intensitat, 0, ((1, self._tmp), (-self._k*b, self.potencia_R(potencia))))
+
+
+def comprova_inclinacio(res=300):
+    """
+    Compara l'avaluació separable amb la dco calculada píxel a píxel, i el cas
+    alineat amb michelson.model. Retorna una llista de (cas, error màxim absolut).
+    """
+    from .model import compute_intensitat, calcul_intensitat, intensitat_de_dco
+
+    pantalla = PantallaInclinada(res)
+    X, Y = pantalla.x[None, :], pantalla.x[:, None]
+    desalineat = (20e-6, -35e-6, 3e-3, -1e-3)
+    errors = []
+    for params in [(0.3e-6, 0), (-1.1e-6, 5), (1.7e-6, 20)]:
+        ref = intensitat_de_dco(dco_esferic_inclinat(X, Y, *params, *desalineat))
+        errors.append((('esferic',) + params,
+                       np.abs(pantalla.intensitat_esferic(*params, *desalineat) - ref).max()))
+        errors.append((('esferic alineat',) + params,
+                       np.abs(pantalla.intensitat_esferic(*params) - compute_intensitat(*params, res=res)).max()))
+    for params in [(0.2e-6, 0.5, 2.0), (0.2e-6, 0.5, 1.0), (-0.7e-6, 0.3, 3.5)]:
+        ref = intensitat_de_dco(dco_radial_inclinat(X, Y, *params, *desalineat))
+        errors.append((('radial',) + params,
+                       np.abs(pantalla.intensitat_radial(*params, *desalineat) - ref).max()))
+        errors.append((('radial alineat',) + params,
+                       np.abs(pantalla.intensitat_radial(*params) - calcul_intensitat(*params, res=res)).max()))
+    return errors
@@ -0,0 +1,133 @@
+"""
+Model físic de l'interferòmetre de Michelson: diferència de camí òptic (dco) i intensitat.
+
+Les funcions accepten qualsevol array de radis R, tant la malla 2D de la pantalla com
+un perfil radial 1D, de manera que tots els modes de càlcul fan servir les mateixes fórmules.
+"""
+
+import numpy as np
+
+from .geometria import malla_radial
+
+# Paràmetres bàsics
+screen_size = 0.1    # pantalla 10 cm x 10 cm
+res = 1000           # 1000 x 1000 píxels
+long_ona = 500e-9    # longitud d'ona (color verd)
+dist_lent = 500      # distància de la lent expansora
+
+# Els factors d'escala estan posats perquè la deformació sigui aproximadament equivalent en totes les potències de R
+factors_escala = {
+    0.5: 1e-4,     # intermig
+    1.0: 1e-3,     # angle en mrad pel con
+    1.5: 5e-2,     # intermig
+    2.0: 1e-1,     # 1/m pel paraboloide
+    2.5: 1e0,      # intermig
+    3.0: 1e1,      # 1/m² pel cúbic
+    3.5: 1e2,      # intermig
+    4.0: 1e3       # 1/m³ pel quàrtic
+}
+
+noms_forma = {
+    0.5: "sqrt(R)",
+    1.0: "Con",
+    1.5: "R^1.5",
+    2.0: "Paraboloide",
+    2.5: "R^2.5",
+    3.0: "Cúbic",
+    3.5: "R^3.5",
+    4.0: "Quàrtic"
+}
+
+
+def factor_escala(potencia):
+    """
+    Factor d'escala de qualsevol potència positiva. Entre les potències de
+    factors_escala s'interpola linealment el logaritme del factor, i fora del rang
+    s'estén el primer o l'últim tram.
+    """
+    potencia = float(potencia)
+    if not np.isfinite(potencia) or potencia <= 0:
+        raise ValueError(f"La potència de R ha de ser positiva i finita, no {potencia}")
+    if potencia in factors_escala:
+        return factors_escala[potencia]
+    potencies = sorted(factors_escala)
+    i = np.clip(np.searchsorted(potencies, potencia), 1, len(potencies) - 1)
+    p0, p1 = potencies[i-1], potencies[i]
+    l0, l1 = np.log10(factors_escala[p0]), np.log10(factors_escala[p1])
+    return float(10**(l0 + (l1 - l0)*(potencia - p0)/(p1 - p0)))
+
+
+def unitat_deformacio(potencia):
+    # Cada dependència en R té una unitat diferent del factor de deformació
+    if potencia == int(potencia):
+        units = {1: "mrad", 2: "1/m", 3: "1/m²", 4: "1/m³"}
+        return units.get(int(potencia), f"1/m^{int(potencia)-1}")
+    return f"1/m^{potencia-1}"
+
+
+def dco_esferic(R, mirror_diff, radi_curv):
+    """
+    R: radis on s'avalua (m)
+    mirror_diff: diferència de distància entre els braços (m)
+    radi_curv: radi de curvatura del mirall (m), 0 vol dir mirall pla
+    """
+    dco = mirror_diff - R**2/(2*dist_lent)  # Font puntual (front d'ona esfèric)
+    if radi_curv > 0:
+        dco = dco - R**2/(2*radi_curv)  # Mirall convex
+    return dco
+
+
+def dco_radial(R, mirror_diff, escala, potencia):
+    """
+    R: radis on s'avalua (m)
+    mirror_diff: diferència de distància entre els braços (m)
+    escala: factor de deformació (unitats segons la potència)
+    potencia: potència de R de la deformació
+    """
+    escala_ajustada = escala * factor_escala(potencia)
+    return mirror_diff - R**2/(2*dist_lent) - 2 * R**potencia * escala_ajustada
+
+
+def intensitat_de_dco(dco, espectre=None):
+    """
+    dco: diferència de camí òptic (m)
+    espectre: espectre de la font (michelson.espectre.Espectre); None vol dir
+              llum perfectament monocromàtica, |g|=1
+    """
+    if espectre is not None:
+        return espectre.intensitat(dco)
+    return 0.5 * (1 + np.cos(2 * np.pi * dco / long_ona))
+
+
+def compute_intensitat(mirror_diff, radi_curv, res=res, screen_size=screen_size, espectre=None,
+                       radial=False):
+    """
+    Patró del mirall esfèric sobre la malla completa de la pantalla.
+    mirror_diff: diferència de distància entre els braços (m)
+    radi_curv: radi de curvatura del mirall (m), 0 vol dir mirall pla
+    Amb arrays de paràmetres (o radial=True) el càlcul es fa en lots amb
+    michelson.vectoritzat i retorna una pila de patrons (o de perfils radials).
+    """
+    if radial or np.ndim(mirror_diff) or np.ndim(radi_curv):
+        from .vectoritzat import intensitats_esferic
+        return intensitats_esferic(mirror_diff, radi_curv, res, screen_size, radial, espectre=espectre)
+    R = malla_radial(res, screen_size)
+    return intensitat_de_dco(dco_esferic(R, mirror_diff, radi_curv), espectre)
+
+
+def calcul_intensitat(mirror_diff, escala, potencia, res=res, screen_size=screen_size, espectre=None,
+                      radial=False):
+    """
+    Patró dels miralls R^n sobre la malla completa de la pantalla.
+    mirror_diff: diferència de distància entre els braços (m)
+    escala: factor de deformació
+    potencia: potència de R de la deformació
+    Amb arrays de paràmetres (o radial=True) el càlcul es fa en lots amb
+    michelson.vectoritzat i retorna una pila de patrons (o de perfils radials).
+    """
+    if radial or np.ndim(mirror_diff) or np.ndim(escala) or np.ndim(potencia):
+        from .vectoritzat import intensitats_radial
+        return intensitats_radial(mirror_diff, escala, potencia, res, screen_size, radial,
+                                  espectre=espectre)
+    R = malla_radial(res, screen_size)
+    return intensitat_de_dco(dco_radial(R, mirror_diff, escala, potencia), espectre)
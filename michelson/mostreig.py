@@ -0,0 +1,285 @@
+"""
+Mostreig adaptatiu segons la freqüència local de les franges.
+
+La fase és 2π·dco/λ, així que la freqüència local de les franges és |∇dco|/λ
+(franges per metre) i un píxel de pas dx en conté |∇dco|·dx/λ. La malla resol les
+franges (Nyquist) si n'hi ha com a molt 1/mostres_franja per píxel, amb
+mostres_franja >= 2. El pendent surt analíticament del model de dco:
+
+    esfèric:  |dco'(R)| = R/dist_lent + R/radi_curv
+    R^p:      |dco'(R)| = R/dist_lent + 2·escala·factor_escala(p)·p·R^(p-1)
+
+i el mirall inclinat i la font descentrada hi sumen com a molt 2|θ| + |r0|/dist_lent.
+Δd només desplaça la fase i no hi intervé. Amb escala negativa els dos termes tenen
+signes oposats, es poden anul·lar en un radi i el màxim de |dco'| pot quedar a
+l'interior de la pantalla, de manera que el màxim es busca en una graella de radis
+des de mig píxel del centre (on, per a p < 1, el pendent divergeix) fins a la cantonada.
+
+A partir d'aquí, resolucio_minima tria la resolució més petita que compleix Nyquist,
+i intensitat_adaptativa_* calculen la pantalla a aquesta resolució (fitada per
+res_max) i supermostregen només els píxels de les corones on les franges encara
+són massa denses: cada píxel és la mitjana de f×f mostres, amb f el factor que
+necessita la seva corona.
+"""
+
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+from .geometria import eix, malla_radial
+from .model import (screen_size, res, long_ona, dist_lent, factor_escala, dco_esferic, dco_radial,
+                    intensitat_de_dco, compute_intensitat, calcul_intensitat)
+from .vectoritzat import pressupost_lot
+
+# Resolució màxima que considera resolucio_minima
+res_limit = 2**20
+
+# Radis de la graella on franges_per_pixel busca el màxim del pendent
+radis_pendent = 4096
+
+# res: resolució del pla; franges_pixel: màxim de franges per píxel a aquesta resolució;
+# res_nyquist: resolució mínima que compleix Nyquist; factors: factor de supermostreig
+# de cada píxel (array (res, res) d'enters, 1 on no cal), o None si no en cal cap
+PlaMostreig = namedtuple('PlaMostreig', ['res', 'franges_pixel', 'res_nyquist', 'factors'])
+
+
+class AvisAliasing(UserWarning):
+    # Les franges són més denses que el que la malla pot resoldre
+    pass
+
+
+def pendent_esferic(R, radi_curv):
+    """
+    |d dco/dR| del mirall esfèric
+    R: radis (m)
+    radi_curv: radi de curvatura del mirall (m), 0 vol dir mirall pla
+    """
+    a = 1/dist_lent + (1/radi_curv if radi_curv > 0 else 0)
+    return a*np.asarray(R, dtype=float)
+
+
+def pendent_radial(R, escala, potencia):
+    """
+    |d dco/dR| dels miralls R^n
+    R: radis (m); per a potencia < 1 el pendent divergeix a R = 0
+    escala: factor de deformació
+    potencia: potència de R de la deformació
+    """
+    R = np.asarray(R, dtype=float)
+    b = 2*escala*factor_escala(potencia)
+    if b == 0:
+        return R/dist_lent
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Amb escala negativa els dos termes tenen signes oposats
+        return np.abs(R/dist_lent + b*potencia*R**(potencia - 1))
+
+
+def pendent_desalineat(theta_x=0, theta_y=0, font_x=0, font_y=0):
+    # Cota del pendent que hi afegeixen el mirall inclinat i la font descentrada
+    return 2*np.hypot(theta_x, theta_y) + np.hypot(font_x, font_y)/dist_lent
+
+
+def franges_per_pixel(pendent, res=res, screen_size=screen_size, extra=0):
+    """
+    Màxim de franges per píxel sobre la pantalla.
+    pendent: funció R -> |d dco/dR|
+    extra: pendent constant afegit (pendent_desalineat)
+    """
+    dx = screen_size/(res - 1)
+    radis = np.linspace(dx/2, screen_size/np.sqrt(2), radis_pendent)
+    return float((pendent(radis).max() + extra)*dx/long_ona)
+
+
+def resolucio_minima(pendent, screen_size=screen_size, mostres_franja=2, extra=0, res_max=res_limit):
+    """
+    Resolució més petita amb com a molt 1/mostres_franja franges per píxel (cerca
+    binària: les franges per píxel decreixen amb la resolució). Retorna res_max si
+    ni tan sols aquesta les resol.
+    """
+    limit = 1/mostres_franja
+    if franges_per_pixel(pendent, 2, screen_size, extra) <= limit:
+        return 2
+    baix, dalt = 2, res_max
+    if franges_per_pixel(pendent, dalt, screen_size, extra) > limit:
+        return res_max
+    while dalt - baix > 1:
+        mig = (baix + dalt)//2
+        if franges_per_pixel(pendent, mig, screen_size, extra) <= limit:
+            dalt = mig
+        else:
+            baix = mig
+    return dalt
+
+
+def factors_supermostreig(pendent, res=res, screen_size=screen_size, mostres_franja=2, extra=0,
+                          max_factor=8):
+    """
+    Factor de supermostreig de cada píxel: el més petit que deixa com a molt
+    1/mostres_franja franges per submostra, entre 1 i max_factor.
+    """
+    dx = screen_size/(res - 1)
+    R = np.maximum(malla_radial(res, screen_size), dx/2)
+    franges = (pendent(R) + extra)*dx/long_ona
+    return np.clip(np.ceil(franges*mostres_franja), 1, max_factor).astype(np.int32)
+
+
+def planifica(pendent, res=res, screen_size=screen_size, mostres_franja=2, extra=0, max_factor=1):
+    """
+    Pla de mostreig a la resolució res.
+    pendent: funció R -> |d dco/dR| (pendent_esferic o pendent_radial amb els paràmetres fixats)
+    mostres_franja: mostres per franja que es volen (2 és el límit de Nyquist)
+    extra: pendent constant afegit (pendent_desalineat)
+    max_factor: factor de supermostreig màxim; 1 no en calcula cap, i tampoc no cal
+                si la malla ja resol les franges
+    """
+    franges = franges_per_pixel(pendent, res, screen_size, extra)
+    factors = None
+    if max_factor > 1 and franges*mostres_franja > 1:
+        factors = factors_supermostreig(pendent, res, screen_size, mostres_franja, extra, max_factor)
+    return PlaMostreig(res, franges, resolucio_minima(pendent, screen_size, mostres_franja, extra),
+                       factors)
+
+
+def avisa_aliasing(pla, mostres_franja=2, stacklevel=2):
+    """
+    Avisa (AvisAliasing) si el pla no resol les franges, tenint en compte el
+    supermostreig si n'hi ha. Retorna True si s'ha avisat.
+    """
+    franges = pla.franges_pixel
+    if pla.factors is not None:
+        franges /= pla.factors.max()
+    if franges*mostres_franja <= 1:
+        return False
+    warnings.warn(f"Aliasing: fins a {franges:.2f} franges per mostra a res={pla.res}; "
+                  f"calen res >= {pla.res_nyquist} o més supermostreig", AvisAliasing,
+                  stacklevel=stacklevel)
+    return True
+
+
+def resolt(pendent, r, res=res, screen_size=screen_size, extra=0, mostres_franja=2):
+    # Si la malla resol les franges fins al radi r (m)
+    dx = screen_size/(res - 1)
+    return float((pendent(r) + extra)*dx/long_ona)*mostres_franja <= 1
+
+
+def text_aliasing(pendent, res=res, screen_size=screen_size, extra=0, mostres_franja=2):
+    # Text per a la interfície: buit si la malla resol les franges
+    franges = franges_per_pixel(pendent, res, screen_size, extra)
+    if franges*mostres_franja <= 1:
+        return ''
+    res_nyquist = resolucio_minima(pendent, screen_size, mostres_franja, extra)
+    cal = f"res ≥ {res_nyquist}" if res_nyquist < res_limit else f"res > {res_limit}"
+    return f"Aliasing: fins a {franges:.1f} franges per píxel\n(cal {cal})"
+
+
+def supermostreja(intensitat, dco, factors, screen_size=screen_size, espectre=None,
+                  pressupost=pressupost_lot):
+    """
+    Substitueix els píxels amb factor f > 1 per la mitjana de f×f submostres.
+    intensitat: pantalla (res, res), es modifica al lloc
+    dco: funció R -> dco
+    factors: factor de cada píxel (factors_supermostreig), amb la simetria de la pantalla
+
+    Com que la dco només depèn de R, només es calcula un octant de la pantalla i es
+    copia als altres set.
+    """
+    res = intensitat.shape[0]
+    x = eix(res, screen_size)
+    dx = screen_size/(res - 1)
+    m = res//2
+    octant = factors[m:, m:]
+    for f in np.unique(octant[octant > 1]):
+        files, columnes = np.nonzero(np.triu(octant == f))
+        files, columnes = files + m, columnes + m
+        u = ((np.arange(f) + 0.5)/f - 0.5)*dx
+        # Píxels per lot perquè les submostres (i els temporals de la dco) càpiguen al pressupost
+        lot = max(1, pressupost//(4*8*f*f))
+        for i in range(0, len(files), lot):
+            fi, co = files[i:i+lot], columnes[i:i+lot]
+            X = x[co, None, None] + u[None, :, None]
+            Y = x[fi, None, None] + u[None, None, :]
+            valors = intensitat_de_dco(dco(np.hypot(X, Y)), espectre).mean(axis=(1, 2))
+            for a, b in ((fi, co), (co, fi)):
+                intensitat[a, b] = valors
+                intensitat[res-1-a, b] = valors
+                intensitat[a, res-1-b] = valors
+                intensitat[res-1-a, res-1-b] = valors
+    return intensitat
+
+
+def _adaptativa(pendent, dco, calcula, res, res_max, res_min, screen_size, mostres_franja, extra,
+                max_factor, espectre, avisa):
+    if res is None:
+        res = int(np.clip(resolucio_minima(pendent, screen_size, mostres_franja, extra), res_min, res_max))
+    pla = planifica(pendent, res, screen_size, mostres_franja, extra, max_factor)
+    if avisa:
+        avisa_aliasing(pla, mostres_franja, stacklevel=4)
+    intensitat = calcula(res)
+    if pla.factors is not None:
+        supermostreja(intensitat, dco, pla.factors, screen_size, espectre)
+    return intensitat, pla
+
+
+def intensitat_adaptativa_esferic(mirror_diff, radi_curv, res=None, res_max=res, res_min=64,
+                                  screen_size=screen_size, mostres_franja=2, max_factor=8,
+                                  espectre=None, avisa=True):
+    """
+    Patró del mirall esfèric amb el mostreig que demanen les franges.
+    res: resolució fixa, o None per triar la mínima que compleix Nyquist entre res_min i res_max
+    mostres_franja: mostres per franja que es volen (2 és el límit de Nyquist)
+    max_factor: supermostreig màxim dels píxels on les franges són massa denses (1 no en fa)
+    avisa: avisa amb AvisAliasing si ni amb el supermostreig es resolen les franges
+    Retorna (intensitat, pla).
+    """
+    return _adaptativa(lambda R: pendent_esferic(R, radi_curv),
+                       lambda R: dco_esferic(R, mirror_diff, radi_curv),
+                       lambda n: compute_intensitat(mirror_diff, radi_curv, n, screen_size, espectre),
+                       res, res_max, res_min, screen_size, mostres_franja, 0, max_factor, espectre, avisa)
+
+
+def intensitat_adaptativa_radial(mirror_diff, escala, potencia, res=None, res_max=res, res_min=64,
+                                 screen_size=screen_size, mostres_franja=2, max_factor=8,
+                                 espectre=None, avisa=True):
+    """
+    Patró dels miralls R^n amb el mostreig que demanen les franges.
+    Opcions com a intensitat_adaptativa_esferic. Retorna (intensitat, pla).
+    """
+    return _adaptativa(lambda R: pendent_radial(R, escala, potencia),
+                       lambda R: dco_radial(R, mirror_diff, escala, potencia),
+                       lambda n: calcul_intensitat(mirror_diff, escala, potencia, n, screen_size, espectre),
+                       res, res_max, res_min, screen_size, mostres_franja, 0, max_factor, espectre, avisa)
+
+
+def comprova_mostreig(res=200, mostres_franja=8, factor_referencia=16):
+    """
+    Compara el pendent analític amb el gradient numèric de la dco sobre la malla
+    (error relatiu), i el supermostreig adaptatiu amb un supermostreig uniforme de
+    factor_referencia a tots els píxels (error absolut). Amb poques mostres per franja
+    la mitjana de les submostres s'allunya de la del píxel sencer: per això la
+    comparació es fa amb mostres_franja = 8. Retorna una llista de (cas, error).
+    """
+    R = malla_radial(res, screen_size)
+    dx = screen_size/(res - 1)
+    casos = [('esferic', (0.3e-6, 2.0), pendent_esferic, dco_esferic, intensitat_adaptativa_esferic),
+             ('radial', (0.2e-6, 0.5, 2.5), pendent_radial, dco_radial, intensitat_adaptativa_radial),
+             ('radial', (0, 0.1, 4.0), pendent_radial, dco_radial, intensitat_adaptativa_radial),
+             # Escala negativa: el pendent s'anul·la prop de la cantonada i el màxim és a l'interior
+             ('radial', (0.1e-6, -5e-5, 4.0), pendent_radial, dco_radial, intensitat_adaptativa_radial)]
+    errors = []
+    for model, params, pendent, dco, adaptativa in casos:
+        # Franges per píxel: analític contra diferències finites de la dco als píxels
+        numeric = np.hypot(*np.gradient(dco(R, *params), dx))*dx/long_ona
+        analitic = franges_per_pixel(lambda r: pendent(r, *params[1:]), res)
+        errors.append((f'franges per píxel {model} {params}', abs(numeric.max() - analitic)/analitic))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', AvisAliasing)
+            intensitat, pla = adaptativa(*params, res=res, mostres_franja=mostres_franja,
+                                         max_factor=factor_referencia)
+        referencia = supermostreja(intensitat_de_dco(dco(R, *params)), lambda r: dco(r, *params),
+                                   np.full((res, res), factor_referencia))
+        # Només els píxels que el pla resol; la resta tenen error d'aliasing de totes maneres
+        resolt = np.ones((res, res), bool) if pla.factors is None else pla.factors < factor_referencia
+        errors.append((f'supermostreig {model} {params}', np.abs(intensitat - referencia)[resolt].max()))
+    return errors
@@ -0,0 +1,148 @@
+"""
+Mode de càlcul radial: la dco només depèn de R, així que la intensitat es calcula
+sobre una malla radial fina i després s'expandeix a la pantalla 2D amb un mapa
+d'índexs precalculat i interpolació lineal.
+
+El treball per fotograma amb funcions transcendents escala amb el nombre de radis,
+no amb el nombre de píxels. L'expansió és només una lectura indexada d'un quadrant
+i tres reflexions, perquè la pantalla és simètrica respecte als dos eixos.
+"""
+
+import numpy as np
+
+from .geometria import eix, malla_radial
+from .model import (screen_size, res, long_ona, dist_lent, dco_esferic, dco_radial,
+                    intensitat_de_dco)
+
+
+class MapaRadial:
+    """
+    res, screen_size: geometria de la pantalla
+    sobremostreig: mostres de la malla radial per cada píxel de pantalla
+    """
+
+    def __init__(self, res=res, screen_size=screen_size, sobremostreig=8):
+        self.res = res
+        self.screen_size = screen_size
+        self._mig = res // 2
+
+        # Quadrant inferior dret de la pantalla (inclou la fila/columna central si res és senar)
+        xq = eix(res, screen_size)[self._mig:]
+        Rq = np.sqrt(xq[:, None]**2 + xq[None, :]**2)
+
+        dx = screen_size / (res - 1)
+        self.dr = dx / sobremostreig
+        n_radis = int(np.ceil(Rq.max() / self.dr)) + 2
+        self.r = np.arange(n_radis) * self.dr
+
+        # Índex de la mostra radial anterior i pes de la següent per a cada píxel
+        pos = Rq / self.dr
+        self._idx = pos.astype(np.int32)
+        self._pes = pos - self._idx
+
+        self._idx_proper = None
+
+        # Buffers de treball d'expandeix (es creen el primer cop que es fan servir)
+        self._q0 = self._q1 = None
+
+    def comparteix(self):
+        """
+        Mapa que comparteix la malla i els índexs (només de lectura) amb aquest i té
+        els seus propis buffers de treball. Serveix per expandir des de diversos fils
+        sense repetir els índexs, que són la major part de la memòria.
+        """
+        copia = object.__new__(MapaRadial)
+        copia.__dict__.update(self.__dict__)
+        copia._idx_proper = self._index_proper()
+        copia._q0 = copia._q1 = None
+        return copia
+
+    def _index_proper(self):
+        if self._idx_proper is None:
+            self._idx_proper = np.rint(self._idx + self._pes).astype(np.int32)
+        return self._idx_proper
+
+    def expandeix(self, perfil, out=None):
+        """
+        perfil: valors sobre self.r
+        out: array (res, res) on escriure el resultat (opcional)
+        """
+        if out is None:
+            out = np.empty((self.res, self.res), dtype=perfil.dtype)
+        pendent = np.empty_like(perfil)
+        pendent[:-1] = np.diff(perfil)
+        pendent[-1] = 0
+
+        if self._q0 is None:
+            self._q0 = np.empty(self._idx.shape)
+            self._q1 = np.empty(self._idx.shape)
+
+        # Interpolació lineal al quadrant
+        np.take(perfil, self._idx, out=self._q0, mode='clip')
+        np.take(pendent, self._idx, out=self._q1, mode='clip')
+        self._q1 *= self._pes
+        self._q0 += self._q1
+
+        out[self._mig:, self._mig:] = self._q0
+        return self._reflecteix(out)
+
+    def expandeix_proper(self, perfil, out=None):
+        """
+        Expansió amb la mostra radial més propera, sense interpolar. Serveix per a
+        perfils ja quantitzats (uint8) o amb colors, amb forma (n_radis, ...).
+        """
+        if out is None:
+            out = np.empty((self.res, self.res) + perfil.shape[1:], dtype=perfil.dtype)
+        out[self._mig:, self._mig:] = perfil[self._index_proper()]
+        return self._reflecteix(out)
+
+    def _reflecteix(self, out):
+        # Reflexions: la fila i és igual a la res-1-i, i el mateix per columnes
+        m, n = self._mig, self.res
+        out[m:, :m] = out[m:, n-1:n-1-m:-1]
+        out[:m, :] = out[n-1:n-1-m:-1, :]
+        return out
+
+    def intensitat_esferic(self, mirror_diff, radi_curv, out=None, espectre=None):
+        perfil = intensitat_de_dco(dco_esferic(self.r, mirror_diff, radi_curv), espectre)
+        return self.expandeix(perfil, out)
+
+    def intensitat_radial(self, mirror_diff, escala, potencia, out=None, espectre=None):
+        perfil = intensitat_de_dco(dco_radial(self.r, mirror_diff, escala, potencia), espectre)
+        return self.expandeix(perfil, out)
+
+    def intensitat_suma_radial(self, superficie, mirror_diff, out=None, espectre=None):
+        # superficie: michelson.superficie.SumaRadial (qualsevol superfície amb alcada_radial)
+        dco = mirror_diff - self.r**2/(2*dist_lent) - 2*superficie.alcada_radial(self.r)
+        return self.expandeix(intensitat_de_dco(dco, espectre), out)
+
+
+def comprovar_precisio(mapa=None, casos_esferic=None, casos_radial=None):
+    """
+    Compara el mode radial amb el càlcul sobre la malla completa.
+    Només es comparen els píxels on la malla completa resol les franges (menys de
+    mitja franja per píxel); més enllà, els dos càlculs tenen aliasing.
+    Retorna una llista de (model, paràmetres, error màxim absolut).
+    """
+    if mapa is None:
+        mapa = MapaRadial()
+    if casos_esferic is None:
+        casos_esferic = [(0, 0), (0.5e-6, 1), (-1.3e-6, 5), (2e-6, 20)]
+    if casos_radial is None:
+        casos_radial = [(0, 0.5, p) for p in (0.5, 1.0, 2.0, 3.0, 4.0)] + [(1e-6, 0.2, 2.5)]
+
+    R = malla_radial(mapa.res, mapa.screen_size)
+    dx = mapa.screen_size / (mapa.res - 1)
+    casos = [('esferic', p, dco_esferic, mapa.intensitat_esferic) for p in casos_esferic]
+    casos += [('radial', p, dco_radial, mapa.intensitat_radial) for p in casos_radial]
+
+    errors = []
+    for model, params, dco, intensitat in casos:
+        # Píxels on la dco varia menys de mitja longitud d'ona d'un píxel al següent
+        franges_pixel = np.abs(np.gradient(dco(mapa.r, *params), mapa.dr)) * dx / long_ona
+        resolt = np.interp(R, mapa.r, franges_pixel) < 0.5
+
+        ref = intensitat_de_dco(dco(R, *params))
+        error = np.abs(intensitat(*params) - ref)[resolt]
+        errors.append((model, params, error.max() if error.size else 0.0))
+    return errors
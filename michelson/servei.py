@@ -0,0 +1,498 @@
+"""
+Servei HTTP local (només 127.0.0.1) que calcula interferogrames i mesures dels anells.
+
+Rutes (paràmetres a la cadena de consulta d'un GET o en un objecte JSON amb POST):
+
+    /intensitat  model=esferic mirror_diff radi_curv | model=radial mirror_diff escala potencia
+                 res (per defecte 1000), format=png|npy|raw, cmap (només PNG)
+    /mesura      els mateixos paràmetres del model; retorna la MesuraAnells en JSON
+    /estat       estadístiques del servei
+
+Les unitats són les del paquet (m). El format raw són els bytes float32 de la
+pantalla en ordre C, amb la forma a la capçalera X-Forma. Només s'accepten les
+resolucions de la llista del servei (per defecte, `resolucions`). Els índexs dels
+mapes radials de les últimes `mapes_compartits` resolucions es comparteixen entre
+tots els fils (uns 64 MiB a res=4000); cada fil només hi afegeix els seus buffers
+de treball, que es creen la primera vegada que respon en npy o raw (uns altres
+64 MiB a res=4000). radi_curv ha de ser 0 (mirall pla) o positiu i escala no pot
+ser negativa; /mesura rebutja els paràmetres amb més de `max_anells` anells i no
+depèn de res.
+
+Les peticions d'intensitat que arriben alhora s'agrupen: durant `finestra` segons
+(o fins a `max_lot` peticions) s'acumulen a la cua, i cada grup amb el mateix model
+i resolució es calcula amb una sola crida vectoritzada sobre el perfil radial
+(michelson.vectoritzat). L'expansió a la pantalla i la codificació de cada resposta
+es reparteixen entre els fils del grup de treball. Les respostes es guarden en una
+memòria cau LRU adreçada pel contingut: la clau és el hash SHA-256 dels paràmetres
+canònics, que també és l'ETag. Una petició igual a una que encara s'està
+calculant espera el mateix resultat.
+
+    python -m michelson.servei --port 8765
+    curl 'http://127.0.0.1:8765/intensitat?model=esferic&mirror_diff=3e-7&radi_curv=5&res=500' > patro.png
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, Counter
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+
+from .analitic import mesura_esferic, mesura_radial
+from .imatges import codifica_png, quantitza
+from .model import screen_size, res, long_ona, dist_lent, factor_escala
+from .perfil_radial import MapaRadial
+from .vectoritzat import intensitats_esferic, intensitats_radial
+
+host = '127.0.0.1'
+formats = {'png': 'image/png', 'npy': 'application/x-npy', 'raw': 'application/octet-stream'}
+params_model = {'esferic': ('mirror_diff', 'radi_curv'), 'radial': ('mirror_diff', 'escala', 'potencia')}
+
+# Resolucions acceptades per defecte
+resolucions = (64, 128, 256, 500, 512, 1000, 1024, 2000, 2048, 4000)
+
+# Mapes radials compartits entre els fils (els últims usats)
+mapes_compartits = 2
+
+# Vistes dels mapes compartits que guarda cada fil, amb els seus buffers de treball
+mapes_per_fil = 2
+
+# Anells màxims d'una petició a /mesura (els radis es calculen tots alhora)
+max_anells = 100000
+
+# Mida màxima del cos d'una petició POST (bytes)
+max_cos = 2**16
+
+# Els índexs dels mapes són de només lectura i es comparteixen; MapaRadial.expandeix
+# fa servir buffers interns, així que cada fil en té una vista pròpia
+_mapes = OrderedDict()
+_lock_mapes = threading.Lock()
+_local = threading.local()
+_taules_colors = {}
+
+
+class ErrorPeticio(ValueError):
+    # Error de la petició: es respon amb l'estat HTTP indicat
+    def __init__(self, missatge, estat=400):
+        super().__init__(missatge)
+        self.estat = estat
+
+
+def _mapa_compartit(res):
+    # LRU de mapes_compartits mapes, comuna a tots els fils
+    with _lock_mapes:
+        if res in _mapes:
+            _mapes.move_to_end(res)
+        else:
+            while len(_mapes) >= mapes_compartits:
+                _mapes.popitem(last=False)
+            _mapes[res] = MapaRadial(res, screen_size)
+        return _mapes[res]
+
+
+def _mapa(res):
+    # Vista del fil sobre el mapa compartit (LRU de mapes_per_fil vistes per fil)
+    compartit = _mapa_compartit(res)
+    mapes = getattr(_local, 'mapes', None)
+    if mapes is None:
+        mapes = _local.mapes = OrderedDict()
+    vista = mapes.get(res)
+    if vista is not None and vista.r is compartit.r:
+        mapes.move_to_end(res)
+        return vista
+    # Si el mapa compartit ha sortit de la LRU, la vista vella no l'ha de retenir
+    mapes.pop(res, None)
+    while len(mapes) >= mapes_per_fil:
+        mapes.popitem(last=False)
+    mapes[res] = compartit.comparteix()
+    return mapes[res]
+
+
+def _float(valors, nom):
+    try:
+        valor = float(valors[nom])
+    except KeyError:
+        raise ErrorPeticio(f"Falta el paràmetre {nom}")
+    except (TypeError, ValueError):
+        raise ErrorPeticio(f"El paràmetre {nom} ha de ser un nombre")
+    if not np.isfinite(valor):
+        raise ErrorPeticio(f"El paràmetre {nom} ha de ser finit")
+    return valor
+
+
+def llegeix_parametres(valors, resolucions=resolucions):
+    """
+    valors: diccionari de la consulta o del JSON
+    resolucions: resolucions acceptades
+    Retorna el diccionari canònic (model, paràmetres del model, res, format, cmap).
+    """
+    model = valors.get('model', 'esferic')
+    if model not in params_model:
+        raise ErrorPeticio(f"Model desconegut: {model}")
+    canonic = {'model': model}
+    for nom in params_model[model]:
+        canonic[nom] = _float(valors, nom)
+    if model == 'esferic' and canonic['radi_curv'] < 0:
+        raise ErrorPeticio("radi_curv ha de ser 0 (mirall pla) o positiu")
+    if model == 'radial':
+        if canonic['escala'] < 0:
+            raise ErrorPeticio("escala no pot ser negativa")
+        try:
+            factor_escala(canonic['potencia'])
+        except ValueError as error:
+            raise ErrorPeticio(str(error))
+    try:
+        canonic['res'] = int(valors.get('res', res))
+    except (TypeError, ValueError):
+        raise ErrorPeticio("res ha de ser un enter")
+    if canonic['res'] not in resolucions:
+        raise ErrorPeticio(f"res ha de ser una de {', '.join(map(str, resolucions))}")
+    canonic['format'] = valors.get('format', 'png')
+    if canonic['format'] not in formats:
+        raise ErrorPeticio(f"Format desconegut: {canonic['format']} (png, npy o raw)")
+    canonic['cmap'] = valors.get('cmap', 'gray') if canonic['format'] == 'png' else None
+    if canonic['cmap'] is not None:
+        try:
+            _colors(canonic['cmap'])
+        except (KeyError, ValueError, TypeError):
+            raise ErrorPeticio(f"Mapa de colors desconegut: {canonic['cmap']}")
+    return canonic
+
+
+def _anells(canonic):
+    # Nombre aproximat d'anells fins a la vora de la pantalla (Δd - dco a la vora, en λ)
+    r_max = screen_size/2
+    g = r_max**2/(2*dist_lent)
+    if canonic['model'] == 'esferic':
+        if canonic['radi_curv'] > 0:
+            g += r_max**2/(2*canonic['radi_curv'])
+    else:
+        g += 2*canonic['escala']*factor_escala(canonic['potencia'])*r_max**canonic['potencia']
+    return g/long_ona
+
+
+def clau(ruta, canonic):
+    # Adreça del contingut: hash dels paràmetres canònics
+    text = json.dumps([ruta, canonic], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _colors(cmap):
+    # Taula de colors de matplotlib, guardada per nom
+    if cmap not in _taules_colors:
+        from .animacio import taula_colors
+        _taules_colors[cmap] = taula_colors(cmap)
+    return _taules_colors[cmap]
+
+
+def _codifica(perfil, canonic):
+    # Expansió del perfil radial a la pantalla i codificació de la resposta (en un fil de treball)
+    mapa = _mapa(canonic['res'])
+    if canonic['format'] == 'png':
+        quantitzat = quantitza(perfil)
+        colors = _colors(canonic['cmap'])
+        if colors is not None:
+            quantitzat = colors[quantitzat]
+        return codifica_png(mapa.expandeix_proper(quantitzat)), {}
+    intensitat = mapa.expandeix(perfil, out=np.empty((mapa.res, mapa.res), dtype=np.float32))
+    if canonic['format'] == 'raw':
+        return intensitat.tobytes(), {'X-Forma': f'{mapa.res},{mapa.res}', 'X-Dtype': 'float32'}
+    sortida = io.BytesIO()
+    np.save(sortida, intensitat)
+    return sortida.getvalue(), {}
+
+
+def _perfils(model, res, files):
+    # Perfils radials de tot un grup en una sola crida vectoritzada
+    columnes = np.array(files).T
+    if model == 'esferic':
+        return intensitats_esferic(*columnes, res, screen_size, radial=True)
+    return intensitats_radial(*columnes, res, screen_size, radial=True)
+
+
+def _propaga(origen, desti):
+    # Copia el resultat (o l'error, o la cancel·lació) d'un futur a un altre
+    if desti.done():
+        return
+    if origen.cancelled():
+        desti.cancel()
+    elif origen.exception() is not None:
+        desti.set_exception(origen.exception())
+    else:
+        desti.set_result(origen.result())
+
+
+def _mesura(canonic):
+    if canonic['model'] == 'esferic':
+        mesura = mesura_esferic(canonic['mirror_diff'], canonic['radi_curv'])
+    else:
+        mesura = mesura_radial(canonic['mirror_diff'], canonic['escala'], canonic['potencia'])
+    resultat = {'radis': [float(r) for r in mesura.radis], 'n_anells': int(mesura.n_anells),
+                'radi_curv': None if mesura.radi_curv is None else float(mesura.radi_curv),
+                'incertesa': None if mesura.incertesa is None else float(mesura.incertesa)}
+    return json.dumps(resultat).encode(), {}
+
+
+class Servei:
+    """
+    fils: fils del grup de treball (per defecte, un per CPU)
+    finestra: temps màxim (s) que una petició espera altres peticions per agrupar-s'hi
+    max_lot: peticions per lot com a màxim
+    pressupost_cache: bytes màxims de les respostes guardades
+    resolucions: resolucions acceptades
+    """
+
+    def __init__(self, fils=None, finestra=0.005, max_lot=64, pressupost_cache=256*2**20,
+                 resolucions=resolucions):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.finestra = finestra
+        self.max_lot = max_lot
+        self.pressupost_cache = pressupost_cache
+        self.resolucions = tuple(resolucions)
+        self._grup = ThreadPoolExecutor(fils or os.cpu_count())
+        self._cache = OrderedDict()
+        self._bytes_cache = 0
+        self._en_curs = {}
+        self._cua = None
+        self._agrupador = None
+        self.comptadors = Counter()
+
+    # Memòria cau
+
+    def _desa(self, adreca, resposta):
+        if adreca in self._cache or len(resposta[0]) > self.pressupost_cache:
+            return
+        self._cache[adreca] = resposta
+        self._bytes_cache += len(resposta[0])
+        while self._bytes_cache > self.pressupost_cache:
+            _, (cos, _) = self._cache.popitem(last=False)
+            self._bytes_cache -= len(cos)
+
+    async def resposta(self, ruta, canonic):
+        """
+        Cos i capçaleres de la resposta, de la memòria cau, d'un càlcul en curs
+        igual o d'un càlcul nou. Retorna (cos, capçaleres, adreça, origen).
+        """
+        adreca = clau(ruta, canonic)
+        if adreca in self._cache:
+            self._cache.move_to_end(adreca)
+            self.comptadors['cache'] += 1
+            return self._cache[adreca] + (adreca, 'hit')
+        if adreca in self._en_curs:
+            self.comptadors['agrupades'] += 1
+            return await asyncio.shield(self._en_curs[adreca]) + (adreca, 'coalesced')
+
+        bucle = asyncio.get_running_loop()
+        futur = bucle.create_future()
+        self._en_curs[adreca] = futur
+        futur.add_done_callback(lambda futur: self._acaba(adreca, futur))
+        self.comptadors['calculades'] += 1
+        # El futur es completa encara que aquest client es cancel·li: les peticions
+        # agrupades hi esperen, i la resposta es guarda igualment
+        if ruta == '/mesura':
+            calcul = bucle.run_in_executor(self._grup, _mesura, canonic)
+            calcul.add_done_callback(lambda calcul: _propaga(calcul, futur))
+        else:
+            self._cua.put_nowait((canonic, futur))
+        return await asyncio.shield(futur) + (adreca, 'miss')
+
+    def _acaba(self, adreca, futur):
+        del self._en_curs[adreca]
+        if not futur.cancelled() and futur.exception() is None:
+            self._desa(adreca, futur.result())
+
+    # Agrupació de les peticions d'intensitat
+
+    async def _agrupa(self):
+        bucle = asyncio.get_running_loop()
+        while True:
+            lot = [await self._cua.get()]
+            limit = bucle.time() + self.finestra
+            while len(lot) < self.max_lot:
+                espera = limit - bucle.time()
+                if espera <= 0:
+                    break
+                try:
+                    lot.append(await asyncio.wait_for(self._cua.get(), espera))
+                except asyncio.TimeoutError:
+                    break
+            self.comptadors['lots'] += 1
+            grups = {}
+            for canonic, futur in lot:
+                grups.setdefault((canonic['model'], canonic['res']), []).append((canonic, futur))
+            for (model, res), grup in grups.items():
+                bucle.create_task(self._calcula_grup(model, res, grup))
+
+    async def _calcula_grup(self, model, res, grup):
+        bucle = asyncio.get_running_loop()
+        try:
+            files = [[canonic[nom] for nom in params_model[model]] for canonic, _ in grup]
+            perfils = await bucle.run_in_executor(self._grup, _perfils, model, res, files)
+            respostes = await asyncio.gather(*(bucle.run_in_executor(self._grup, _codifica, perfil, canonic)
+                                               for perfil, (canonic, _) in zip(perfils, grup)))
+            for resposta, (_, futur) in zip(respostes, grup):
+                if not futur.done():
+                    futur.set_result(resposta)
+        except Exception as error:
+            for _, futur in grup:
+                if not futur.done():
+                    futur.set_exception(error)
+        finally:
+            # Si la tasca es cancel·la (en tancar el servei), cap petició no es queda esperant
+            for _, futur in grup:
+                if not futur.done():
+                    futur.cancel()
+
+    # HTTP
+
+    async def _atén(self, lector, escriptor):
+        try:
+            while True:
+                linia = await lector.readline()
+                if not linia:
+                    break
+                try:
+                    metode, objectiu, versio = linia.decode('latin-1').split()
+                except ValueError:
+                    break
+                capcaleres = {}
+                while True:
+                    linia = await lector.readline()
+                    if linia in (b'\r\n', b'\n', b''):
+                        break
+                    nom, _, valor = linia.decode('latin-1').partition(':')
+                    capcaleres[nom.strip().lower()] = valor.strip()
+                try:
+                    longitud = int(capcaleres.get('content-length', 0))
+                except ValueError:
+                    longitud = -1
+                if not 0 <= longitud <= max_cos:
+                    # Sense una longitud vàlida no se sap on acaba el cos: es tanca la connexió
+                    self.comptadors['errors'] += 1
+                    estat = 413 if longitud > max_cos else 400
+                    cos_resposta = json.dumps({'error': "Content-Length no vàlid" if estat == 400 else
+                                               f"El cos no pot passar de {max_cos} bytes"}).encode()
+                    escriptor.write(self._capcalera(estat, len(cos_resposta), {'Content-Type': 'application/json'},
+                                                    False) + cos_resposta)
+                    await escriptor.drain()
+                    break
+                cos = await lector.readexactly(longitud)
+
+                estat, cos_resposta, extra = await self._processa(metode, objectiu, cos, capcaleres)
+                mante = (versio == 'HTTP/1.1' and capcaleres.get('connection', '').lower() != 'close')
+                escriptor.write(self._capcalera(estat, len(cos_resposta), extra, mante) + cos_resposta)
+                await escriptor.drain()
+                if not mante:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escriptor.close()
+
+    def _capcalera(self, estat, longitud, extra, mante):
+        motius = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+                  405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+        linies = [f'HTTP/1.1 {estat} {motius[estat]}', f'Content-Length: {longitud}',
+                  f'Connection: {"keep-alive" if mante else "close"}']
+        linies += [f'{nom}: {valor}' for nom, valor in extra.items()]
+        return ('\r\n'.join(linies) + '\r\n\r\n').encode('latin-1')
+
+    async def _processa(self, metode, objectiu, cos, capcaleres):
+        # Retorna (estat, cos, capçaleres)
+        t0 = time.perf_counter()
+        ruta = urlsplit(objectiu)
+        try:
+            if ruta.path == '/estat':
+                return 200, self._estat(), {'Content-Type': 'application/json'}
+            if ruta.path not in ('/intensitat', '/mesura'):
+                raise ErrorPeticio(f"Ruta desconeguda: {ruta.path}", 404)
+            if metode == 'GET':
+                valors = dict(parse_qsl(ruta.query))
+            elif metode == 'POST':
+                try:
+                    valors = json.loads(cos or b'{}')
+                except ValueError:
+                    raise ErrorPeticio("El cos ha de ser JSON")
+                if not isinstance(valors, dict):
+                    raise ErrorPeticio("El cos ha de ser un objecte JSON")
+            else:
+                raise ErrorPeticio(f"Mètode no permès: {metode}", 405)
+
+            if ruta.path == '/mesura':
+                # La mesura no fa servir res, format ni cmap, i no formen part de la clau
+                valors = dict(valors, res=self.resolucions[0], format='npy')
+                valors.pop('cmap', None)
+            canonic = llegeix_parametres(valors, self.resolucions)
+            if ruta.path == '/mesura':
+                if _anells(canonic) > max_anells:
+                    raise ErrorPeticio(f"Massa anells per mesurar (més de {max_anells})")
+                canonic['res'] = canonic['format'] = canonic['cmap'] = None
+            cos_resposta, extra, adreca, origen = await self.resposta(ruta.path, canonic)
+            tipus = 'application/json' if ruta.path == '/mesura' else formats[canonic['format']]
+            extra = dict(extra, **{'Content-Type': tipus, 'ETag': f'"{adreca}"', 'X-Cache': origen,
+                                   'X-Temps': f'{(time.perf_counter() - t0)*1e3:.2f}'})
+            if capcaleres.get('if-none-match') == f'"{adreca}"':
+                return 304, b'', extra
+            return 200, cos_resposta, extra
+        except ErrorPeticio as error:
+            self.comptadors['errors'] += 1
+            return error.estat, json.dumps({'error': str(error)}).encode(), {'Content-Type': 'application/json'}
+        except Exception as error:
+            self.comptadors['errors'] += 1
+            return 500, json.dumps({'error': repr(error)}).encode(), {'Content-Type': 'application/json'}
+
+    def _estat(self):
+        return json.dumps(dict(self.comptadors, respostes_cache=len(self._cache),
+                               bytes_cache=self._bytes_cache)).encode()
+
+    async def inicia(self, port=8765):
+        # Comença a escoltar a 127.0.0.1; retorna el servidor d'asyncio (port 0 tria un port lliure)
+        self._cua = asyncio.Queue()
+        self._agrupador = asyncio.get_running_loop().create_task(self._agrupa())
+        return await asyncio.start_server(self._atén, host, port)
+
+    def tanca(self):
+        if self._agrupador is not None:
+            self._agrupador.cancel()
+        self._grup.shutdown(wait=False, cancel_futures=True)
+
+
+async def serveix(port=8765, **opcions):
+    # Opcions: les de Servei
+    servei = Servei(**opcions)
+    servidor = await servei.inicia(port)
+    print(f"Servei a http://{host}:{servidor.sockets[0].getsockname()[1]}")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servei.tanca()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Servei HTTP local de l'interferòmetre de Michelson")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fils', type=int)
+    parser.add_argument('--finestra', type=float, default=5, help="espera per agrupar peticions (ms)")
+    parser.add_argument('--max-lot', type=int, default=64)
+    parser.add_argument('--cache', type=float, default=256, help='memòria cau de respostes (MiB)')
+    parser.add_argument('--resolucions', type=int, nargs='+', default=resolucions,
+                        help='resolucions acceptades')
+    args = parser.parse_args(args)
+    try:
+        asyncio.run(serveix(args.port, fils=args.fils, finestra=args.finestra/1000,
+                            max_lot=args.max_lot, pressupost_cache=int(args.cache*2**20),
+                            resolucions=args.resolucions))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Superfícies arbitràries del mirall deformat.
+
+Una superfície dona l'alçada h del mirall (m) a cada píxel de la pantalla, i la
+dco és Δd - R²/(2 dist_lent) - 2h. Hi ha tres menes de superfície:
+
+- SumaRadial: suma de termes escala * R**potencia, amb qualsevol potència positiva.
+- Zernike: expansió en polinomis de Zernike (índexs de Noll), incloent-hi els
+  termes sense simetria de revolució (inclinació, astigmatisme, coma...). La base
+  s'avalua una sola vegada per resolució i es guarda en memòria cau; cada
+  fotograma és un sol producte matriu-vector dels coeficients per la base.
+- MapaAlcades: mapa d'alçades mesurat, carregat d'un fitxer .npy i reinterpolat a
+  la resolució de la pantalla.
+"""
+
+from functools import lru_cache
+from math import factorial
+
+import numpy as np
+
+from .geometria import eix, malla_radial
+from .model import screen_size, res, dist_lent, factor_escala, intensitat_de_dco
+
+noms_zernike = {
+    1: "Pistó",
+    2: "Inclinació X",
+    3: "Inclinació Y",
+    4: "Desenfocament",
+    5: "Astigmatisme oblic",
+    6: "Astigmatisme vertical",
+    7: "Coma vertical",
+    8: "Coma horitzontal",
+    9: "Trèvol vertical",
+    10: "Trèvol oblic",
+    11: "Esfèrica primària"
+}
+
+
+def noll_a_nm(j):
+    """
+    j: índex de Noll (a partir de 1)
+    Retorna (n, m): ordre radial i freqüència azimutal, m < 0 per als termes en sinus.
+    """
+    if j < 1:
+        raise ValueError(f"Els índexs de Noll comencen a 1, no {j}")
+    n = 0
+    while (n + 1)*(n + 2)//2 < j:
+        n += 1
+    # Dins de cada ordre, |m| creixent; de cada parella, l'índex parell és el cosinus
+    actual = n*(n + 1)//2 + 1
+    for m in range(n % 2, n + 1, 2):
+        if m == 0:
+            if actual == j:
+                return n, 0
+            actual += 1
+        else:
+            if j in (actual, actual + 1):
+                return n, m if j % 2 == 0 else -m
+            actual += 2
+    raise AssertionError("ordre de Noll inconsistent")
+
+
+def polinomi_zernike(j, rho, theta):
+    """
+    Polinomi de Zernike j (Noll, normalitzat a variància 1 sobre el disc unitat).
+    rho, theta: coordenades polars normalitzades
+    """
+    n, m = noll_a_nm(j)
+    ma = abs(m)
+    radial = np.zeros_like(rho)
+    for k in range((n - ma)//2 + 1):
+        c = (-1)**k * factorial(n - k) / (factorial(k) * factorial((n + ma)//2 - k)
+                                          * factorial((n - ma)//2 - k))
+        radial += c * rho**(n - 2*k)
+    if m == 0:
+        return np.sqrt(n + 1) * radial
+    angular = np.cos(ma*theta) if m > 0 else np.sin(ma*theta)
+    return np.sqrt(2*(n + 1)) * radial * angular
+
+
+@lru_cache(maxsize=2)
+def base_zernike(n_termes, res=res, screen_size=screen_size, radi=None, dtype=np.float64):
+    """
+    Matriu (n_termes, res*res) amb els polinomis 1..n_termes avaluats a la pantalla.
+    radi: radi de normalització (per defecte, la mitja diagonal de la pantalla, de
+          manera que tota la pantalla queda dins del disc unitat)
+    """
+    if radi is None:
+        radi = screen_size/np.sqrt(2)
+    x = eix(res, screen_size)
+    X, Y = np.meshgrid(x, x)
+    rho = (np.sqrt(X**2 + Y**2) / radi).ravel()
+    theta = np.arctan2(Y, X).ravel()
+    base = np.empty((n_termes, res*res), dtype=dtype)
+    for j in range(1, n_termes + 1):
+        base[j-1] = polinomi_zernike(j, rho, theta)
+    base.flags.writeable = False
+    return base
+
+
+class SumaRadial:
+    """
+    termes: llista de (escala, potencia); cada terme aporta escala * factor_escala(potencia) * R**potencia
+    """
+
+    def __init__(self, termes):
+        self.termes = [(escala, float(potencia)) for escala, potencia in termes]
+        for _, potencia in self.termes:
+            factor_escala(potencia)  # ValueError si la potència no és vàlida
+
+    def alcada_radial(self, R):
+        # Alçada del mirall a cada radi (m)
+        h = np.zeros_like(R, dtype=float)
+        for escala, potencia in self.termes:
+            h += escala * factor_escala(potencia) * R**potencia
+        return h
+
+    def alcada(self, res=res, screen_size=screen_size):
+        return self.alcada_radial(malla_radial(res, screen_size))
+
+
+class Zernike:
+    """
+    coeficients: coeficient (m, rms) de cada polinomi, en ordre de Noll a partir de
+                 j=1, o diccionari {j: coeficient}
+    radi: radi de normalització (vegeu base_zernike)
+    dtype: tipus de la base (amb float32 ocupa la meitat)
+    """
+
+    def __init__(self, coeficients, radi=None, dtype=np.float64):
+        if isinstance(coeficients, dict):
+            vector = np.zeros(max(coeficients))
+            for j, c in coeficients.items():
+                noll_a_nm(j)
+                vector[j-1] = c
+            coeficients = vector
+        self.coeficients = np.asarray(coeficients, dtype=float)
+        self.radi = radi
+        self.dtype = dtype
+
+    def base(self, res=res, screen_size=screen_size):
+        return base_zernike(len(self.coeficients), res, screen_size, self.radi, self.dtype)
+
+    def alcada(self, res=res, screen_size=screen_size):
+        base = self.base(res, screen_size)
+        return np.dot(self.coeficients.astype(base.dtype), base).reshape(res, res)
+
+    def alcades(self, conjunts, res=res, screen_size=screen_size):
+        """
+        conjunts: matriu (N, n_termes) de coeficients
+        Retorna les N superfícies (N, res, res) amb un sol producte de matrius.
+        """
+        base = self.base(res, screen_size)
+        conjunts = np.asarray(conjunts, dtype=base.dtype)
+        return np.dot(conjunts, base).reshape(len(conjunts), res, res)
+
+    def residus(self, mesurada, mirror_diff, conjunts, screen_size=screen_size, mida_lot=16):
+        """
+        Suma dels quadrats de la diferència entre una intensitat mesurada (res, res)
+        i la de cada conjunt de coeficients, per provar molts conjunts alhora.
+        """
+        res = mesurada.shape[0]
+        dco_base = mirror_diff - malla_radial(res, screen_size)**2/(2*dist_lent)
+        conjunts = np.atleast_2d(conjunts)
+        residus = np.empty(len(conjunts))
+        for i in range(0, len(conjunts), mida_lot):
+            h = self.alcades(conjunts[i:i+mida_lot], res, screen_size)
+            intensitats = intensitat_de_dco(dco_base - 2*h)
+            residus[i:i+mida_lot] = ((intensitats - mesurada)**2).sum(axis=(1, 2))
+        return residus
+
+
+class MapaAlcades:
+    """
+    alcades: array 2D amb l'alçada del mirall (m), que cobreix tota la pantalla
+    """
+
+    def __init__(self, alcades):
+        self.alcades = np.asarray(alcades, dtype=float)
+        if self.alcades.ndim != 2:
+            raise ValueError("El mapa d'alçades ha de ser un array 2D")
+        self._cau = {}
+
+    @classmethod
+    def carrega(cls, fitxer):
+        # fitxer: fitxer .npy amb l'array d'alçades (m)
+        return cls(np.load(fitxer))
+
+    def alcada(self, res=res, screen_size=screen_size):
+        # Interpolació bilineal a la resolució de la pantalla, guardada per resolució
+        if res not in self._cau:
+            ny, nx = self.alcades.shape
+            fy = np.linspace(0, ny - 1, res)
+            fx = np.linspace(0, nx - 1, res)
+            iy = np.minimum(fy.astype(int), ny - 2) if ny > 1 else np.zeros(res, int)
+            ix = np.minimum(fx.astype(int), nx - 2) if nx > 1 else np.zeros(res, int)
+            py = (fy - iy)[:, None]
+            px = (fx - ix)[None, :]
+            a = self.alcades
+            iy1 = np.minimum(iy + 1, ny - 1)
+            ix1 = np.minimum(ix + 1, nx - 1)
+            dalt = a[iy][:, ix]*(1 - px) + a[iy][:, ix1]*px
+            baix = a[iy1][:, ix]*(1 - px) + a[iy1][:, ix1]*px
+            h = dalt*(1 - py) + baix*py
+            h.flags.writeable = False
+            self._cau[res] = h
+        return self._cau[res]
+
+
+def dco_superficie(superficie, mirror_diff, res=res, screen_size=screen_size):
+    """
+    superficie: SumaRadial, Zernike o MapaAlcades
+    mirror_diff: diferència de distància entre els braços (m)
+    """
+    R = malla_radial(res, screen_size)
+    return mirror_diff - R**2/(2*dist_lent) - 2*superficie.alcada(res, screen_size)
+
+
+def intensitat_superficie(superficie, mirror_diff, res=res, screen_size=screen_size, espectre=None):
+    return intensitat_de_dco(dco_superficie(superficie, mirror_diff, res, screen_size), espectre)
@@ -0,0 +1,193 @@
+"""
+Càlcul vectoritzat de molts conjunts de paràmetres alhora.
+
+Els paràmetres poden ser arrays i es combinen amb broadcasting: el resultat té la
+forma dels paràmetres seguida de (res, res) a la malla completa, o de (n_radis,) en
+mode radial (un perfil sobre radis_perfil(res, screen_size) per a cada conjunt, que
+MapaRadial.expandeix converteix en pantalla).
+
+Tots els models tenen la mateixa forma,
+    dco = Δd - a·R² - b·R^p,
+amb a = 1/(2·dist_lent) + 1/(2·radi_curv) i b = 0 per al mirall esfèric, i
+a = 1/(2·dist_lent) i b = 2·escala·factor_escala(p) per als miralls R^n. R² i R^p es
+calculen una sola vegada i cada lot de patrons és un producte exterior dels
+coeficients per aquests termes, sense cap bucle de Python per patró. La mida del
+lot es tria perquè la memòria de treball no passi de `pressupost`; la sortida, que
+pot ser un np.memmap, no hi compta.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from .geometria import malla_radial
+from .model import screen_size, res, long_ona, dist_lent, factor_escala
+from .perfil_radial import MapaRadial
+
+# Memòria de treball màxima per lot (bytes)
+pressupost_lot = 256*2**20
+
+
+@lru_cache(maxsize=2)
+def _mapa(res, screen_size):
+    return MapaRadial(res, screen_size)
+
+
+def radis_perfil(res=res, screen_size=screen_size):
+    # Radis (m) dels perfils del mode radial, els mateixos que els de MapaRadial
+    return _mapa(res, screen_size).r
+
+
+@lru_cache(maxsize=4)
+def _R2(res, screen_size, radial):
+    R = radis_perfil(res, screen_size) if radial else malla_radial(res, screen_size)
+    R2 = (R**2).ravel()
+    R2.flags.writeable = False
+    return R2
+
+
+@lru_cache(maxsize=4)
+def _Rp(res, screen_size, radial, potencia):
+    Rp = np.power(_R2(res, screen_size, radial), potencia/2)
+    Rp.flags.writeable = False
+    return Rp
+
+
+def mida_lot(punts, pressupost=pressupost_lot, espectre=None):
+    """
+    Patrons per lot perquè la memòria de treball no passi del pressupost.
+    punts: píxels (o radis) de cada patró
+    """
+    # La dco en float64 i un temporal del terme R^p; l'espectre en fa servir uns quants més
+    arrays = 2 if espectre is None else 4
+    return max(1, int(pressupost // (arrays * 8 * punts)))
+
+
+def _crea_sortida(sortida, forma, dtype):
+    if sortida is None:
+        return np.empty(forma, dtype=dtype)
+    if isinstance(sortida, str):
+        return np.lib.format.open_memmap(sortida, mode='w+', dtype=dtype, shape=forma)
+    if sortida.shape != forma or not sortida.flags.c_contiguous:
+        raise ValueError(f"La sortida ha de ser un array contigu de forma {forma}")
+    return sortida
+
+
+def intensitats(mirror_diff, a, b, potencia, res=res, screen_size=screen_size, radial=False,
+                espectre=None, dtype=np.float64, pressupost=pressupost_lot, sortida=None):
+    """
+    Nucli comú: intensitat per a dco = Δd - a·R² - b·R^p.
+    mirror_diff, a, b, potencia: arrays (o escalars) que es combinen amb broadcasting
+    radial: True retorna perfils sobre radis_perfil(res, screen_size) en lloc de pantalles
+    espectre: espectre de la font (None per a llum monocromàtica)
+    dtype: tipus de la sortida quan es crea aquí (el càlcul es fa sempre en float64)
+    pressupost: memòria de treball màxima per lot (bytes)
+    sortida: array on escriure, nom d'un fitxer .npy (es crea com a memmap) o None
+    """
+    mirror_diff, a, b, potencia = np.broadcast_arrays(*(np.asarray(v, dtype=float)
+                                                        for v in (mirror_diff, a, b, potencia)))
+    forma_params = mirror_diff.shape
+    R2 = _R2(res, screen_size, radial)
+    forma_patro = R2.shape if radial else (res, res)
+    sortida = _crea_sortida(sortida, forma_params + forma_patro, dtype)
+
+    mirror_diff, a, b, potencia = (v.ravel() for v in (mirror_diff, a, b, potencia))
+    n = len(mirror_diff)
+    pla = sortida.reshape(n, R2.size)
+    lot = mida_lot(R2.size, pressupost, espectre)
+    # Sense espectre i en float64, la dco es calcula directament dins de la sortida
+    directe = espectre is None and pla.dtype == np.float64
+    dco = None if directe else np.empty((min(lot, n), R2.size))
+    # Amb llum monocromàtica es calcula directament la fase k·dco, sense una passada més
+    k = 1 if espectre is not None else 2*np.pi/long_ona
+
+    for i in range(0, n, lot):
+        j = min(i + lot, n)
+        d = pla[i:j] if directe else dco[:j-i]
+        np.multiply.outer(-k*a[i:j], R2, out=d)
+        d += k*mirror_diff[i:j, None]
+        # Un producte exterior per a cada potència diferent del lot
+        deformats = np.flatnonzero(b[i:j])
+        for p in np.unique(potencia[i:j][deformats]):
+            files = deformats[potencia[i:j][deformats] == p]
+            d[files] -= np.multiply.outer(k*b[i:j][files], _Rp(res, screen_size, radial, float(p)))
+        if espectre is not None:
+            pla[i:j] = espectre.intensitat(d)
+            continue
+        np.cos(d, out=d)
+        d += 1
+        d *= 0.5
+        if not directe:
+            pla[i:j] = d
+
+    if isinstance(sortida, np.memmap):
+        sortida.flush()
+    return sortida
+
+
+def coeficients_esferic(radi_curv):
+    # a de cada radi de curvatura; 0 (o negatiu) vol dir mirall pla
+    radi_curv = np.asarray(radi_curv, dtype=float)
+    corbat = radi_curv > 0
+    return 1/(2*dist_lent) + np.where(corbat, 0.5/np.where(corbat, radi_curv, 1), 0)
+
+
+def factors_escala_array(potencia):
+    # factor_escala element a element, una crida per potència diferent
+    potencia = np.asarray(potencia, dtype=float)
+    uniques, inversa = np.unique(potencia, return_inverse=True)
+    return np.array([factor_escala(p) for p in uniques])[inversa].reshape(potencia.shape)
+
+
+def intensitats_esferic(mirror_diff, radi_curv, res=res, screen_size=screen_size, radial=False,
+                        **opcions):
+    """
+    mirror_diff: diferències de distància entre els braços (m)
+    radi_curv: radis de curvatura (m), 0 vol dir mirall pla
+    Opcions: les de intensitats.
+    """
+    return intensitats(mirror_diff, coeficients_esferic(radi_curv), 0, 2, res, screen_size,
+                       radial, **opcions)
+
+
+def intensitats_radial(mirror_diff, escala, potencia, res=res, screen_size=screen_size, radial=False,
+                       **opcions):
+    """
+    mirror_diff: diferències de distància entre els braços (m)
+    escala: factors de deformació
+    potencia: potències de R de la deformació
+    Opcions: les de intensitats.
+    """
+    b = 2*np.asarray(escala, dtype=float)*factors_escala_array(potencia)
+    return intensitats(mirror_diff, 1/(2*dist_lent), b, potencia, res, screen_size, radial, **opcions)
+
+
+def comprova_vectoritzat(res=200, n=7):
+    """
+    Compara el càlcul vectoritzat amb les crides escalars de michelson.model i amb
+    el perfil de MapaRadial. Retorna una llista de (cas, error màxim absolut).
+    """
+    from .model import compute_intensitat, calcul_intensitat, dco_esferic, dco_radial, intensitat_de_dco
+
+    rng = np.random.default_rng(0)
+    mirror_diffs = rng.uniform(-2e-6, 2e-6, n)
+    radis = np.concatenate([[0], rng.uniform(0.5, 20, n - 1)])
+    escales = rng.uniform(0, 1, n)
+    potencies = rng.choice([0.5, 1.0, 2.0, 2.5, 4.0], n)
+    r = radis_perfil(res, screen_size)
+
+    esferic = intensitats_esferic(mirror_diffs, radis, res, screen_size, pressupost=3*8*res**2)
+    radial = intensitats_radial(mirror_diffs, escales, potencies, res, screen_size)
+    perfils = intensitats_radial(mirror_diffs, escales, potencies, res, screen_size, radial=True)
+    graella = intensitats_esferic(mirror_diffs[:, None], radis[None, :], res, screen_size,
+                                  radial=True, dtype=np.float32)
+    return [
+        ('esferic', max(np.abs(esferic[i] - compute_intensitat(mirror_diffs[i], radis[i], res)).max()
+                        for i in range(n))),
+        ('radial', max(np.abs(radial[i] - calcul_intensitat(mirror_diffs[i], escales[i], potencies[i],
+                                                             res)).max() for i in range(n))),
+        ('perfils radial', max(np.abs(perfils[i] - intensitat_de_dco(
+            dco_radial(r, mirror_diffs[i], escales[i], potencies[i]))).max() for i in range(n))),
+        ('graella esferic (float32)', max(np.abs(graella[i, j] - intensitat_de_dco(
+            dco_esferic(r, mirror_diffs[i], radis[j]))).max() for i in range(n) for j in range(n))),
+    ]
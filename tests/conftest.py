@@ -0,0 +1,34 @@
+"""
+Proves del paquet michelson amb pytest.
+
+    python -m pytest tests
+    python -m pytest tests --rendiment    # també les regressions de temps i memòria
+
+Les proves de rendiment comparen amb benchmarks/referencia.json, que s'ha de desar a
+la mateixa màquina amb `python -m benchmarks.suite --desa-referencia`.
+"""
+
+import os
+
+import pytest
+
+# Sense pantalla: el cicle d'update de les proves de rendiment dibuixa amb Agg
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+def pytest_addoption(parser):
+    parser.addoption('--rendiment', action='store_true',
+                     help='executa les proves de regressió de temps i memòria')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'rendiment: regressió de temps i memòria contra la referència desada')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--rendiment'):
+        return
+    salta = pytest.mark.skip(reason='cal --rendiment')
+    for item in items:
+        if 'rendiment' in item.keywords:
+            item.add_marker(salta)
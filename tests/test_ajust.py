@@ -0,0 +1,40 @@
+
+import numpy as np
+
+from michelson.ajust import AjustadorInterferograma, ajusta_interferograma, verifica_sintetic
+from michelson.model import long_ona, compute_intensitat, intensitat_de_dco, dco_esferic, dco_radial, factor_escala
+
+
+def test_ajust_de_fotogrames_sintetics():
+    for model, params, ajust, (error_dd, error) in verifica_sintetic():
+        # Amb soroll 0.05, el con (p = 1) només fixa Δd a uns λ/15
+        assert error_dd <= long_ona/10, (model, params)
+        assert error <= 0.05, (model, params)
+
+
+def test_mirall_pla():
+    # La cerca en graella no ha de començar amb una curvatura negativa
+    imatge = 0.1 + 0.8*compute_intensitat(0, 0, res=500)
+    ajust = ajusta_interferograma(imatge)
+    assert abs(ajust.curvatura) <= 1e-3
+
+
+def test_model_i_jacobia_consistents_amb_la_dco():
+    # Model fons + contrast*cos(fase), és a dir (fons - contrast) + 2*contrast*I
+    r = np.linspace(1e-4, 0.05, 200)
+    casos = [('esferic', None, [0.5, 0.4, 3e-7, 0.2], dco_esferic(r, 3e-7, 5)),
+             ('radial', None, [0.5, 0.4, 3e-7, 0.02, 2.5],
+              dco_radial(r, 3e-7, 0.01/factor_escala(2.5), 2.5)),
+             ('radial', 3.0, [0.5, 0.4, 3e-7, 0.02], dco_radial(r, 3e-7, 0.01/factor_escala(3), 3))]
+    for model, potencia, theta, dco in casos:
+        ajustador = AjustadorInterferograma(model, potencia=potencia)
+        valors, J, _ = ajustador._model(np.array(theta), r)
+        assert np.allclose(valors, 0.1 + 0.8*intensitat_de_dco(dco), atol=1e-9)
+        # Jacobià analític contra diferències centrades
+        for j in range(len(theta)):
+            h = 1e-6*max(abs(theta[j]), 1e-12)
+            mes, menys = np.array(theta), np.array(theta)
+            mes[j] += h
+            menys[j] -= h
+            numeric = (ajustador._model(mes, r)[0] - ajustador._model(menys, r)[0]) / (2*h)
+            assert np.allclose(J[:, j], numeric, rtol=1e-4, atol=1e-4*np.abs(J[:, j]).max()), (model, j)
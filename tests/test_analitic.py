@@ -0,0 +1,23 @@
+from michelson.analitic import comparar_amb_detector, mesura_esferic, mesura_radial
+from michelson.model import factor_escala
+
+
+def test_radis_analitics_contra_el_detector():
+    for model, params, anells, error in comparar_amb_detector(500):
+        assert error <= 0.5, (model, params, anells)
+
+
+def test_radi_de_curvatura_estimat_dels_anells():
+    for mirror_diff, radi_curv in [(0, 0.5), (0.3e-6, 5), (-1.1e-6, 20), (1.7e-6, 1e4)]:
+        mesura = mesura_esferic(mirror_diff, radi_curv)
+        assert abs(mesura.radi_curv - radi_curv) <= 1e-9*radi_curv
+        assert 0 <= mesura.incertesa <= 1e-9*radi_curv
+
+    # Mirall R^2 amb la curvatura equivalent a R = 5 m
+    mesura = mesura_radial(0.3e-6, 1/(4*5*factor_escala(2)), 2)
+    assert abs(mesura.radi_curv - 5) <= 1e-6*5
+
+    # Mirall pla o un sol anell: no es pot estimar
+    assert mesura_esferic(0, 0).radi_curv is None
+    mesura = mesura_esferic(0.3e-6, 1e4, r_max=1e-3)
+    assert mesura.n_anells < 2 and mesura.radi_curv is None
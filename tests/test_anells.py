@@ -0,0 +1,63 @@
+import numpy as np
+
+from michelson.anells import trobar_anells, calcular_radi_curv, incertesa_radis
+from michelson.model import compute_intensitat, long_ona, dist_lent
+
+
+def radis_teorics(radi_curv, n, r0=2e-3):
+    pendent = 2*long_ona / (1/dist_lent + 1/radi_curv)
+    return np.sqrt(r0**2 + np.arange(n)*pendent)
+
+
+def test_radi_de_curvatura_dins_de_la_precisio():
+    # Error relatiu màxim de l'ajust a cada resolució, per a R dins de l'interval
+    casos = [(1000, 5, 20, 0.001), (1000, 2, 5, 0.005), (500, 5, 20, 0.01)]
+    rng = np.random.default_rng(3)
+    for res, r_min, r_max, error_max in casos:
+        acceptats = 0
+        for _ in range(8):
+            radi_curv = float(np.exp(rng.uniform(np.log(r_min), np.log(r_max))))
+            dd = float(rng.uniform(-1e-6, 1e-6))
+            radis = trobar_anells(compute_intensitat(dd, radi_curv, res=res))
+            R, incertesa = calcular_radi_curv(radis, sigma=incertesa_radis(res))
+            if R is None:
+                continue
+            acceptats += 1
+            assert abs(R - radi_curv) <= error_max*radi_curv, (res, radi_curv, dd, R)
+            assert abs(R - radi_curv) <= 2*incertesa, (res, radi_curv, dd, R, incertesa)
+        assert acceptats >= 6, (res, r_min, r_max)
+
+
+def test_franges_no_resoltes_rebutjades():
+    # A res=300 amb R = 2 m les franges de fora ja no estan resoltes
+    for res, radi_curv in ((1000, 0.5), (300, 2)):
+        radis = trobar_anells(compute_intensitat(0, radi_curv, res=res))
+        assert calcular_radi_curv(radis, sigma=incertesa_radis(res)) == (None, None)
+
+
+def test_massa_pocs_anells():
+    radis = radis_teorics(5, 3)
+    assert calcular_radi_curv(radis[:2]) == (None, None)
+    assert calcular_radi_curv(radis[:1], min_anells=1) == (None, None)
+    R, incertesa = calcular_radi_curv(radis[:2], min_anells=2)
+    assert abs(R - 5) < 1e-9 and incertesa is None
+
+
+def test_residus_incompatibles_amb_sigma():
+    sigma = 1e-6
+    radis = radis_teorics(5, 10)
+    R, incertesa = calcular_radi_curv(radis, sigma=sigma)
+    assert abs(R - 5) < 1e-6*5 and incertesa > 0
+
+    # Un anell desplaçat 20 sigma: sense sigma s'accepta, amb sigma es rebutja
+    desplacat = radis.copy()
+    desplacat[5] += 20*sigma
+    assert calcular_radi_curv(desplacat)[0] is not None
+    assert calcular_radi_curv(desplacat, sigma=sigma) == (None, None)
+    assert calcular_radi_curv(desplacat, sigma=sigma, chi2_max=np.inf)[0] is not None
+
+
+def test_ordres_amb_anell_no_detectat():
+    radis = radis_teorics(5, 10)
+    R, _ = calcular_radi_curv(np.delete(radis, 4), sigma=1e-6)
+    assert abs(R - 5) < 1e-6*5
@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+
+from michelson.animacio import exporta_animacio, fotogrames, taula_colors, trajectoria_lineal
+from michelson.model import compute_intensitat, calcul_intensitat
+
+
+def _compara(quadre, esperada):
+    # Els fotogrames agafen la mostra radial més propera: error màxim d'una
+    # fracció de franja a prop de la vora, però d'uns pocs nivells de mitjana
+    error = np.abs(quadre.astype(float)/255 - esperada)
+    assert error.max() <= 0.1 and error.mean() <= 0.02, (error.max(), error.mean())
+
+
+def test_trajectoria_lineal():
+    trajectoria = trajectoria_lineal((-1e-6, 0.1, 1), (1e-6, 0.5, 3), 5)
+    assert trajectoria[0] == (-1e-6, 0.1, 1.0) and trajectoria[-1] == (1e-6, 0.5, 3.0)
+    assert np.allclose([p[2] for p in trajectoria], [1, 1.5, 2, 2.5, 3])
+
+
+@pytest.mark.parametrize('processos', [0, 2])
+def test_fotogrames_en_ordre(processos):
+    esferic = trajectoria_lineal((-1e-6, 1000), (1e-6, 2000), 6)
+    radial = trajectoria_lineal((0, 0, 1), (1e-6, 0.005, 2), 5)
+    for trajectoria, intensitat in [(esferic, compute_intensitat), (radial, calcul_intensitat)]:
+        quadres = list(fotogrames(trajectoria, res=128, processos=processos, cua=4, mida_bloc=2))
+        assert len(quadres) == len(trajectoria)
+        for params, quadre in zip(trajectoria, quadres):
+            _compara(np.frombuffer(quadre, dtype=np.uint8).reshape(128, 128),
+                     intensitat(*params, res=128))
+
+
+def test_colors_i_png(tmp_path):
+    from PIL import Image
+
+    trajectoria = trajectoria_lineal((0, 1000), (0.5e-6, 1000), 3)
+    crus = list(fotogrames(trajectoria, res=64, processos=0, cmap='viridis'))
+    assert exporta_animacio(trajectoria, str(tmp_path / 'png'), res=64, processos=0, cmap='viridis') == 3
+
+    colors = taula_colors('viridis')
+    for i, (params, cru) in enumerate(zip(trajectoria, crus)):
+        quadre = np.frombuffer(cru, dtype=np.uint8).reshape(64, 64, 3)
+        with Image.open(tmp_path / 'png' / f'{i:05d}.png') as imatge:
+            assert np.array_equal(np.asarray(imatge), quadre)
+        # Cada píxel és l'entrada del mapa de colors del nivell de gris corresponent
+        gris = np.frombuffer(list(fotogrames([params], res=64, processos=0))[0], dtype=np.uint8)
+        assert np.array_equal(quadre.reshape(-1, 3), colors[gris])
+
+
+def test_gif(tmp_path):
+    from PIL import Image
+
+    trajectoria = trajectoria_lineal((0, 0.1, 2), (1e-6, 0.1, 2), 4)
+    assert exporta_animacio(trajectoria, str(tmp_path / 'anells.gif'), res=64, processos=0) == 4
+    with Image.open(tmp_path / 'anells.gif') as gif:
+        assert gif.n_frames == 4 and gif.size == (64, 64)
+
+
+def test_format_desconegut(tmp_path):
+    with pytest.raises(ValueError):
+        exporta_animacio([(0, 1000)], str(tmp_path / 'anells.bmp'), res=64, processos=0)
@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+import pytest
+
+from michelson.backends import comprova_backends, toleracies, tria_backend
+
+
+def test_backends_contra_numpy():
+    for nom, dtype, termes, error in comprova_backends():
+        assert error <= toleracies[np.dtype(dtype)], (nom, dtype, termes)
+
+
+def test_fils_de_numexpr_nomes_durant_la_crida():
+    numexpr = pytest.importorskip('numexpr')
+    anteriors = numexpr.set_num_threads(1)
+    try:
+        backend = tria_backend('numexpr', fils=2)
+        backend.intensitat(np.empty(16), 0.5, ((2.0, np.ones(16)),))
+        assert numexpr.set_num_threads(1) == 1
+    finally:
+        numexpr.set_num_threads(anteriors)
+
+
+def test_fils_de_numba_fitats_als_nuclis():
+    pytest.importorskip('numba')
+    backend = tria_backend('numba', fils=os.cpu_count() + 1)
+    out = backend.intensitat(np.empty(16), 0.5, ((2.0, np.ones(16)),))
+    assert np.allclose(out, 0.5*(1 + np.cos(2.5)))
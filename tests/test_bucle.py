@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from michelson.bucle import BucleRender
+from michelson.cronometre import Cronometre
+
+
+def _espera(condicio, temps=5):
+    limit = time.perf_counter() + temps
+    while not condicio():
+        if time.perf_counter() > limit:
+            raise AssertionError("temps d'espera exhaurit")
+        time.sleep(1e-3)
+
+
+class Registre:
+    """
+    calcula i mostra per a BucleRender que apunten les crides. Amb bloqueja, cada
+    càlcul espera que la prova el deixi continuar.
+    """
+
+    def __init__(self, bloqueja=False):
+        self.calculs = []
+        self.mostrats = []
+        self.bloqueja = bloqueja
+        self.continua = threading.Semaphore(0)
+
+    def calcula(self, params, previsualitzacio):
+        self.calculs.append((params, previsualitzacio))
+        if self.bloqueja:
+            self.continua.acquire()
+        return (params, previsualitzacio)
+
+    def mostra(self, resultat):
+        self.mostrats.append(resultat)
+
+
+@pytest.fixture
+def figura():
+    plt = pytest.importorskip('matplotlib.pyplot')
+    fig, ax = plt.subplots()
+    imatge = ax.imshow([[0, 1], [1, 0]])
+    yield fig, imatge
+    plt.close(fig)
+
+
+def test_nomes_es_calcula_l_ultima_peticio(figura):
+    fig, imatge = figura
+    registre = Registre(bloqueja=True)
+    bucle = BucleRender(fig, registre.calcula, registre.mostra, [imatge], repos=0.05,
+                        arrossegant=lambda: False)
+    try:
+        bucle.demana(1)
+        _espera(lambda: len(registre.calculs) == 1)
+        for params in (2, 3, 4):
+            bucle.demana(params)
+        registre.continua.release()
+
+        # El resultat no se sobreescriu fins que s'ha mostrat: el treballador espera
+        time.sleep(0.1)
+        assert registre.calculs == [(1, False)]
+        bucle.recull()
+        assert registre.mostrats == [(1, False)]
+
+        # De les peticions que han arribat mentrestant, només la darrera
+        _espera(lambda: len(registre.calculs) == 2)
+        registre.continua.release()
+        _espera(lambda: bucle.recull() or registre.mostrats[-1:] == [(4, False)])
+        time.sleep(0.1)
+        assert registre.calculs == [(1, False), (4, False)]
+    finally:
+        bucle.tanca()
+        registre.continua.release()
+
+
+def test_previsualitzacio_i_refinament(figura):
+    fig, imatge = figura
+    registre = Registre()
+    arrossega = [True]
+    cronometre = Cronometre()
+    bucle = BucleRender(fig, registre.calcula, registre.mostra, [imatge], repos=0.05,
+                        arrossegant=lambda: arrossega[0], cronometre=cronometre)
+    try:
+        fig.canvas.draw()
+        bucle.demana('a')
+        _espera(lambda: bucle.recull() or registre.mostrats == [('a', True)])
+
+        # Mentre s'arrossega no es refina
+        time.sleep(0.2)
+        bucle.recull()
+        assert registre.calculs == [('a', True)]
+
+        arrossega[0] = False
+        _espera(lambda: bucle.recull() or registre.mostrats == [('a', True), ('a', False)])
+        assert registre.calculs == [('a', True), ('a', False)]
+
+        # Amb Agg el canvas admet blit: els fotogrames no fan un dibuix complet
+        assert {'previsualitzacio', 'calcul', 'mostra', 'blit'} <= set(cronometre.estadistiques())
+    finally:
+        bucle.tanca()
+
+
+def test_arrossegament_per_temps(figura):
+    # Sense arrossegant, dues peticions seguides es consideren arrossegament
+    fig, imatge = figura
+    registre = Registre()
+    bucle = BucleRender(fig, registre.calcula, registre.mostra, [imatge], repos=0.2)
+    try:
+        bucle.demana('a')
+        bucle.demana('b')
+        _espera(lambda: bucle.recull() or registre.mostrats[-1:] == [('b', False)])
+        assert registre.calculs[-2:] == [('b', True), ('b', False)]
+    finally:
+        bucle.tanca()
+
+
+def test_tanca_atura_el_fil(figura):
+    fig, imatge = figura
+    registre = Registre()
+    bucle = BucleRender(fig, registre.calcula, registre.mostra, [imatge])
+    bucle.tanca()
+    bucle._fil.join(5)
+    assert not bucle._fil.is_alive()
+    bucle.demana('a')
+    time.sleep(0.05)
+    assert registre.calculs == []
@@ -0,0 +1,20 @@
+import numpy as np
+
+from michelson.comptador import ComptadorFranges, comprova_comptador, processa_trajectoria
+from michelson.model import long_ona
+
+toleracies = {'detectors puntuals contra la pantalla': 1e-9, 'obertura contra la mitjana explícita': 1e-12,
+              'franges comptades (27)': 0, 'desplaçament desembolicat (m)': long_ona/25}
+
+
+def test_comptador_contra_la_pantalla_i_un_escombrat_conegut():
+    for cas, error in comprova_comptador():
+        assert error <= toleracies[cas.split(': ', 1)[1]], cas
+
+
+def test_blocs_no_canvien_el_resultat():
+    trajectoria = np.linspace(0, 10*long_ona, 50000)
+    sencer = processa_trajectoria(ComptadorFranges([(0, 0)], quadratura=True), trajectoria, mida_bloc=len(trajectoria))
+    blocs = processa_trajectoria(ComptadorFranges([(0, 0)], quadratura=True), trajectoria, mida_bloc=997)
+    assert sencer.franges.tolist() == blocs.franges.tolist() == [10]
+    assert np.allclose(sencer.desplacament(), blocs.desplacament())
@@ -0,0 +1,25 @@
+import threading
+
+from michelson.cronometre import Cronometre
+
+
+def test_registre_des_d_un_altre_fil(tmp_path):
+    cronometre = Cronometre(max_esdeveniments=1000)
+    atura = threading.Event()
+
+    def treballador():
+        i = 0
+        while not atura.is_set():
+            cronometre.registra(f'etapa{i % 50}', 0, 1e-3)
+            i += 1
+
+    fil = threading.Thread(target=treballador)
+    fil.start()
+    try:
+        for _ in range(200):
+            cronometre.text()
+            cronometre.exporta_json(tmp_path / 'traca.json')
+    finally:
+        atura.set()
+        fil.join()
+    assert len(cronometre.estadistiques()) == 50
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from michelson.dades import ConjuntPatrons, genera, parametres, parametres_aleatoris, _desa_index
+from michelson.espectre import Espectre
+from michelson.model import compute_intensitat, calcul_intensitat
+
+# Les imatges surten del perfil radial (vegeu test_perfil_radial), quantitzat
+tolerancia = 0.01
+
+
+def _esperada(fila, res):
+    mirror_diff, radi_curv, escala, potencia, lambda_ = fila
+    espectre = Espectre.mostrejat([lambda_], [1])
+    if np.isnan(radi_curv):
+        return calcul_intensitat(mirror_diff, escala, potencia, res=res, espectre=espectre)
+    return compute_intensitat(mirror_diff, radi_curv, res=res, espectre=espectre)
+
+
+def test_imatges_i_acces_aleatori(tmp_path):
+    params = np.concatenate([
+        parametres_aleatoris(5, 'esferic', llavor=1, radi=(500, 5000), long_ona=(450e-9, 650e-9)),
+        parametres_aleatoris(5, 'radial', llavor=2, escala=(0, 0.005), potencies=(1.0, 2.0))])
+    conjunt = genera(tmp_path, params, res=128, mida_fragment=3, comprimit=False, processos=0)
+    assert len(conjunt) == 10 and conjunt.complet
+    assert sorted(os.listdir(tmp_path)) == ['fragment_00000.npy', 'fragment_00001.npy', 'fragment_00002.npy',
+                                             'fragment_00003.npy', 'index.json', 'params.npy']
+
+    for i, fila in enumerate(params):
+        assert np.abs(conjunt.intensitat(i) - _esperada(fila, 128)).max() <= tolerancia, i
+
+    # Índexs desordenats, repetits i negatius, a cavall de diversos fragments
+    indexs = [9, 0, 4, 4, -1, 7, 2]
+    assert np.array_equal(conjunt[indexs], np.stack([conjunt[i] for i in indexs]))
+    assert np.array_equal(conjunt[2:8], np.stack([conjunt[i] for i in range(2, 8)]))
+    assert np.array_equal(conjunt[-1], conjunt[9])
+    with pytest.raises(IndexError):
+        conjunt[10]
+
+
+def test_compressio_i_uint16(tmp_path):
+    params = parametres([0, 0.3e-6], radis_curv=[1000, 5000])
+    conjunt = genera(tmp_path, params, res=128, mida_fragment=1, dtype=np.uint16, processos=0)
+    assert conjunt.dtype == np.uint16
+    for i, fila in enumerate(params):
+        assert np.abs(conjunt.intensitat(i) - _esperada(fila, 128)).max() <= tolerancia
+    assert np.array_equal(ConjuntPatrons(tmp_path, fragments_en_memoria=1)[[1, 0]], conjunt[[1, 0]])
+
+
+def test_represa(tmp_path):
+    params = parametres_aleatoris(6, 'esferic', llavor=3, radi=(500, 5000))
+    genera(tmp_path, params, res=64, mida_fragment=2, processos=0)
+
+    # Una generació interrompuda: falta el fragment 1 i n'ha quedat el temporal
+    os.replace(tmp_path / 'fragment_00001.npz', tmp_path / 'fragment_00001.npz.tmp')
+    index = ConjuntPatrons(tmp_path).index
+    del index['fragments']['1']
+    _desa_index(tmp_path, index)
+    incomplet = ConjuntPatrons(tmp_path)
+    assert not incomplet.complet
+    with pytest.raises(IndexError):
+        incomplet[2]
+
+    abans = os.stat(tmp_path / 'fragment_00000.npz').st_mtime_ns
+    conjunt = genera(tmp_path, params, res=64, mida_fragment=2, processos=0)
+    assert conjunt.complet
+    assert os.stat(tmp_path / 'fragment_00000.npz').st_mtime_ns == abans
+    for i, fila in enumerate(params):
+        assert np.abs(conjunt.intensitat(i) - _esperada(fila, 64)).max() <= 2*tolerancia
+
+    with pytest.raises(ValueError):
+        genera(tmp_path, params[:5], res=64, mida_fragment=2, processos=0)
+    with pytest.raises(ValueError):
+        genera(tmp_path, params, res=128, mida_fragment=2, processos=0)
+
+
+def test_processos_treballadors(tmp_path):
+    params = parametres_aleatoris(4, 'radial', llavor=4, escala=(0, 0.005), potencies=(1.0, 2.0))
+    local = genera(tmp_path / 'local', params, res=64, mida_fragment=2, processos=0)
+    grup = genera(tmp_path / 'grup', params, res=64, mida_fragment=2, processos=2)
+    assert np.array_equal(local[:], grup[:])
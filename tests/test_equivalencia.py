@@ -0,0 +1,7 @@
+from benchmarks.suite import comprova_equivalencia
+
+
+def test_camins_reprodueixen_les_formules_originals():
+    # Cada camí de càlcul, amb la tolerància de la suite
+    dolents = [(nom, error, tol) for nom, error, tol in comprova_equivalencia() if not error <= tol]
+    assert not dolents
@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+
+from michelson.anells import trobar_anells
+from michelson.escombrat import graella, escombra, main
+from michelson.model import compute_intensitat, calcul_intensitat
+
+
+def _llegeix(fitxer):
+    with open(fitxer, encoding='utf-8') as f:
+        return sorted((json.loads(linia) for linia in f), key=lambda r: r['i'])
+
+
+def test_escombrat_esferic(tmp_path):
+    configuracions = graella([-0.5e-6, 0, 0.3e-6], [2, 5])
+    sortida, patrons = tmp_path / 'taula.jsonl', tmp_path / 'patrons.npy'
+    fets = escombra(configuracions, sortida, res=200, processos=2, mida_bloc=4,
+                    fitxer_patrons=patrons, dtype_patrons=np.float64)
+    assert fets == len(configuracions) == 6
+
+    resultats = _llegeix(sortida)
+    guardats = np.load(patrons)
+    for i, (params, resultat) in enumerate(zip(configuracions, resultats)):
+        esperat = compute_intensitat(*params, res=200)
+        assert resultat['i'] == i and resultat['params'] == list(params)
+        assert np.abs(guardats[i] - esperat).max() <= 1e-9
+        radis = trobar_anells(esperat)
+        assert resultat['n_anells'] == len(radis)
+        assert np.allclose(resultat['radis'], radis)
+
+
+def test_escombrat_radial_quantitzat(tmp_path):
+    sortida, patrons = tmp_path / 'taula.jsonl', tmp_path / 'patrons.npy'
+    main(['radial', '--dd', '-0.2', '0.2', '2', '--escala', '0.1', '0.5', '2', '--potencia', '2.5', '3',
+          '--res', '100', '--processos', '1', '--sortida', str(sortida), '--patrons', str(patrons)])
+
+    resultats = _llegeix(sortida)
+    guardats = np.load(patrons)
+    assert guardats.dtype == np.uint8 and len(resultats) == len(guardats) == 8
+    for resultat, patro in zip(resultats, guardats):
+        esperat = calcul_intensitat(*resultat['params'], res=100)
+        # Quantitzat a 0-255: error de mig pas com a molt
+        assert np.abs(patro/255 - esperat).max() <= 0.5/255 + 1e-9
@@ -0,0 +1,50 @@
+import numpy as np
+
+from michelson.espectre import Espectre
+from michelson.geometria import malla_radial
+from michelson.model import screen_size, long_ona, compute_intensitat, calcul_intensitat, dco_esferic
+from michelson.perfil_radial import MapaRadial
+
+
+def test_una_sola_linia_es_monocromatica():
+    espectre = Espectre.mostrejat([long_ona], [1])
+    for params in [(0, 0), (0.3e-6, 5), (-1.1e-6, 20)]:
+        assert np.abs(compute_intensitat(*params, res=200, espectre=espectre)
+                      - compute_intensitat(*params, res=200)).max() <= 1e-10
+    assert np.abs(calcul_intensitat(0.2e-6, 0.5, 2.5, res=200, espectre=espectre)
+                  - calcul_intensitat(0.2e-6, 0.5, 2.5, res=200)).max() <= 1e-10
+
+
+def test_doblet():
+    # Dues línies iguals: 0.5·(1 + 0.5·cos(2πσ1·dco) + 0.5·cos(2πσ2·dco))
+    l1, l2 = 589.0e-9, 589.6e-9
+    espectre = Espectre.mostrejat([l1, l2], [1, 1])
+    dco = dco_esferic(malla_radial(200, screen_size), 0.7e-6, 5)
+    esperat = 0.5*(1 + 0.5*np.cos(2*np.pi*dco/l1) + 0.5*np.cos(2*np.pi*dco/l2))
+    assert np.abs(espectre.intensitat(dco) - esperat).max() <= 1e-12
+
+
+def test_forma_tancada_contra_la_suma_de_mostres():
+    dco = np.linspace(-60e-6, 60e-6, 2001)
+    for espectre in (Espectre.gaussia(amplada=20e-9, mostres=256), Espectre.lorentzia(amplada=5e-9, mostres=4096)):
+        tancada = espectre.interferencia(dco)
+        suma = espectre.interferencia(dco, forma_tancada=False)
+        assert np.abs(tancada - suma).max() <= 0.02, espectre.forma
+
+
+def test_visibilitat_gaussiana():
+    # L'envolupant de la gaussiana és exp(-2(π·σ_σ·dco)²), amb σ_σ = FWHM/λ²/2.3548
+    espectre = Espectre.gaussia(amplada=20e-9)
+    sigma = 20e-9/long_ona**2/(2*np.sqrt(2*np.log(2)))
+    # Als màxims de la portadora (dco = nλ) el terme d'interferència és l'envolupant
+    dco = np.arange(0, 60)*long_ona
+    esperat = np.exp(-2*(np.pi*sigma*dco)**2)
+    assert np.abs(espectre.interferencia(dco) - esperat).max() <= 1e-9
+    assert np.abs(espectre.interferencia(dco, forma_tancada=False) - esperat).max() <= 1e-3
+
+
+def test_mode_radial_amb_espectre():
+    espectre = Espectre.gaussia(amplada=20e-9)
+    mapa = MapaRadial(300, screen_size)
+    referencia = compute_intensitat(0.3e-6, 20, res=300, espectre=espectre)
+    assert np.abs(mapa.intensitat_esferic(0.3e-6, 20, espectre=espectre) - referencia).max() <= 0.01
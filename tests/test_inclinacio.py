@@ -0,0 +1,22 @@
+import numpy as np
+
+from michelson.inclinacio import PantallaInclinada, dco_radial_inclinat, comprova_inclinacio
+from michelson.model import long_ona
+
+
+def test_separable_contra_la_dco_pixel_a_pixel():
+    for cas, error in comprova_inclinacio():
+        assert error <= 1e-9, cas
+
+
+def test_terme_no_separable_amb_cada_backend():
+    from michelson.backends import backends
+    params = (0.3e-6, 0.5, 2.5, 20e-6, -10e-6, 1e-3, 0)
+    for nom in backends:
+        try:
+            pantalla = PantallaInclinada(200, backend=nom)
+        except ImportError:
+            continue
+        X, Y = pantalla.x[None, :], pantalla.x[:, None]
+        ref = 0.5*(1 + np.cos(2*np.pi*dco_radial_inclinat(X, Y, *params)/long_ona))
+        assert np.abs(pantalla.intensitat_radial(*params) - ref).max() <= 1e-9, nom
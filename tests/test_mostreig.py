@@ -0,0 +1,22 @@
+import warnings
+
+import pytest
+
+from michelson.mostreig import (AvisAliasing, comprova_mostreig, franges_per_pixel, pendent_radial,
+                                intensitat_adaptativa_radial, resolucio_minima, res_limit)
+
+
+def test_pendent_i_supermostreig():
+    for cas, error in comprova_mostreig():
+        assert error <= (0.02 if cas.startswith('franges') else 0.03), cas
+
+
+def test_escala_negativa():
+    # Els dos termes del pendent tenen signes oposats: el valor absolut no s'anul·la
+    pendent = lambda R: pendent_radial(R, -1, 4)
+    assert franges_per_pixel(pendent, 1000) == pytest.approx(566.2, rel=1e-3)
+    assert resolucio_minima(pendent) == res_limit
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always')
+        intensitat_adaptativa_radial(0, -1, 4, res=200)
+    assert any(issubclass(avis.category, AvisAliasing) for avis in avisos)
@@ -0,0 +1,6 @@
+from michelson.perfil_radial import MapaRadial, comprovar_precisio
+
+
+def test_mode_radial_contra_la_malla_completa():
+    for model, params, error in comprovar_precisio(MapaRadial(500)):
+        assert error <= 0.01, (model, params)
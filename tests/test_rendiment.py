@@ -0,0 +1,36 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pytest
+
+from benchmarks.suite import fitxer_referencia, mesura_cas, regressions
+
+casos = [('compute_intensitat', 500, 5), ('calcul_intensitat', 500, 2.0), ('EstatSimulacio', 500, 3.0),
+         ('MapaRadial', 500, 5), ('trobar_anells', 500, 5), ('update', 500, 5)]
+
+
+@pytest.mark.rendiment
+@pytest.mark.parametrize('nom, res, param', casos)
+def test_sense_regressio(nom, res, param):
+    # Sense referència no es pot comprovar res: és un error, no un cas a saltar
+    assert os.path.exists(fitxer_referencia), 'sense referència: python -m benchmarks.suite --desa-referencia'
+    with open(fitxer_referencia, encoding='utf-8') as f:
+        referencia = json.load(f)
+    clau = f"{nom}[{param:g}] res={res}"
+    assert clau in referencia, f'{clau} no és a la referència'
+    # En un procés nou, com a la suite. Una regressió de temps es torna a mesurar fins a
+    # dues vegades (i es queda el millor temps), perquè una sola mesura pot caure en un moment
+    # de càrrega de la màquina
+    mesura = None
+    for _ in range(3):
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as grup:
+            nova = grup.submit(mesura_cas, nom, res, param).result()
+        if mesura is not None:
+            nova['temps_min'] = min(nova['temps_min'], mesura['temps_min'])
+        mesura = nova
+        dolents = regressions({clau: mesura}, referencia, tol_temps=0.3, tol_memoria=0.1)
+        if not dolents:
+            break
+    assert not dolents
@@ -0,0 +1,176 @@
+import asyncio
+import io
+import json
+from urllib.parse import urlencode
+
+import numpy as np
+import pytest
+
+from michelson import servei
+from michelson.analitic import mesura_esferic
+from michelson.model import compute_intensitat
+from michelson.servei import ErrorPeticio, Servei, llegeix_parametres
+
+
+@pytest.mark.parametrize('valors', [
+    {'mirror_diff': 0, 'radi_curv': -1},
+    {'model': 'radial', 'mirror_diff': 0, 'escala': -1, 'potencia': 4},
+    {'mirror_diff': 0, 'radi_curv': 5, 'res': 300},
+    {'mirror_diff': 0, 'radi_curv': 5, 'cmap': 'no_existeix'},
+    {'mirror_diff': 'x', 'radi_curv': 5},
+])
+def test_parametres_rebutjats(valors):
+    with pytest.raises(ErrorPeticio) as error:
+        llegeix_parametres(valors)
+    assert error.value.estat == 400
+
+
+def test_massa_anells():
+    assert servei._anells(llegeix_parametres({'mirror_diff': 0, 'radi_curv': 1e-6})) > servei.max_anells
+    assert servei._anells(llegeix_parametres({'mirror_diff': 0, 'radi_curv': 5})) < servei.max_anells
+
+
+def test_mapes_compartits_entre_fils():
+    from concurrent.futures import ThreadPoolExecutor
+
+    for res in (64, 128, 256, 128):
+        servei._mapa(res)
+    assert list(servei._mapes) == [256, 128] and list(servei._local.mapes) == [256, 128]
+
+    # Un altre fil té la seva vista, amb buffers propis i els mateixos índexs
+    with ThreadPoolExecutor(1) as grup:
+        altre = grup.submit(servei._mapa, 128).result()
+    propi = servei._mapa(128)
+    assert altre is not propi and altre._idx is propi._idx
+    perfil = np.linspace(0, 1, len(propi.r))
+    assert np.array_equal(altre.expandeix(perfil), propi.expandeix(perfil))
+    assert altre._q0 is not propi._q0
+
+    # Quan el mapa surt de la LRU comuna, la vista del fil no el reté
+    servei._mapa(64)
+    servei._mapa(500)
+    assert 128 not in servei._mapes
+    assert servei._mapa(128).r is servei._mapes[128].r
+
+
+async def _peticio(port, cami, metode='GET', cos=b'', capcaleres=None):
+    lector, escriptor = await asyncio.open_connection(servei.host, port)
+    try:
+        linies = [f'{metode} {cami} HTTP/1.1', f'Content-Length: {len(cos)}', 'Connection: close']
+        linies += [f'{nom}: {valor}' for nom, valor in (capcaleres or {}).items()]
+        escriptor.write(('\r\n'.join(linies) + '\r\n\r\n').encode('latin-1') + cos)
+        estat = int((await lector.readline()).split()[1])
+        rebudes = {}
+        while (linia := await lector.readline()) not in (b'\r\n', b''):
+            nom, _, valor = linia.decode('latin-1').partition(':')
+            rebudes[nom.strip().lower()] = valor.strip()
+        return estat, rebudes, await lector.readexactly(int(rebudes['content-length']))
+    finally:
+        escriptor.close()
+
+
+def _amb_servei(prova, **opcions):
+    # Executa prova(servei, port) amb un servei escoltant en un port lliure
+    async def principal():
+        s = Servei(fils=2, **opcions)
+        servidor = await s.inicia(0)
+        try:
+            return await prova(s, servidor.sockets[0].getsockname()[1])
+        finally:
+            servidor.close()
+            s.tanca()
+    return asyncio.run(principal())
+
+
+def test_intensitat_per_http():
+    async def prova(s, port):
+        valors = {'model': 'esferic', 'mirror_diff': 3e-7, 'radi_curv': 1000, 'res': 256}
+        cami = '/intensitat?' + urlencode(dict(valors, format='npy'))
+        estat, capcaleres, cos = await _peticio(port, cami)
+        assert estat == 200 and capcaleres['x-cache'] == 'miss'
+        intensitat = np.load(io.BytesIO(cos))
+        assert intensitat.shape == (256, 256)
+        assert np.abs(intensitat - compute_intensitat(3e-7, 1000, res=256)).max() <= 0.01
+
+        # La segona vegada surt de la memòria cau, i amb l'ETag no cal tornar-la a enviar
+        estat, repetida, cos_repetit = await _peticio(port, cami)
+        assert (estat, repetida['x-cache'], cos_repetit) == (200, 'hit', cos)
+        estat, _, cos = await _peticio(port, cami, capcaleres={'If-None-Match': repetida['etag']})
+        assert (estat, cos) == (304, b'')
+
+        # POST amb JSON i format raw
+        estat, capcaleres, cos = await _peticio(port, '/intensitat', 'POST',
+                                                json.dumps(dict(valors, format='raw')).encode())
+        assert estat == 200 and capcaleres['x-forma'] == '256,256'
+        assert np.array_equal(np.frombuffer(cos, dtype=np.float32).reshape(256, 256), intensitat)
+
+        estat, capcaleres, cos = await _peticio(port, '/intensitat?' + urlencode(dict(valors, cmap='viridis')))
+        assert estat == 200 and capcaleres['content-type'] == 'image/png' and cos[:8] == b'\x89PNG\r\n\x1a\n'
+    _amb_servei(prova)
+
+
+def test_peticions_iguals_es_calculen_una_vegada():
+    async def prova(s, port):
+        cami = '/intensitat?' + urlencode({'mirror_diff': 1e-7, 'radi_curv': 5, 'res': 128})
+        respostes = await asyncio.gather(*(_peticio(port, cami) for _ in range(8)))
+        assert {estat for estat, _, _ in respostes} == {200}
+        assert len({cos for _, _, cos in respostes}) == 1
+        assert s.comptadors['calculades'] == 1
+    _amb_servei(prova, finestra=0.05)
+
+
+def test_mesura_per_http():
+    async def prova(s, port):
+        estat, capcaleres, cos = await _peticio(port, '/mesura?mirror_diff=3e-7&radi_curv=5&res=128')
+        assert estat == 200 and capcaleres['x-cache'] == 'miss'
+        mesura = mesura_esferic(3e-7, 5)
+        resultat = json.loads(cos)
+        assert resultat['n_anells'] == mesura.n_anells and np.allclose(resultat['radis'], mesura.radis)
+        assert resultat['radi_curv'] == mesura.radi_curv and resultat['incertesa'] == mesura.incertesa
+
+        # La mesura no depèn de res, format ni cmap: és la mateixa entrada de la memòria cau
+        estat, capcaleres, _ = await _peticio(port, '/mesura', 'POST',
+                                              json.dumps({'mirror_diff': 3e-7, 'radi_curv': 5,
+                                                          'res': 500, 'cmap': 'viridis'}).encode())
+        assert estat == 200 and capcaleres['x-cache'] == 'hit'
+    _amb_servei(prova, resolucions=(128, 256))
+
+
+def test_errors_per_http():
+    async def prova(s, port):
+        assert (await _peticio(port, '/no_existeix'))[0] == 404
+        assert (await _peticio(port, '/intensitat?mirror_diff=0&radi_curv=5', 'PUT'))[0] == 405
+        assert (await _peticio(port, '/intensitat?mirror_diff=0&radi_curv=-5'))[0] == 400
+        assert (await _peticio(port, '/mesura', 'POST', b'[1, 2]'))[0] == 400
+        estat, _, cos = await _peticio(port, '/mesura?mirror_diff=0&radi_curv=1e-6')
+        assert estat == 400 and 'anells' in json.loads(cos)['error']
+        estat, _, cos = await _peticio(port, '/estat')
+        assert estat == 200 and json.loads(cos)['errors'] == 5
+
+        # Un Content-Length no vàlid rep un 400 i es tanca la connexió
+        lector, escriptor = await asyncio.open_connection(servei.host, port)
+        escriptor.write(b'POST /mesura HTTP/1.1\r\nContent-Length: x\r\n\r\n')
+        assert (await lector.readline()).split()[1] == b'400'
+        assert (await lector.read()).endswith(b'}')
+        escriptor.close()
+    _amb_servei(prova)
+
+
+def test_client_cancellat():
+    # Si el primer client d'una petició es cancel·la, els que hi esperen reben el resultat
+    async def prova(s, port):
+        canonic = dict(llegeix_parametres({'mirror_diff': 3e-7, 'radi_curv': 5}, s.resolucions),
+                       res=None, format=None, cmap=None)
+        primer = asyncio.create_task(s.resposta('/mesura', canonic))
+        await asyncio.sleep(0)
+        segon = asyncio.create_task(s.resposta('/mesura', canonic))
+        await asyncio.sleep(0)
+        primer.cancel()
+        cos, _, _, origen = await asyncio.wait_for(segon, 10)
+        assert origen == 'coalesced' and json.loads(cos)['n_anells'] == mesura_esferic(3e-7, 5).n_anells
+        with pytest.raises(asyncio.CancelledError):
+            await primer
+
+        # El resultat es guarda igualment
+        assert (await s.resposta('/mesura', canonic))[3] == 'hit'
+    _amb_servei(prova)
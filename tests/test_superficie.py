@@ -0,0 +1,71 @@
+import numpy as np
+
+from michelson.geometria import eix, malla_radial
+from michelson.model import screen_size, long_ona, dist_lent, factor_escala, compute_intensitat, calcul_intensitat
+from michelson.superficie import (SumaRadial, Zernike, MapaAlcades, noll_a_nm, intensitat_superficie)
+
+
+def test_suma_radial_d_un_terme_es_el_model_radial():
+    for params in [(0.2e-6, 0.5, 2.5), (0, 0.2, 3.0), (-0.4e-6, 0.1, 4.0), (0.1e-6, 0.5, 1.0)]:
+        superficie = SumaRadial([params[1:]])
+        assert np.abs(intensitat_superficie(superficie, params[0], res=200)
+                      - calcul_intensitat(*params, res=200)).max() <= 1e-9, params
+
+
+def test_suma_radial_esferica():
+    # 2h = R²/radi_curv amb un sol terme R²
+    radi_curv = 5
+    superficie = SumaRadial([(1/(4*radi_curv*factor_escala(2)), 2)])
+    assert np.abs(intensitat_superficie(superficie, 0.3e-6, res=200)
+                  - compute_intensitat(0.3e-6, radi_curv, res=200)).max() <= 1e-9
+
+
+def test_ordre_de_noll():
+    esperat = [(0, 0), (1, 1), (1, -1), (2, 0), (2, -2), (2, 2), (3, -1), (3, 1), (3, -3), (3, 3), (4, 0)]
+    assert [noll_a_nm(j) for j in range(1, 12)] == esperat
+
+
+def test_desenfocament_contra_la_forma_tancada():
+    # Z4 = √3·(2ρ² - 1), amb ρ = R/radi
+    res, c4 = 200, 0.2e-6
+    radi = screen_size/np.sqrt(2)
+    R = malla_radial(res, screen_size)
+    h = c4*np.sqrt(3)*(2*(R/radi)**2 - 1)
+    assert np.abs(Zernike({4: c4}).alcada(res) - h).max() <= 1e-18
+    dco = 0.3e-6 - R**2/(2*dist_lent) - 2*h
+    esperat = 0.5*(1 + np.cos(2*np.pi*dco/long_ona))
+    assert np.abs(intensitat_superficie(Zernike({4: c4}), 0.3e-6, res=res) - esperat).max() <= 1e-9
+
+
+def test_inclinacio_zernike():
+    # Z2 = 2ρ·cos θ = 2x/radi: un pla
+    res, c2 = 100, 0.1e-6
+    x = eix(res, screen_size)
+    h = np.broadcast_to(c2*2*x/(screen_size/np.sqrt(2)), (res, res))
+    assert np.abs(Zernike([0, c2]).alcada(res) - h).max() <= 1e-18
+
+
+def test_residus_minims_als_coeficients_reals():
+    res = 100
+    zernike = Zernike(np.zeros(6))
+    reals = np.array([0, 0, 0, 0.15e-6, 0.05e-6, -0.08e-6])
+    mesurada = intensitat_superficie(Zernike(reals), 0.2e-6, res=res)
+    conjunts = reals + np.outer(np.linspace(-1, 1, 9), [0, 0, 0, 0.02e-6, 0, 0])
+    residus = zernike.residus(mesurada, 0.2e-6, conjunts)
+    assert np.argmin(residus) == 4 and residus[4] <= 1e-18
+    assert np.allclose(zernike.alcades(conjunts[:2], res), [Zernike(c).alcada(res) for c in conjunts[:2]])
+
+
+def test_mapa_alcades(tmp_path):
+    # Un mapa amb les alçades d'una SumaRadial reprodueix el model a la mateixa resolució,
+    # i un pla s'interpola exactament a qualsevol resolució
+    superficie = SumaRadial([(0.5, 2.5)])
+    fitxer = tmp_path / 'alcades.npy'
+    np.save(fitxer, superficie.alcada(200))
+    mapa = MapaAlcades.carrega(fitxer)
+    assert np.abs(intensitat_superficie(mapa, 0.2e-6, res=200)
+                  - calcul_intensitat(0.2e-6, 0.5, 2.5, res=200)).max() <= 1e-9
+    x = eix(50, screen_size)
+    pla = MapaAlcades(np.add.outer(2*x, 3*x)*1e-4)
+    x_fi = eix(173, screen_size)
+    assert np.abs(pla.alcada(173) - np.add.outer(2*x_fi, 3*x_fi)*1e-4).max() <= 1e-15
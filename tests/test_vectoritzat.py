@@ -0,0 +1,6 @@
+from michelson.vectoritzat import comprova_vectoritzat
+
+
+def test_lots_contra_les_crides_escalars():
+    for cas, error in comprova_vectoritzat():
+        assert error <= (1e-6 if 'float32' in cas else 1e-9), cas